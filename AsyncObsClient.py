@@ -0,0 +1,163 @@
+import asyncio
+import base64
+import hashlib
+import json
+import logging
+import aiohttp
+from obswebsocket import exceptions
+from ObsBatchClient import OP_EVENT, OP_REQUEST_RESPONSE, OP_REQUEST_BATCH, \
+        OP_REQUEST_BATCH_RESPONSE, EXECUTION_SERIAL_REALTIME
+
+LOG = logging.getLogger(__name__)
+
+# obs-websocket v5 op codes for the handshake and single requests
+OP_HELLO = 0
+OP_IDENTIFY = 1
+OP_IDENTIFIED = 2
+OP_REQUEST = 6
+
+
+class AsyncObsClient():
+    # obs-websocket v5 client that runs on an asyncio event loop, for the
+    #  asyncio engine. Takes the same request objects as obsws (from
+    #  obswebsocket.requests) and fills them in the same way, but call() and
+    #  call_batch() are coroutines.
+    # Only speaks the v5 protocol; events are ignored.
+    def __init__(self, host='localhost', port=4444, password='', timeout=60, session=None):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.timeout = timeout
+        self._session = session
+        self._own_session = session is None
+        self._ws = None
+        self._recv_task = None
+        self._closing = False
+        self._id = 1
+        self._waiting = {}
+
+    async def connect(self):
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+        url = 'ws://{}:{}'.format(self.host, self.port)
+        LOG.info('Connecting to %s...' % (url))
+        try:
+            self._ws = await self._session.ws_connect(url)
+            await self._auth()
+        except (aiohttp.ClientError, OSError) as e:
+            raise exceptions.ConnectionFailure(str(e))
+        LOG.info('Connected!')
+        self._recv_task = asyncio.get_running_loop().create_task(self._recv_task_func())
+
+    async def _auth(self):
+        hello = await self._ws.receive_json()
+        if hello.get('op') != OP_HELLO:
+            raise exceptions.ConnectionFailure(hello.get('error', 'Invalid Hello message.'))
+        auth = ''
+        if hello['d'].get('authentication'):
+            auth = self._build_auth_string(hello['d']['authentication']['salt'],
+                                           hello['d']['authentication']['challenge'])
+        await self._ws.send_json({
+            'op': OP_IDENTIFY,
+            'd': {
+                'rpcVersion': 1,
+                'authentication': auth,
+                # no events, we only make requests
+                'eventSubscriptions': 0,
+            }
+        })
+        identified = await self._ws.receive_json()
+        if identified.get('op') != OP_IDENTIFIED:
+            raise exceptions.ConnectionFailure(identified.get('error', 'Invalid Identified message.'))
+        if identified['d'].get('negotiatedRpcVersion') != 1:
+            raise exceptions.ConnectionFailure('Invalid RPC version negotiated.')
+
+    def _build_auth_string(self, salt, challenge):
+        secret = base64.b64encode(
+                hashlib.sha256((self.password + salt).encode('utf-8')).digest())
+        return base64.b64encode(
+                hashlib.sha256(secret + challenge.encode('utf-8')).digest()).decode('utf-8')
+
+    async def _recv_task_func(self):
+        async for msg in self._ws:
+            if msg.type != aiohttp.WSMsgType.TEXT:
+                continue
+            try:
+                result = json.loads(msg.data)
+            except ValueError:
+                LOG.warning('Invalid message: {}'.format(msg.data))
+                continue
+            if result.get('op') in (OP_REQUEST_RESPONSE, OP_REQUEST_BATCH_RESPONSE):
+                future = self._waiting.pop(result['d'].get('requestId'), None)
+                if future is not None and not future.done():
+                    future.set_result(result['d'])
+            elif result.get('op') != OP_EVENT:
+                LOG.warning('Unknown message: {}'.format(result))
+        if not self._closing:
+            LOG.warning('Connection lost!')
+        # nobody's going to answer the ones still waiting
+        for future in self._waiting.values():
+            if not future.done():
+                future.set_exception(exceptions.ConnectionFailure('Connection lost'))
+        self._waiting = {}
+
+    async def _send_and_wait(self, op, data):
+        if self._ws is None or self._ws.closed:
+            raise exceptions.ConnectionFailure('Not connected')
+        message_id = str(self._id)
+        self._id += 1
+        data['requestId'] = message_id
+        future = asyncio.get_running_loop().create_future()
+        self._waiting[message_id] = future
+        try:
+            await self._ws.send_json({'op': op, 'd': data})
+            return await asyncio.wait_for(future, self.timeout)
+        except asyncio.TimeoutError:
+            raise exceptions.MessageTimeout('No answer for message {}'.format(message_id))
+        finally:
+            self._waiting.pop(message_id, None)
+
+    async def call(self, obj):
+        answer = await self._send_and_wait(OP_REQUEST, {
+            'requestType': obj.name,
+            'requestData': obj.data(),
+        })
+        obj.input(answer.get('responseData', {}), answer['requestStatus']['result'])
+        return obj
+
+    async def call_batch(self, objs, halt_on_failure=False):
+        # Same as ObsBatchClient.call_batch(): one round-trip for the lot
+        if len(objs) == 0:
+            return objs
+        batch_requests = []
+        for idx, obj in enumerate(objs):
+            batch_requests.append({
+                'requestType': obj.name,
+                'requestId': str(idx),
+                'requestData': obj.data(),
+            })
+        answer = await self._send_and_wait(OP_REQUEST_BATCH, {
+            'haltOnFailure': halt_on_failure,
+            'executionType': EXECUTION_SERIAL_REALTIME,
+            'requests': batch_requests,
+        })
+        for obj in objs:
+            # anything OBS skipped (e.g. after a halt) counts as failed
+            obj.input({}, False)
+        for result in answer.get('results', []):
+            try:
+                obj = objs[int(result['requestId'])]
+            except (KeyError, ValueError, IndexError):
+                LOG.warning('Unknown request in batch response: {}'.format(result))
+                continue
+            obj.input(result.get('responseData', {}), result['requestStatus']['result'])
+        return objs
+
+    async def disconnect(self):
+        self._closing = True
+        if self._ws is not None:
+            await self._ws.close()
+        if self._recv_task is not None:
+            self._recv_task.cancel()
+        if self._own_session and self._session is not None:
+            await self._session.close()
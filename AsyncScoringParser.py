@@ -0,0 +1,599 @@
+import asyncio
+from collections import namedtuple
+import threading
+import traceback
+import aiohttp
+from aiohttp import web
+from LabelOutput import AsyncLabelOutput
+from ScoringClient import ScoringClient
+from ScoringParser import ScoringParser
+import Metrics
+from StateBroadcaster import sse_message, SSE_KEEPALIVE, SSE_KEEPALIVE_PERIOD
+
+# What AsyncScoringClient.get() returns: just the parts of a response that
+#  the parser uses, with the body already read in.
+AsyncResponse = namedtuple('AsyncResponse', ['status_code', 'content', 'headers'])
+
+
+def make_client_session(limit, limit_per_host=0):
+    # An aiohttp session (and connection pool) that any number of
+    #  AsyncScoringClients can share. Connections get counted against
+    #  whichever client made the request.
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_connection_create_end.append(_on_connection_create)
+    trace_config.on_connection_reuseconn.append(_on_connection_reuse)
+    connector = aiohttp.TCPConnector(limit=limit, limit_per_host=limit_per_host)
+    return aiohttp.ClientSession(connector=connector, trace_configs=[trace_config])
+
+
+async def _on_connection_create(session, ctx, params):
+    if isinstance(ctx.trace_request_ctx, AsyncScoringClient):
+        ctx.trace_request_ctx._count_connection(reused=False)
+
+
+async def _on_connection_reuse(session, ctx, params):
+    if isinstance(ctx.trace_request_ctx, AsyncScoringClient):
+        ctx.trace_request_ctx._count_connection(reused=True)
+
+
+class AsyncScoringClient(ScoringClient):
+    # ScoringClient for the asyncio engine: same endpoints, timeouts, stats
+    #  and change detection, but on an aiohttp session, and get() and
+    #  get_if_changed() are coroutines.
+    # open() has to be called (on the event loop) before anything else.
+    # Pass in a session from make_client_session() to share its connection
+    #  pool with other clients; otherwise it gets its own.
+    def __init__(self, base_address, pool_size=4, timeouts=None, default_timeout=5.0,
+                 session=None):
+        self._init_common(base_address, timeouts, default_timeout)
+        self._pool_size = pool_size
+        self._session = session
+        self._own_session = session is None
+        self._conn_opened_cnt = 0
+        self._conn_reused_cnt = 0
+
+    async def open(self):
+        if self._session is None:
+            self._session = make_client_session(self._pool_size)
+
+    def _count_connection(self, reused):
+        # aiohttp doesn't keep track of new vs. reused connections, so the
+        #  session's trace hooks count them here
+        with self._stats_lock:
+            if reused:
+                self._conn_reused_cnt += 1
+            else:
+                self._conn_opened_cnt += 1
+
+    async def get(self, endpoint, headers=None, timeout=None):
+        # Raises asyncio.TimeoutError or aiohttp.ClientError if the request
+        #  didn't work out.
+        if timeout is None:
+            timeout = self.timeout_for(endpoint)
+        self._count_request(endpoint)
+        try:
+            async with self._session.get(self.url_for(endpoint), headers=headers,
+                                         timeout=aiohttp.ClientTimeout(total=timeout),
+                                         trace_request_ctx=self) as resp:
+                content = await resp.read()
+                return AsyncResponse(resp.status, content, resp.headers)
+        except (asyncio.TimeoutError, aiohttp.ClientError):
+            self._count_error(endpoint)
+            raise
+
+    async def get_if_changed(self, endpoint):
+        # same as ScoringClient.get_if_changed()
+        start = self.metrics.clock()
+        resp = await self.get(endpoint, headers=self._conditional_headers(endpoint))
+        self.metrics.observe_since('http_request_seconds', start, endpoint=endpoint)
+        return resp, self._check_changed_timed(endpoint, resp)
+
+    def _connection_counts(self):
+        with self._stats_lock:
+            return self._conn_opened_cnt, self._conn_opened_cnt + self._conn_reused_cnt
+
+    async def close(self):
+        if self._own_session and self._session is not None:
+            await self._session.close()
+
+
+class AsyncScoringParser(ScoringParser):
+    # Same as ScoringParser, but instead of a connect thread, a parsing
+    #  thread, a scheduler thread and a Flask thread, all of the
+    #  polling, page fetches, OBS websocket calls and the timer webserver run
+    #  on one asyncio event loop, in one thread.
+    # The match state machine, page parsing and label logic are all shared
+    #  with ScoringParser. Label files get written from the loop's executor,
+    #  since plain file writes can't be awaited.
+    #
+    # By default it runs its own event loop thread and starts right away.
+    #  To run several of them together (see MultiVenueParser), pass in the
+    #  loop, and optionally a shared aiohttp session and a connected OBS
+    #  client; then it's up to the caller to await start_async() and
+    #  stop_async() on that loop, and to host the web routes.
+    def __init__(self, config, loop=None, session=None, obs_client=None, name=None,
+                 startup_timer=None):
+        self._init_state(config)
+        self.name = name
+        self._startup = startup_timer
+
+        self._client = AsyncScoringClient.from_config(config, self.CONNECTION_TIMEOUT,
+                                                      session=session)
+        self._client.metrics = self._metrics
+        self._own_loop = loop is None
+        self._loop = asyncio.new_event_loop() if loop is None else loop
+        self._switchover_handle = None
+        # switchovers that are running (the loop only keeps weak references
+        #  to tasks, so they'd otherwise be garbage collected part way through)
+        self._switchover_tasks = set()
+        self._poll_task = None
+        self._timer_display_task = None
+        self._upcoming_task = None
+        self._refresh_upcoming_event = asyncio.Event()
+        self._web_runner = None
+        self._obs_client = obs_client
+        self._own_obs_client = obs_client is None
+
+        if not self._use_obsws:
+            # do file-based changes
+            self._init_file_sink()
+
+        if self._own_loop:
+            self.start()
+    # end of __init__
+
+    def start(self):
+        self._loop_thread = threading.Thread(target=self._loop.run_forever,
+                                             name='AsyncScoringParser')
+        self._loop_thread.daemon = True
+        self._loop_thread.start()
+        # Everything from here on runs on the event loop. Wait for startup to
+        #  finish, so that any errors come out of the constructor, same as
+        #  with ScoringParser.
+        asyncio.run_coroutine_threadsafe(self.start_async(), self._loop).result()
+    # end of start
+
+    async def start_async(self):
+        await self._client.open()
+        self._startup_mark('setup')
+        if self._use_obsws:
+            # do OBS websocket -based changes
+            await self._init_obsws_async()
+        else:
+            self._startup_mark('label files')
+
+        # labels get written by the output stage's own task
+        self._output = AsyncLabelOutput(self._write_labels_async, self._loop)
+
+        # the team list gets fetched in the background, same as start()
+        self._teams_need_refresh = True
+        if self.load_cache():
+            self._startup_mark('cache')
+
+        print('Starting...')
+        self._poll_task = self._loop.create_task(self._poll_task_func())
+        if self._extrapolate_timer:
+            self._timer_display_task = self._loop.create_task(self._timer_display_task_func())
+        self._upcoming_task = self._loop.create_task(self._upcoming_refresh_task_func())
+        self._startup_mark('tasks')
+
+        # set up webserver, if enabled (and not hosted by someone else)
+        if self._own_loop and self._cfg['host_timer_webserver']:
+            await self._init_webserver_async()
+            self._startup_mark('webserver')
+        if self._startup is not None:
+            self._startup.print_report()
+    # end of start_async
+
+    def stop(self):
+        # Stops everything and waits for the last labels to be written.
+        #  Call from outside of the event loop.
+        asyncio.run_coroutine_threadsafe(self.stop_async(), self._loop).result()
+        # and the thread that label files get written from
+        asyncio.run_coroutine_threadsafe(self._loop.shutdown_default_executor(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join()
+
+    async def stop_async(self):
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+        if self._timer_display_task is not None:
+            self._timer_display_task.cancel()
+        if self._upcoming_task is not None:
+            self._upcoming_task.cancel()
+        self.cancel_switchover()
+        for task in list(self._switchover_tasks):
+            task.cancel()
+        self.stop_manual_timer()
+        await self._output.stop_async()
+        # lets any /events clients go
+        self._state_hub.close()
+        if self._web_runner is not None:
+            await self._web_runner.cleanup()
+        if self._own_obs_client and self._obs_client is not None:
+            await self._obs_client.disconnect()
+        if not self._use_obsws:
+            self._file_sink.close()
+        if self._cache is not None:
+            self._cache.close()
+        if self._history is not None:
+            self._history.close()
+        await self._client.close()
+    # end of stop_async
+
+
+    async def _init_obsws_async(self):
+        config = self._cfg
+        if self._obs_client is None:
+            from AsyncObsClient import AsyncObsClient
+            self._obs_client = AsyncObsClient(config['obs_websocket_addr'], config['obs_websocket_port'], config['obs_websocket_pw'])
+            await self._obs_client.connect()
+            self._startup_mark('OBS connect')
+        # label changes get collected here and sent to OBS as one batch
+        self._obs_batch_local = threading.local()
+
+        # same as _init_obsws(): two batches for all of the sources
+        src_names = self._obs_source_names()
+        get_reqs = self._obs_source_get_requests(src_names)
+        await self._obs_client.call_batch(list(get_reqs.values()))
+        setup_reqs = self._obs_source_setup_requests(get_reqs)
+        await self._obs_client.call_batch(list(setup_reqs.values()))
+        self._set_obs_sources(src_names, setup_reqs)
+        self._startup_mark('OBS sources')
+        # set the right label change function
+        self._write_label = self.write_label_obsws
+    # end of _init_obsws_async
+
+
+    async def _poll_task_func(self):
+        # Takes the place of the supervisor thread: wait for the scoring
+        #  manager, then poll it until the connection is lost, and start
+        #  over, for as long as we're running.
+        while True:
+            try:
+                await self._wait_for_connection()
+                await self._poll_until_lost()
+            except asyncio.CancelledError:
+                self._connection.note_stopped()
+                raise
+            except Exception:
+                print('ERROR: Unexpected error while polling the scoring manager, starting over:')
+                traceback.print_exc()
+                if self.connected_status:
+                    self.note_connection_lost('unexpected error')
+                await asyncio.sleep(self.note_connect_failure('unexpected error', quiet=True))
+
+    async def _wait_for_connection(self):
+        # same as wait_for_connection()
+        retry_time = self._loop.time()
+        port_was_open = False
+        while True:
+            await asyncio.sleep(max(0, min(retry_time - self._loop.time(), self.CONNECTION_RETRY_DELAY)))
+            error = await self._probe_connection_async()
+            port_open = error is None
+            if port_open and (not port_was_open or self._loop.time() >= retry_time):
+                error = await self._try_connect_async()
+                if error is None:
+                    self.note_connected()
+                    return
+                retry_time = self._loop.time() + self.note_connect_failure(error)
+            elif self._loop.time() >= retry_time:
+                retry_time = self._loop.time() + self.note_connect_failure(error)
+            port_was_open = port_open
+    # end of _wait_for_connection
+
+    async def _probe_connection_async(self):
+        # same as probe_connection()
+        try:
+            reader, writer = await asyncio.wait_for(asyncio.open_connection(*self._probe_addr),
+                                                    self.PROBE_TIMEOUT)
+        except asyncio.TimeoutError:
+            return 'timed out'
+        except OSError as e:
+            return str(e) or e.__class__.__name__
+        writer.close()
+        return None
+
+    async def _try_connect_async(self):
+        # same as _try_connect()
+        try:
+            resp = await self._client.get('match')
+        except asyncio.TimeoutError:
+            return 'request timed out'
+        except (aiohttp.ClientError, OSError) as e:
+            return str(e) or e.__class__.__name__
+        if resp.status_code != 200:
+            return f'response code {resp.status_code}'
+        return None
+
+    async def _poll_until_lost(self):
+        self._poll_delay = self.PARSING_PERIOD
+        while True:
+            await asyncio.sleep(self._poll_delay)
+
+            try:
+                resp, changed = await self._client.get_if_changed('match')
+                received = self._metrics.clock()
+            except asyncio.TimeoutError:
+                print('Request timed out while getting update, retrying.')
+                resp = None
+            except (aiohttp.ClientError, OSError):
+                print('Request failed while getting update, retrying.')
+                resp = None
+
+            if resp is not None and resp.status_code not in (200, 304):
+                print(f'Request failed with status {resp.status_code} while getting update, retrying.')
+                resp = None
+
+            if resp is None:
+                self._poll_delay = self.PARSING_PERIOD
+                if self.note_poll_failure():
+                    # retried enough, go back to waiting for a connection
+                    return
+                continue
+
+            # connection was good
+            self.note_poll_success()
+
+            if not changed:
+                self.note_timer_unchanged()
+            elif self.handle_polled_match_content(resp.content, received):
+                # just now between matches
+                if not self._upcoming_store.loaded:
+                    # nothing to switch over to yet, so it's worth the wait
+                    await self.refresh_upcoming_matches_async()
+                else:
+                    self.request_upcoming_refresh()
+                self.start_between_matches()
+
+            self._poll_delay = self.next_poll_delay(changed)
+    # end of _poll_until_lost
+
+    async def _timer_display_task_func(self):
+        while True:
+            await asyncio.sleep(self.TIMER_DISPLAY_PERIOD)
+            self.refresh_timer_display()
+
+    async def _upcoming_refresh_task_func(self):
+        # same as upcoming_refresh_thread_func()
+        while True:
+            try:
+                await asyncio.wait_for(self._refresh_upcoming_event.wait(),
+                                       self.UPCOMING_REFRESH_PERIOD)
+            except asyncio.TimeoutError:
+                pass
+            self._refresh_upcoming_event.clear()
+            try:
+                if self.connected_status:
+                    if self._teams_need_refresh:
+                        await self.refresh_team_numbers_async()
+                    await self.refresh_upcoming_matches_async()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                print('ERROR: Unexpected error while refreshing the upcoming matches:')
+                traceback.print_exc()
+
+    def request_upcoming_refresh(self):
+        self._refresh_upcoming_event.set()
+
+    # Switchovers run on the loop too: a call_later() instead of a timer
+    #  thread, and a task for the switchover itself, since it might need to
+    #  fetch the phase schedule first.
+    def schedule_switchover(self, delay):
+        self.cancel_switchover()
+        self._switchover_handle = self._loop.call_later(
+                delay, self.upcoming_match_switchover_timer_func)
+
+    def upcoming_match_switchover_timer_func(self):
+        self._switchover_handle = None
+        self.upcoming_match_switchover()
+
+    def switchover_pending(self):
+        return self._switchover_handle is not None
+
+    def cancel_switchover(self):
+        if self._switchover_handle is not None:
+            self._switchover_handle.cancel()
+            self._switchover_handle = None
+
+    def upcoming_match_switchover(self):
+        task = self._loop.create_task(self._upcoming_match_switchover_async())
+        self._switchover_tasks.add(task)
+        task.add_done_callback(self._switchover_task_done)
+
+    def _switchover_task_done(self, task):
+        self._switchover_tasks.discard(task)
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            print('ERROR: Unexpected error during the switchover to the next match:')
+            traceback.print_exception(type(error), error, error.__traceback__)
+
+    # The manual timer's ticks go straight on the loop as well
+    def _now(self):
+        return self._loop.time()
+
+    def _call_at(self, deadline, func):
+        return self._loop.call_at(deadline, func)
+
+    async def _upcoming_match_switchover_async(self):
+        if self.switchover_needs_phase():
+            await self.parse_match_phase_async()
+        self.apply_upcoming_match_switchover()
+
+
+    async def _get_page_async(self, endpoint, what):
+        # same as _get_page()
+        try:
+            resp = await self._client.get(endpoint)
+        except asyncio.TimeoutError:
+            print(f'Request timed out while getting {what}.')
+            return None
+        except aiohttp.ClientError:
+            print(f'Request failed while getting {what}.')
+            return None
+
+        if resp.status_code != 200:
+            print(f'Request failed with code {resp.status_code} while getting {what}.')
+            return None
+        return resp
+
+    async def refresh_upcoming_matches_async(self):
+        # same as refresh_upcoming_matches()
+        try:
+            resp, changed = await self._client.get_if_changed('upcoming')
+        except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+            print(f'Request failed while getting upcoming matches table: {e!r}')
+            return
+        if resp.status_code not in (200, 304):
+            print(f'Request failed with code {resp.status_code} while getting upcoming matches table.')
+            return
+        if changed:
+            self.handle_upcoming_content(resp.content)
+
+    async def parse_match_phase_async(self):
+        resp = await self._get_page_async('phase', 'phase schedule')
+        if resp is None:
+            return
+        self.handle_phase_content(resp.content)
+
+    async def refresh_team_numbers_async(self):
+        # same as refresh_team_numbers()
+        resp = await self._get_page_async('lookup', 'team number lookup')
+        if resp is None:
+            self._teams_need_refresh = True
+            return
+        self._teams_need_refresh = not self.handle_lookup_content(resp.content)
+
+
+    async def _write_labels_async(self, update):
+        # Runs as the output stage's task. Same as _write_labels().
+        labels = self._labels_for_update(update)
+        to_write = self._labels_to_write(labels)
+        start = self._metrics.clock()
+        if self._use_obsws:
+            # collect the changes with the usual write function, then send
+            #  them off as one batch
+            self._obs_batch_local.pending = []
+            for key, text in to_write.items():
+                self._write_label(key, text)
+            pending = self._obs_batch_local.pending
+            self._obs_batch_local.pending = None
+            await self._obs_send_async(pending)
+        elif len(to_write) > 0:
+            await self._loop.run_in_executor(None, self._write_label_files, to_write)
+        self._note_labels_written()
+        all_written = self._all_labels_written(labels)
+        self._observe_label_write(update, len(to_write), start, all_written)
+        return all_written
+    # end of _write_labels_async
+
+    def _write_label_files(self, labels):
+        with self.label_batch():
+            for key, text in labels.items():
+                self._write_label(key, text)
+
+    async def _obs_send_async(self, pending):
+        if len(pending) == 0:
+            return
+        from obswebsocket import exceptions as obsexceptions
+        try:
+            if len(pending) == 1:
+                await self._obs_client.call(pending[0][0])
+            else:
+                await self._obs_client.call_batch([req for req, _, _ in pending])
+        except (obsexceptions.ConnectionFailure, obsexceptions.MessageTimeout) as e:
+            # none of them made it, the output stage will try again
+            print(f'ERROR: OBS websocket request failed: {e}')
+            return
+        self._obs_handle_results(pending)
+    # end of _obs_send_async
+
+
+    async def _init_webserver_async(self):
+        try:
+            ip = self._cfg['webserver_hostip']
+        except KeyError:
+            ip = '0.0.0.0'
+        try:
+            port = self._cfg['webserver_port']
+        except KeyError:
+            port = 9269
+
+        app = web.Application()
+        self.add_web_routes(app)
+
+        self._web_runner = web.AppRunner(app, access_log=None)
+        await self._web_runner.setup()
+        await web.TCPSite(self._web_runner, ip, port).start()
+    # end of _init_webserver_async
+
+    def add_web_routes(self, app, prefix=''):
+        async def timer_page(request):
+            status, headers, body = self._timer_page.respond(request.headers.get('If-None-Match'),
+                                                             request.headers.get('Accept-Encoding'))
+            return web.Response(body=body, status=status, headers=headers)
+        async def timer_json(request):
+            return web.json_response(self.timer_json_data(), headers={'Cache-Control': 'no-cache'})
+        async def state_json(request):
+            status, headers, body = self.state_json_response(request.headers.get('If-None-Match'),
+                                                             request.query.get('since'))
+            return web.Response(body=body, status=status, headers=headers)
+        app.router.add_get(prefix + '/timer', timer_page)
+        app.router.add_get(prefix + '/timer.json', timer_json)
+        app.router.add_get(prefix + '/state.json', state_json)
+        app.router.add_get(prefix + '/events', self._events_handler)
+        if self._metrics.enabled:
+            async def metrics(request):
+                return web.Response(body=self.metrics_text().encode(),
+                                    headers={'Content-Type': Metrics.CONTENT_TYPE,
+                                             'Cache-Control': 'no-cache'})
+            app.router.add_get(prefix + '/metrics', metrics)
+        if self._history is not None:
+            async def history_team(request):
+                return web.json_response(self.history_team_json_data(request.match_info['team']),
+                                         headers={'Cache-Control': 'no-cache'})
+            async def history_match(request):
+                try:
+                    match_num = int(request.match_info['match_num'])
+                except ValueError:
+                    raise web.HTTPNotFound()
+                return web.json_response(self.history_match_json_data(match_num, request.query.get('phase')),
+                                         headers={'Cache-Control': 'no-cache'})
+            app.router.add_get(prefix + '/history/team/{team}', history_team)
+            app.router.add_get(prefix + '/history/match/{match_num}', history_match)
+
+    async def _events_handler(self, request):
+        # same as sse_stream(), but without tying up a thread per client
+        resp = web.StreamResponse(headers={'Content-Type': 'text/event-stream',
+                                           'Cache-Control': 'no-cache',
+                                           'X-Accel-Buffering': 'no'})
+        await resp.prepare(request)
+        changed = asyncio.Event()
+        def listener():
+            self._loop.call_soon_threadsafe(changed.set)
+        self._state_hub.add_listener(listener)
+        try:
+            version, changes = self._state_hub.changes_since(
+                    self._state_hub.start_version(request.headers.get('Last-Event-ID')))
+            await resp.write(sse_message(version, changes))
+            while not self._state_hub.is_closed():
+                try:
+                    await asyncio.wait_for(changed.wait(), SSE_KEEPALIVE_PERIOD)
+                except asyncio.TimeoutError:
+                    await resp.write(SSE_KEEPALIVE)
+                    continue
+                changed.clear()
+                new_version, changes = self._state_hub.changes_since(version)
+                if new_version != version:
+                    version = new_version
+                    await resp.write(sse_message(version, changes))
+        except ConnectionResetError:
+            # client went away
+            pass
+        finally:
+            self._state_hub.remove_listener(listener)
+        return resp
+    # end of _events_handler
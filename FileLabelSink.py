@@ -0,0 +1,183 @@
+import os
+import os.path
+import time
+
+WRITE_MODES = ['inplace', 'atomic']
+FSYNC_POLICIES = ['never', 'data', 'full']
+
+
+class FileLabelSink():
+    # Writes label text to the files that OBS text sources read from.
+    #
+    # 'inplace' mode keeps every file open and rewrites it in place, which is
+    #  how it's always been done, but OBS can catch the file right after it's
+    #  been truncated and show a blank label for a frame.
+    # 'atomic' mode writes the new text to a temp file next to the label file
+    #  and renames it over the top, so a reader only ever sees the old text
+    #  or the new text.
+    #
+    # Writes made between begin_batch() and end_batch() all get written out
+    #  together, in one flush (and fsync) cycle.
+    #
+    # fsync policies: 'never' leaves it up to the OS, 'data' fsyncs each file
+    #  before it's flushed/renamed into place, and 'full' also fsyncs the
+    #  directory after the renames (where the OS supports that).
+    def __init__(self, rel_path, file_names, write_mode='inplace', fsync_policy='never'):
+        if write_mode not in WRITE_MODES:
+            print(f'WARNING: Unknown file write mode "{write_mode}", using "inplace".')
+            write_mode = 'inplace'
+        if fsync_policy not in FSYNC_POLICIES:
+            print(f'WARNING: Unknown fsync policy "{fsync_policy}", using "never".')
+            fsync_policy = 'never'
+        self._rel_path = rel_path
+        self._write_mode = write_mode
+        self._fsync_policy = fsync_policy
+        self.REPLACE_RETRY_CNT = 3
+        self.REPLACE_RETRY_DELAY = 0.005
+
+        # open up all the files. Any label whose file can't be opened is
+        #  disabled, and writes to it are just skipped.
+        self._files = {}
+        self._paths = {}
+        for key, fname in file_names.items():
+            label_f = self._try_open_file(fname)
+            if label_f is None:
+                continue
+            self._paths[key] = os.path.join(rel_path, fname)
+            if self._write_mode == 'inplace':
+                self._files[key] = label_f
+            else:
+                # only needed it to make sure the file can be written
+                label_f.close()
+
+        self._pending = None
+
+    def _try_open_file(self, fname):
+        if fname is None or fname == '':
+            return None
+        try:
+            return open(os.path.join(self._rel_path, fname), 'w')
+        except FileNotFoundError:
+            print(f'Could not open file "{os.path.join(self._rel_path, fname)}", not found.')
+            return None
+
+    def has_label(self, key):
+        return key in self._paths
+
+    def begin_batch(self):
+        self._pending = []
+
+    def end_batch(self):
+        pending = self._pending
+        self._pending = None
+        if pending:
+            self._flush(pending)
+
+    def write(self, key, text, on_success):
+        # on_success gets called once the text is actually in the file
+        if key not in self._paths:
+            # disabled label, nothing to write
+            on_success()
+            return
+        if self._pending is not None:
+            self._pending.append((key, text, on_success))
+        else:
+            self._flush([(key, text, on_success)])
+
+    def _flush(self, pending):
+        if self._write_mode == 'atomic':
+            self._flush_atomic(pending)
+        else:
+            self._flush_inplace(pending)
+
+    def _flush_inplace(self, pending):
+        written = []
+        for key, text, on_success in pending:
+            label_f = self._files[key]
+            try:
+                # clear the file and write it
+                label_f.truncate(0)
+                label_f.seek(0)
+                label_f.write(text)
+                written.append((key, on_success))
+            except OSError as e:
+                print(f'ERROR: Failed writing label {key} to file: {e}')
+        # then flush them all
+        for key, on_success in written:
+            try:
+                self._files[key].flush()
+                if self._fsync_policy != 'never':
+                    os.fsync(self._files[key].fileno())
+                on_success()
+            except OSError as e:
+                print(f'ERROR: Failed flushing label {key} to file: {e}')
+    # end of _flush_inplace
+
+    def _flush_atomic(self, pending):
+        # write all of the temp files first...
+        staged = []
+        for key, text, on_success in pending:
+            path = self._paths[key]
+            tmp_path = os.path.join(os.path.dirname(path), '.' + os.path.basename(path) + '.tmp')
+            try:
+                with open(tmp_path, 'w') as tmp_f:
+                    tmp_f.write(text)
+                    if self._fsync_policy != 'never':
+                        tmp_f.flush()
+                        os.fsync(tmp_f.fileno())
+                staged.append((key, text, tmp_path, on_success))
+            except OSError as e:
+                print(f'ERROR: Failed writing label {key} to temp file: {e}')
+
+        # ...then swap them all into place
+        for key, text, tmp_path, on_success in staged:
+            if self._replace(tmp_path, self._paths[key]):
+                on_success()
+                continue
+            # Couldn't rename over it (on Windows that happens if someone
+            #  has it open right now), so fall back to writing it in place.
+            try:
+                with open(self._paths[key], 'w') as label_f:
+                    label_f.write(text)
+                on_success()
+            except OSError as e:
+                print(f'ERROR: Failed writing label {key} to file: {e}')
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+        if self._fsync_policy == 'full' and len(staged) > 0:
+            self._fsync_dir(self._rel_path)
+    # end of _flush_atomic
+
+    def _replace(self, src, dst):
+        for attempt in range(self.REPLACE_RETRY_CNT):
+            try:
+                os.replace(src, dst)
+                return True
+            except PermissionError:
+                time.sleep(self.REPLACE_RETRY_DELAY)
+            except OSError:
+                break
+        return False
+
+    def _fsync_dir(self, dir_path):
+        if not hasattr(os, 'O_DIRECTORY'):
+            # can't open directories for fsync on this OS (e.g. Windows)
+            return
+        try:
+            dir_fd = os.open(dir_path, os.O_RDONLY | os.O_DIRECTORY)
+        except OSError:
+            return
+        try:
+            os.fsync(dir_fd)
+        except OSError:
+            pass
+        finally:
+            os.close(dir_fd)
+
+    def close(self):
+        for label_f in self._files.values():
+            label_f.close()
+        self._files = {}
@@ -0,0 +1,210 @@
+from collections import namedtuple
+import asyncio
+import threading
+import traceback
+
+# Desired label state. Anything left as None is left alone.
+#  timer is the timer text, match is (match_phase, match_num) and
+#  match_table is {field_num: {color: team_text}}. received is when the
+#  scoring manager page that it came from was received (perf_counter), if
+#  it came from one and that's being measured.
+LabelUpdate = namedtuple('LabelUpdate', ['timer', 'match', 'match_table', 'received'],
+                         defaults=[None, None, None, None])
+
+
+def merge_updates(older, newer):
+    # newer values win, but anything newer doesn't touch is kept from older.
+    #  received is the earliest, since that's been waiting the longest.
+    received = older.received
+    if received is None or (newer.received is not None and newer.received < received):
+        received = newer.received
+    return LabelUpdate(
+        newer.timer if newer.timer is not None else older.timer,
+        newer.match if newer.match is not None else older.match,
+        newer.match_table if newer.match_table is not None else older.match_table,
+        received)
+
+
+class LabelOutput():
+    # Writes label updates on its own worker thread, so that a slow sink
+    #  (OBS websocket, network share) doesn't hold up polling. Only the newest
+    #  state is kept: if the sink falls behind, the intermediate updates get
+    #  merged together and only the latest text for each label gets written.
+    # write_func should return False if some labels didn't get written; the
+    #  update then gets tried again after retry_delay (unless a newer one
+    #  shows up first, in which case they get merged).
+    def __init__(self, write_func, name='LabelOutput', retry_delay=0.5):
+        self._write_func = write_func
+        self._retry_delay = retry_delay
+        self._cond = threading.Condition()
+        self._pending = None
+        self._stopping = False
+        self._busy = False
+
+        self._submitted_cnt = 0
+        self._written_cnt = 0
+        self._dropped_cnt = 0
+        self._error_cnt = 0
+        self._retry_cnt = 0
+        self._max_queue_depth = 0
+
+        self._start(name)
+
+    def _start(self, name):
+        self._thread = threading.Thread(target=self._worker_thread_func, name=name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, update):
+        with self._cond:
+            self._submitted_cnt += 1
+            if self._pending is not None:
+                # the sink hasn't picked up the last one yet, so it gets
+                #  replaced by this one
+                self._dropped_cnt += 1
+                self._pending = merge_updates(self._pending, update)
+            else:
+                self._pending = update
+            self._max_queue_depth = max(self._max_queue_depth, self.queue_depth())
+            self._cond.notify()
+
+    def queue_depth(self):
+        # number of updates waiting on the sink, including one being written
+        return (1 if self._pending is not None else 0) + (1 if self._busy else 0)
+
+    def wait_idle(self, timeout=None):
+        # blocks until everything submitted so far has been written
+        with self._cond:
+            return self._cond.wait_for(
+                    lambda: self._pending is None and not self._busy, timeout)
+
+    def stop(self, timeout=None):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def get_stats(self):
+        with self._cond:
+            return {
+                'queue_depth': self.queue_depth(),
+                'max_queue_depth': self._max_queue_depth,
+                'submitted': self._submitted_cnt,
+                'written': self._written_cnt,
+                'dropped': self._dropped_cnt,
+                'errors': self._error_cnt,
+                'retries': self._retry_cnt,
+            }
+
+    def print_stats(self):
+        stats = self.get_stats()
+        print(f'Label output: {stats["submitted"]} updates, {stats["written"]} written, '
+              f'{stats["dropped"]} dropped, {stats["errors"]} failed, {stats["retries"]} retried, '
+              f'max queue depth {stats["max_queue_depth"]}.')
+
+    def _take_pending(self):
+        # call with self._cond held
+        update = self._pending
+        self._pending = None
+        self._busy = True
+        return update
+
+    def _requeue_failed(self, update):
+        # call with self._cond held, after the retry delay
+        if not self._stopping:
+            self._retry_cnt += 1
+            if self._pending is not None:
+                self._pending = merge_updates(update, self._pending)
+            else:
+                self._pending = update
+
+    def _worker_thread_func(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending is not None or self._stopping)
+                if self._pending is None:
+                    # stopping and nothing left to write
+                    return
+                update = self._take_pending()
+            written = False
+            try:
+                written = self._write_func(update) is not False
+            except Exception:
+                print('ERROR: Failed writing labels:')
+                traceback.print_exc()
+            with self._cond:
+                if written:
+                    self._written_cnt += 1
+                else:
+                    self._error_cnt += 1
+                    # give the sink a moment, then try what's left again
+                    self._cond.wait_for(lambda: self._pending is not None or self._stopping,
+                                        self._retry_delay)
+                    self._requeue_failed(update)
+                self._busy = False
+                self._cond.notify_all()
+    # end of _worker_thread_func
+
+
+class AsyncLabelOutput(LabelOutput):
+    # Same as LabelOutput, but the worker is a task on an asyncio event loop
+    #  instead of a thread, and write_func is a coroutine function.
+    # submit() can still be called from any thread.
+    def __init__(self, write_func, loop, name='LabelOutput', retry_delay=0.5):
+        self._loop = loop
+        LabelOutput.__init__(self, write_func, name, retry_delay)
+
+    def _start(self, name):
+        self._wakeup = asyncio.Event()
+        self._task = self._loop.create_task(self._worker_task_func(), name=name)
+
+    def submit(self, update):
+        LabelOutput.submit(self, update)
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def stop(self, timeout=None):
+        with self._cond:
+            self._stopping = True
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def stop_async(self):
+        # for use on the loop itself: stops and waits for the last write
+        self.stop()
+        await self._task
+
+    async def _worker_task_func(self):
+        # The state gets checked again every time around, not just when
+        #  woken up, since a submit() and a stop() can both come in on the
+        #  same wakeup
+        while True:
+            with self._cond:
+                if self._pending is None and self._stopping:
+                    # stopping and nothing left to write
+                    return
+                update = self._take_pending() if self._pending is not None else None
+            if update is None:
+                await self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            written = False
+            try:
+                written = (await self._write_func(update)) is not False
+            except Exception:
+                print('ERROR: Failed writing labels:')
+                traceback.print_exc()
+            if not written:
+                # give the sink a moment, then try what's left again
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self._retry_delay)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+            with self._cond:
+                if written:
+                    self._written_cnt += 1
+                else:
+                    self._error_cnt += 1
+                    self._requeue_failed(update)
+                self._busy = False
+                self._cond.notify_all()
+    # end of _worker_task_func
@@ -0,0 +1,220 @@
+import json
+import mmap
+import re
+import threading
+import time
+from StateCache import table_to_rows, rows_to_table
+
+# What happened over the event, in the order it happened. Each event is one
+#  line of JSON appended to the history file:
+#   {"t": <epoch time>, "event": ..., "phase": ..., "match": <num>,
+#    "fields": [[field_num, {color: team_text}], ...]}
+#  events being:
+#   timer_start  the scoring manager's timer started counting down
+#   match_end    the match's timer ran out (or its page went blank)
+#   switchover   we moved on to the next match from the upcoming schedule
+#   phase_change the phase changed
+#   quads        the teams for a match showed up on the match page (or changed)
+#  fields is only there on switchover and quads.
+EVENTS = ['timer_start', 'match_end', 'switchover', 'phase_change', 'quads']
+
+_TEAM_NUM = re.compile(r'\s*(\d+)\b')
+
+
+def history_file_name(config):
+    # Returns the history file for a config, or None if it's turned off
+    try:
+        file_name = config['history_file']
+    except KeyError:
+        return None
+    if file_name is None or file_name == '':
+        return None
+    return file_name
+
+
+def team_keys(team_text):
+    # Everything a quadrant's team gets indexed under: the team number at the
+    #  start of its text ('123 Some Team') and the name after it, or just the
+    #  text if there's no number. Names are case-insensitive.
+    keys = []
+    name = team_text
+    match = _TEAM_NUM.match(team_text)
+    if match is not None:
+        keys.append(int(match.group(1)))
+        name = team_text[match.end():]
+    name = name.strip().casefold()
+    if name != '':
+        keys.append(name)
+    return keys
+
+
+def team_key(team):
+    # What to look a team up by, from its number or name (e.g. out of a
+    #  URL). None if it's blank.
+    team = str(team).strip()
+    if team.isdigit():
+        return int(team)
+    return team.casefold() if team != '' else None
+
+
+class MatchHistory():
+    # The history file, with an index of where each match's and each team's
+    #  events are in it.
+    # record() only adds the event to a list, and the writer thread appends
+    #  whatever's built up to the file every flush_period seconds, so the
+    #  polling never waits on the disk. Lookups read the events straight out
+    #  of the file through a memory map, using the index, which gets built
+    #  from the file when it's opened (so it picks up from the last run).
+    def __init__(self, file_name, flush_period=1.0):
+        self.file_name = file_name
+        self.FLUSH_PERIOD = flush_period
+        self._cond = threading.Condition()
+        self._pending = []
+        self._stopping = False
+        # index: (phase, match_num) -> [offset] of all of its events, and
+        #  -> offset of its latest quads event; each of team_keys() ->
+        #  {(phase, match_num): None} for the matches it's been in
+        self._index_lock = threading.Lock()
+        self._match_offsets = {}
+        self._last_quads = {}
+        self._team_matches = {}
+        self._map = None
+        self._map_size = 0
+        self.event_cnt = 0
+
+        self._file = open(file_name, 'ab')
+        self._end = self._file.tell()
+        self._load_index()
+        self._thread = threading.Thread(target=self._writer_thread_func, name='MatchHistory')
+        self._thread.daemon = True
+        self._thread.start()
+    # end of __init__
+
+    def record(self, event, phase, match_num, match_table=None):
+        with self._cond:
+            self._pending.append((time.time(), event, phase, match_num, match_table))
+
+    def close(self):
+        # writes out everything recorded so far
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join()
+        self._file.close()
+        with self._index_lock:
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+
+    def _load_index(self):
+        if self._end == 0:
+            return
+        with open(self.file_name, 'rb') as history_f:
+            offset = 0
+            for line in history_f:
+                if line.endswith(b'\n'):
+                    self._index_line(offset, line)
+                offset += len(line)
+        if offset > 0 and not line.endswith(b'\n'):
+            # the last run got cut off partway through a line
+            self._file.write(b'\n')
+            self._file.flush()
+            self._end = self._file.tell()
+
+    def _index_line(self, offset, line):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return
+        self.event_cnt += 1
+        match_key = (record.get('phase'), record.get('match'))
+        self._match_offsets.setdefault(match_key, []).append(offset)
+        if record.get('event') != 'quads':
+            return
+        self._last_quads[match_key] = offset
+        for field_num, quads in record.get('fields', []):
+            for team_text in quads.values():
+                for team in team_keys(team_text):
+                    self._team_matches.setdefault(team, {})[match_key] = None
+
+    def _writer_thread_func(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._stopping, self.FLUSH_PERIOD)
+                pending = self._pending
+                self._pending = []
+                stopping = self._stopping
+            if len(pending) > 0:
+                self._write(pending)
+            if stopping:
+                return
+
+    def _write(self, pending):
+        lines = []
+        for t, event, phase, match_num, match_table in pending:
+            record = {'t': round(t, 3), 'event': event, 'phase': phase, 'match': match_num}
+            if match_table is not None:
+                record['fields'] = table_to_rows(match_table)
+            lines.append(json.dumps(record, separators=(',', ':')).encode() + b'\n')
+        try:
+            self._file.write(b''.join(lines))
+            self._file.flush()
+        except OSError as e:
+            print(f'ERROR: Couldn\'t write to the history file "{self.file_name}": {e}')
+            return
+        with self._index_lock:
+            offset = self._end
+            for line in lines:
+                self._index_line(offset, line)
+                offset += len(line)
+            self._end = offset
+    # end of _write
+
+    def _read_events(self, offsets):
+        # call with self._index_lock held
+        if len(offsets) == 0:
+            return []
+        if self._map is None or self._map_size < self._end:
+            # the file's grown since it was mapped
+            if self._map is not None:
+                self._map.close()
+            with open(self.file_name, 'rb') as history_f:
+                self._map = mmap.mmap(history_f.fileno(), self._end, access=mmap.ACCESS_READ)
+            self._map_size = self._end
+        events = []
+        for offset in offsets:
+            record = json.loads(self._map[offset:self._map.find(b'\n', offset)])
+            if 'fields' in record:
+                record['fields'] = rows_to_table(record['fields'])
+            events.append(record)
+        return events
+
+    def match_events(self, match_num, phase=None):
+        # every event for the match (in any phase, unless phase is given)
+        with self._index_lock:
+            offsets = []
+            for (match_phase, num), match_offsets in self._match_offsets.items():
+                if num == match_num and (phase is None or match_phase == phase):
+                    offsets.extend(match_offsets)
+            return self._read_events(sorted(offsets))
+
+    def team_matches(self, team):
+        # [{'t', 'phase', 'match', 'field', 'color'}] for each match the team
+        #  (a team_key()) is in on the match page (going by the last time the
+        #  teams for that match changed), oldest first
+        with self._index_lock:
+            last_quads = self._read_events([self._last_quads[match_key]
+                                            for match_key in self._team_matches.get(team, {})])
+        matches = []
+        for event in sorted(last_quads, key=lambda event: event['t']):
+            for field_num, quads in event['fields'].items():
+                for color, team_text in quads.items():
+                    if team in team_keys(team_text):
+                        matches.append({'t': event['t'], 'phase': event['phase'], 'match': event['match'],
+                                        'field': field_num, 'color': color})
+        return matches
+
+    def last_played(self, team):
+        # the team's latest match from team_matches(), or None
+        matches = self.team_matches(team)
+        return matches[-1] if len(matches) > 0 else None
@@ -0,0 +1,54 @@
+from collections import namedtuple
+import threading
+
+
+# Everything about where the event's at, as one immutable record. The tables
+#  in it (match_table, upcoming) must never be changed in place either; a
+#  change means a new table.
+#   phase, match_num - the current (or upcoming, once switched over) match
+#   match_table - {field_num: {color: team}} for the current match
+#   between_matches - True once the timer's hit 0 (or the page went blank)
+#   web_time - the timer text the web pages show
+#   upcoming - {match_num: match_table} for the matches still to come
+MatchState = namedtuple('MatchState', ['phase', 'match_num', 'match_table', 'between_matches',
+                                       'web_time', 'upcoming'],
+                        defaults=['Seeding', 0, {}, False, '', {}])
+
+
+class SharedMatchState():
+    # Holds the current MatchState for the polling, switchover and webserver
+    #  threads. Readers just take get() (one attribute read) and work from
+    #  that, so they never block and never see half of a change. Writers
+    #  take turns, and each one swaps in a new MatchState that only differs
+    #  in the fields it changed; everything else is shared with the old one.
+    def __init__(self, state=None):
+        self._lock = threading.Lock()
+        self._state = MatchState() if state is None else state
+
+    def get(self):
+        return self._state
+
+    def update(self, **changes):
+        # Returns the new state
+        with self._lock:
+            self._state = self._swapped(self._state, changes)
+            return self._state
+
+    def modify(self, func):
+        # For changes that depend on the current state: func(state) returns
+        #  {field: value} (or None for no change), and nothing else can
+        #  change the state in between. Returns (old state, new state).
+        with self._lock:
+            old_state = self._state
+            changes = func(old_state)
+            if changes:
+                self._state = self._swapped(old_state, changes)
+            return old_state, self._state
+
+    @staticmethod
+    def _swapped(state, changes):
+        changes = {field: value for field, value in changes.items()
+                   if getattr(state, field) is not value}
+        if len(changes) == 0:
+            return state
+        return state._replace(**changes)
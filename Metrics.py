@@ -0,0 +1,123 @@
+import threading
+import time
+
+
+# Upper bounds of the histogram buckets, in seconds. Polls, parses and label
+#  writes are mostly well under a frame, so most of them are down there.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+PREFIX = 'scoring_parser_'
+
+# name: (type, help)
+METRIC_INFO = {
+    'http_request_seconds': ('histogram', 'Round trip of requests to the scoring manager.'),
+    'change_detection_seconds': ('histogram', 'Checking whether a fetched page changed.'),
+    'parse_seconds': ('histogram', 'Parsing a scoring manager page.'),
+    'label_write_seconds': ('histogram', 'Writing one label to its sink.'),
+    'label_latency_seconds': ('histogram', 'From receiving a match page to its labels being written.'),
+    'switchovers_total': ('counter', 'Switchovers to the upcoming match.'),
+    'poll_retries_total': ('counter', 'Match polls that failed and were retried.'),
+}
+
+
+def _series(name, labels):
+    # name{label="value",...}, or just name without any labels
+    if len(labels) == 0:
+        return PREFIX + name
+    return PREFIX + name + '{' + ','.join(f'{label}="{value}"' for label, value in labels) + '}'
+
+
+class Metrics():
+    # Timing histograms and counters for the polling hot path, for /metrics
+    #  (Prometheus text format). When not enabled, clock() and everything
+    #  that records something return straight away, so leaving the calls in
+    #  costs next to nothing.
+    #
+    # Timing something:
+    #   start = metrics.clock()
+    #   ...
+    #   metrics.observe_since('parse_seconds', start, page='match')
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        # {(name, labels): [bucket counts..., sum, count]}
+        self._histograms = {}
+        # {(name, labels): count}
+        self._counters = {}
+
+    def clock(self):
+        # None when not enabled, which observe_since() ignores
+        if not self.enabled:
+            return None
+        return time.perf_counter()
+
+    def observe_since(self, name, start, **labels):
+        if not self.enabled:
+            return
+        self.observe(name, time.perf_counter() - start, **labels)
+
+    def observe(self, name, secs, count=1, **labels):
+        # count is for that many of the same observation
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = [0] * len(BUCKETS) + [0.0, 0]
+                self._histograms[key] = hist
+            for idx, bound in enumerate(BUCKETS):
+                if secs <= bound:
+                    hist[idx] += count
+                    break
+            hist[-2] += secs * count
+            hist[-1] += count
+
+    def inc(self, name, amount=1, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def render(self, extra=None):
+        # The Prometheus text exposition. extra is more counters and gauges
+        #  from elsewhere: [(name, type, help, value, {label: value})]
+        with self._lock:
+            histograms = {key: list(hist) for key, hist in self._histograms.items()}
+            counters = dict(self._counters)
+        families = {}
+        for (name, labels), hist in sorted(histograms.items()):
+            lines = families.setdefault(name, [])
+            cumulative = 0
+            for idx, bound in enumerate(BUCKETS):
+                cumulative += hist[idx]
+                lines.append(f'{_series(name + "_bucket", labels + (("le", bound),))} {cumulative}')
+            lines.append(f'{_series(name + "_bucket", labels + (("le", "+Inf"),))} {hist[-1]}')
+            lines.append(f'{_series(name + "_sum", labels)} {hist[-2]:.6f}')
+            lines.append(f'{_series(name + "_count", labels)} {hist[-1]}')
+        for name, (metric_type, help_text) in METRIC_INFO.items():
+            if metric_type == 'counter' and not any(key[0] == name for key in counters):
+                # nothing's been counted yet
+                counters[(name, ())] = 0
+        for (name, labels), count in sorted(counters.items()):
+            families.setdefault(name, []).append(f'{_series(name, labels)} {count}')
+        info = dict(METRIC_INFO)
+        for name, metric_type, help_text, value, labels in (extra or []):
+            info.setdefault(name, (metric_type, help_text))
+            families.setdefault(name, []).append(f'{_series(name, tuple(sorted(labels.items())))} {value}')
+
+        out = []
+        for name, lines in families.items():
+            metric_type, help_text = info.get(name, ('untyped', ''))
+            out.append(f'# HELP {PREFIX}{name} {help_text}')
+            out.append(f'# TYPE {PREFIX}{name} {metric_type}')
+            out.extend(lines)
+        return '\n'.join(out) + '\n'
+    # end of render
+
+
+# for anything that's not being measured
+NO_METRICS = Metrics(enabled=False)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
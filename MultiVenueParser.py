@@ -0,0 +1,160 @@
+import asyncio
+import os.path
+import threading
+import traceback
+from aiohttp import web
+from AsyncScoringParser import AsyncScoringParser, make_client_session
+
+
+def venue_configs(config):
+    # Splits a multi-venue config up into a full config for each venue.
+    #  Everything at the top level is the default for every venue, and each
+    #  entry under 'venues' overrides whatever it needs to (base_address,
+    #  fields, files, sources, ...). Returns {venue_name: config}
+    defaults = {key: value for key, value in config.items() if key != 'venues'}
+    configs = {}
+    for idx, venue in enumerate(config['venues']):
+        venue_cfg = dict(defaults)
+        venue_cfg.update(venue)
+        try:
+            name = str(venue['name'])
+        except KeyError:
+            name = f'venue{idx+1}'
+        if name in configs:
+            print(f'WARNING: Venue name "{name}" used more than once, calling it "{name}_{idx+1}".')
+            name = f'{name}_{idx+1}'
+        for key in ['cache_file', 'history_file']:
+            if key not in venue and defaults.get(key):
+                # every venue needs its own cache and history files
+                stem, ext = os.path.splitext(defaults[key])
+                venue_cfg[key] = f'{stem}_{name}{ext}'
+        configs[name] = venue_cfg
+    return configs
+
+
+class MultiVenueParser():
+    # Runs several scoring managers (venues) from one process. Every venue is
+    #  an AsyncScoringParser with its own fields, outputs, match state and
+    #  reconnect loop, but they all run on one event loop, share one HTTP
+    #  connection pool, share an OBS websocket connection when they point at
+    #  the same OBS, and share one timer webserver, with each venue's pages
+    #  under /<venue name>/timer.
+    # A venue that fails to start (or loses its scoring manager) doesn't
+    #  affect the others.
+    def __init__(self, config):
+        self._cfg = config
+        self._venue_cfgs = venue_configs(config)
+        self._loop = asyncio.new_event_loop()
+        self._session = None
+        self._obs_clients = {}
+        self._web_runner = None
+        self.venues = {}
+
+        self.start()
+    # end of __init__
+
+    def start(self):
+        self._loop_thread = threading.Thread(target=self._loop.run_forever,
+                                             name='MultiVenueParser')
+        self._loop_thread.daemon = True
+        self._loop_thread.start()
+        asyncio.run_coroutine_threadsafe(self.start_async(), self._loop).result()
+
+    async def start_async(self):
+        pool_size = 0
+        for venue_cfg in self._venue_cfgs.values():
+            try:
+                pool_size += venue_cfg['http_pool_size']
+            except KeyError:
+                pool_size += 4
+        self._session = make_client_session(pool_size)
+
+        venues = {}
+        for name, venue_cfg in self._venue_cfgs.items():
+            try:
+                obs_client = None
+                if venue_cfg.get('use_obs_websocket', False):
+                    obs_client = await self._obs_client_for(venue_cfg)
+                venues[name] = AsyncScoringParser(venue_cfg, loop=self._loop,
+                                                  session=self._session,
+                                                  obs_client=obs_client, name=name)
+            except Exception:
+                print(f'ERROR: Failed setting up venue "{name}", skipping it:')
+                traceback.print_exc()
+
+        # start them all up together
+        names = list(venues.keys())
+        results = await asyncio.gather(*(venues[name].start_async() for name in names),
+                                       return_exceptions=True)
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                print(f'ERROR: Failed starting venue "{name}", skipping it: {result}')
+                continue
+            print(f'Venue "{name}" started, polling {venues[name]._base_addr}.')
+            self.venues[name] = venues[name]
+
+        # set up webserver, if enabled
+        if self._cfg['host_timer_webserver']:
+            await self._init_webserver_async()
+    # end of start_async
+
+    async def _obs_client_for(self, venue_cfg):
+        # one websocket connection per OBS, no matter how many venues use it
+        key = (venue_cfg['obs_websocket_addr'], venue_cfg['obs_websocket_port'])
+        if key not in self._obs_clients:
+            from AsyncObsClient import AsyncObsClient
+            obs_client = AsyncObsClient(venue_cfg['obs_websocket_addr'], venue_cfg['obs_websocket_port'],
+                                        venue_cfg['obs_websocket_pw'], session=self._session)
+            await obs_client.connect()
+            self._obs_clients[key] = obs_client
+        return self._obs_clients[key]
+
+    async def _init_webserver_async(self):
+        try:
+            ip = self._cfg['webserver_hostip']
+        except KeyError:
+            ip = '0.0.0.0'
+        try:
+            port = self._cfg['webserver_port']
+        except KeyError:
+            port = 9269
+
+        app = web.Application()
+        for name, venue in self.venues.items():
+            venue.add_web_routes(app, '/' + name)
+
+        self._web_runner = web.AppRunner(app, access_log=None)
+        await self._web_runner.setup()
+        await web.TCPSite(self._web_runner, ip, port).start()
+    # end of _init_webserver_async
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.stop_async(), self._loop).result()
+        asyncio.run_coroutine_threadsafe(self._loop.shutdown_default_executor(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join()
+
+    async def stop_async(self):
+        await asyncio.gather(*(venue.stop_async() for venue in self.venues.values()),
+                             return_exceptions=True)
+        if self._web_runner is not None:
+            await self._web_runner.cleanup()
+        for obs_client in self._obs_clients.values():
+            await obs_client.disconnect()
+        if self._session is not None:
+            await self._session.close()
+
+    def print_http_stats(self):
+        for name, venue in self.venues.items():
+            print(f'Venue "{name}":')
+            venue.print_http_stats()
+
+    def print_connection_stats(self):
+        for name, venue in self.venues.items():
+            print(f'Venue "{name}":')
+            venue.print_connection_stats()
+
+    def print_output_stats(self):
+        for name, venue in self.venues.items():
+            print(f'Venue "{name}":')
+            venue.print_output_stats()
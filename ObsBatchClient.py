@@ -0,0 +1,156 @@
+import json
+import logging
+import socket
+import threading
+import websocket
+from obswebsocket import obsws, exceptions
+from obswebsocket.core import RecvThread, ReconnectThread
+
+LOG = logging.getLogger(__name__)
+
+# obs-websocket v5 op codes
+OP_EVENT = 5
+OP_REQUEST_RESPONSE = 7
+OP_REQUEST_BATCH = 8
+OP_REQUEST_BATCH_RESPONSE = 9
+
+# RequestBatchExecutionType::SerialRealtime
+EXECUTION_SERIAL_REALTIME = 0
+
+
+class ObsBatchClient(obsws):
+    # obsws, plus support for sending a whole list of requests to OBS as a
+    #  single v5 RequestBatch, so that it only costs one round-trip.
+
+    def connect(self):
+        # Same as obsws.connect(), but with a receive thread that also
+        #  understands batch responses.
+        try:
+            self.ws = websocket.WebSocket()
+            url = "ws://{}:{}".format(self.host, self.port)
+            LOG.info("Connecting to %s..." % (url))
+            self.ws.connect(url)
+            LOG.info("Connected!")
+            if self.legacy:
+                self._auth_legacy()
+            else:
+                self._auth()
+
+            if self.thread_recv is not None:
+                self.thread_recv.running = False
+            self.thread_recv = BatchRecvThread(self)
+            self.thread_recv.daemon = True
+            self.thread_recv.start()
+            if self.on_connect:
+                self.on_connect(self)
+        except socket.error as e:
+            if self.authreconnect:
+                if not self.thread_reco:
+                    LOG.warning("Connection failed, reconnecting in %s second(s)." % (self.authreconnect))
+                    self.thread_reco = ReconnectThread(self)
+                    self.thread_reco.daemon = True
+                    self.thread_reco.start()
+                else:
+                    LOG.warning("Connection failed, but reconnect timer already running.")
+            else:
+                raise exceptions.ConnectionFailure(str(e))
+
+    def call_batch(self, objs, halt_on_failure=False):
+        # Sends all of the request objects in one RequestBatch and fills each
+        #  one in with its own result, just like call() does for one request.
+        if len(objs) == 0:
+            return objs
+        if self.legacy:
+            # no batches in the v4 protocol, fall back to one at a time
+            for obj in objs:
+                self.call(obj)
+            return objs
+
+        batch_id = str(self.id)
+        self.id += 1
+        event = threading.Event()
+        self.events[batch_id] = event
+
+        batch_requests = []
+        for idx, obj in enumerate(objs):
+            batch_requests.append({
+                "requestType": obj.name,
+                "requestId": str(idx),
+                "requestData": obj.data(),
+            })
+        payload = {
+            "op": OP_REQUEST_BATCH,
+            "d": {
+                "requestId": batch_id,
+                "haltOnFailure": halt_on_failure,
+                "executionType": EXECUTION_SERIAL_REALTIME,
+                "requests": batch_requests,
+            }
+        }
+        LOG.debug("Sending batch id {}: {}".format(batch_id, json.dumps(payload)))
+        self.ws.send(json.dumps(payload))
+
+        event.wait(self.timeout)
+        self.events.pop(batch_id)
+
+        if batch_id not in self.answers:
+            raise exceptions.MessageTimeout("No answer for batch {}".format(batch_id))
+
+        results = self.answers.pop(batch_id).get('results', [])
+        for obj in objs:
+            # anything OBS skipped (e.g. after a halt) counts as failed
+            obj.input({}, False)
+        for result in results:
+            try:
+                obj = objs[int(result['requestId'])]
+            except (KeyError, ValueError, IndexError):
+                LOG.warning("Unknown request in batch response: {}".format(result))
+                continue
+            obj.input(result.get('responseData', {}), result['requestStatus']['result'])
+        return objs
+
+
+class BatchRecvThread(RecvThread):
+
+    def run(self):
+        if self.core.legacy:
+            return RecvThread.run(self)
+
+        while self.running:
+            message = ""
+            try:
+                message = self.ws.recv()
+
+                # recv() can return an empty string (Issue #6)
+                if not message:
+                    continue
+
+                result = json.loads(message)
+                if result['op'] == OP_EVENT:
+                    LOG.debug("Got event: {}".format(result))
+                    obj = self.build_event(result['d'])
+                    self.core.eventmanager.trigger(obj)
+                elif result['op'] in (OP_REQUEST_RESPONSE, OP_REQUEST_BATCH_RESPONSE):
+                    LOG.debug("Got answer for id {}: {}".format(result['d']['requestId'], result))
+                    if result['d']['requestId'] in self.core.events:
+                        self.core.answers[result['d']['requestId']] = result['d']
+                        self.core.events[result['d']['requestId']].set()
+                else:
+                    LOG.warning("Unknown message: {}".format(result))
+
+            except websocket.WebSocketConnectionClosedException:
+                if self.running:
+                    if self.core.authreconnect:
+                        LOG.warning("Connection lost, attempting to reconnect...")
+                        self.core.reconnect()
+                    else:
+                        LOG.warning("Connection lost!")
+                        self.core.disconnect()
+                    break
+            except OSError as e:
+                if self.running:
+                    raise e
+            except (ValueError, exceptions.ObjectError) as e:
+                LOG.warning("Invalid message: {} ({})".format(message, e))
+        # end while
+        LOG.debug("RecvThread ended.")
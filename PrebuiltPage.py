@@ -0,0 +1,39 @@
+import gzip
+import hashlib
+import os.path
+
+
+class PrebuiltPage():
+    # A page that's built once and then served as-is: gzipped ahead of time,
+    #  with an ETag so that browsers can cache it and just check back with
+    #  If-None-Match.
+    # respond() works out what to send back; the webservers just send it.
+    def __init__(self, body, content_type='text/html; charset=utf-8', max_age=60):
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        self.content_type = content_type
+        self.body = body
+        self.gzipped_body = gzip.compress(body, compresslevel=9, mtime=0)
+        self.etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+        self._cache_control = f'public, max-age={max_age}'
+
+    @classmethod
+    def from_file(cls, file_name, **kwargs):
+        # file_name is relative to this module
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), file_name), 'rb') as page_f:
+            return cls(page_f.read(), **kwargs)
+
+    def respond(self, if_none_match=None, accept_encoding=None):
+        # Returns (status, headers, body)
+        headers = {
+            'ETag': self.etag,
+            'Cache-Control': self._cache_control,
+            'Vary': 'Accept-Encoding',
+        }
+        if if_none_match is not None and self.etag in [tag.strip() for tag in if_none_match.split(',')]:
+            return 304, headers, b''
+        headers['Content-Type'] = self.content_type
+        if accept_encoding is not None and 'gzip' in accept_encoding:
+            headers['Content-Encoding'] = 'gzip'
+            return 200, headers, self.gzipped_body
+        return 200, headers, self.body
@@ -0,0 +1,129 @@
+import random
+import socket
+import threading
+import time
+import urllib.parse
+
+
+def probe_address(base_address):
+    # (host, port) of the scoring manager, for probe_connection()
+    url = urllib.parse.urlsplit(base_address)
+    port = url.port
+    if port is None:
+        port = 443 if url.scheme == 'https' else 80
+    return url.hostname, port
+
+
+def probe_connection(address, timeout):
+    # Just checks that something's accepting connections at address, which
+    #  fails fast while the scoring manager PC is down or rebooting, instead
+    #  of waiting out a whole request timeout. Returns None if it is,
+    #  otherwise what went wrong.
+    try:
+        with socket.create_connection(address, timeout):
+            pass
+    except OSError as e:
+        return str(e) or e.__class__.__name__
+    return None
+
+
+class Backoff():
+    # Exponential backoff: initial_delay, then twice that, and so on up to
+    #  max_delay. Each delay is somewhere between half and all of that, so
+    #  that several parsers that lost the same scoring manager don't all
+    #  retry in lockstep.
+    def __init__(self, initial_delay, max_delay, multiplier=2.0, rng=None):
+        self.initial_delay = initial_delay
+        self.max_delay = max(max_delay, initial_delay)
+        self.multiplier = multiplier
+        self._rng = random.Random() if rng is None else rng
+        self.failures = 0
+
+    def next_delay(self):
+        delay = min(self.max_delay, self.initial_delay * self.multiplier ** min(self.failures, 32))
+        self.failures += 1
+        return delay / 2 + self._rng.uniform(0, delay / 2)
+
+    def reset(self):
+        self.failures = 0
+
+
+class ConnectionTracker():
+    # The state of the connection to the scoring manager, for the supervisor
+    #  (what to wait before the next try) and for anyone watching (the state
+    #  and the counts, see get_stats()).
+    #   connecting - haven't connected yet
+    #   connected - polling
+    #   reconnecting - lost it, trying to get it back
+    #   stopped
+    def __init__(self, initial_delay, max_delay):
+        self._lock = threading.Lock()
+        self._backoff = Backoff(initial_delay, max_delay)
+        self.state = 'connecting'
+        self._state_time = time.monotonic()
+        self.connect_cnt = 0
+        self.reconnect_cnt = 0
+        self.failed_attempt_cnt = 0
+        self.lost_cnt = 0
+        self.last_error = None
+        self.next_delay = 0.0
+        self._down_time = 0.0
+
+    def _set_state(self, state):
+        now = time.monotonic()
+        if self.state != 'connected' and self.state != 'stopped':
+            self._down_time += now - self._state_time
+        self.state = state
+        self._state_time = now
+
+    def note_failed_attempt(self, error):
+        # Returns how long to wait before trying again
+        with self._lock:
+            self.failed_attempt_cnt += 1
+            self.last_error = error
+            self.next_delay = self._backoff.next_delay()
+            return self.next_delay
+
+    def note_connected(self):
+        with self._lock:
+            if self.connect_cnt > 0:
+                self.reconnect_cnt += 1
+            self.connect_cnt += 1
+            self._backoff.reset()
+            self.next_delay = 0.0
+            self._set_state('connected')
+
+    def note_lost(self, error):
+        with self._lock:
+            self.lost_cnt += 1
+            self.last_error = error
+            self._set_state('reconnecting')
+
+    def note_stopped(self):
+        with self._lock:
+            self._set_state('stopped')
+
+    def get_stats(self):
+        with self._lock:
+            down_time = self._down_time
+            if self.state != 'connected' and self.state != 'stopped':
+                down_time += time.monotonic() - self._state_time
+            return {
+                'state': self.state,
+                'connects': self.connect_cnt,
+                'reconnects': self.reconnect_cnt,
+                'failed_attempts': self.failed_attempt_cnt,
+                'lost': self.lost_cnt,
+                'last_error': self.last_error,
+                'next_delay': round(self.next_delay, 3),
+                'down_time': round(down_time, 3),
+            }
+
+    def print_stats(self):
+        stats = self.get_stats()
+        print(f'Connection: {stats["state"]}, {stats["connects"]} connects '
+              f'({stats["reconnects"]} reconnects), {stats["lost"]} lost, '
+              f'{stats["failed_attempts"]} failed attempts, '
+              f'{stats["down_time"]:.1f} s without a connection')
+        if stats['last_error'] is not None:
+            print(f'  last error: {stats["last_error"]}')
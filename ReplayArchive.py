@@ -0,0 +1,118 @@
+import bisect
+import gzip
+import hashlib
+import json
+import time
+
+
+# A recording of the scoring manager's pages over an event, for
+#  replay_scoring_manager.py to play back. It's gzipped JSON lines:
+#   {"format": 1, "base_address": ..., "started": <epoch time>}  first line
+#   {"body": <id>, "text": ...}  a page body, the first time it's seen
+#   {"t": <secs>, "endpoint": ..., "status": <code>, "body": <id>}
+# Only changes get recorded: a new line for an endpoint only when its status
+#  or body is different from last time, so a whole day of polling 10 times a
+#  second mostly comes down to one line per timer tick. A status of 0 means
+#  the scoring manager didn't answer at all.
+FORMAT_VERSION = 1
+NO_RESPONSE = 0
+
+
+class ArchiveWriter():
+    def __init__(self, file_name, base_address, started=None):
+        self._file = gzip.open(file_name, 'wt', encoding='utf-8')
+        self._started = time.time() if started is None else started
+        self._body_ids = {}
+        self._last = {}
+        self.change_cnt = 0
+        self._write_line({'format': FORMAT_VERSION, 'base_address': base_address,
+                          'started': self._started})
+
+    def _write_line(self, record):
+        self._file.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+    def record(self, endpoint, status, content=b'', t=None):
+        # t is seconds since the start of the recording, now by default.
+        #  Returns True if it was a change (and got written).
+        if t is None:
+            t = time.time() - self._started
+        fingerprint = hashlib.blake2b(content, digest_size=16).digest()
+        if self._last.get(endpoint) == (status, fingerprint):
+            return False
+        self._last[endpoint] = (status, fingerprint)
+        body_id = self._body_ids.get(fingerprint)
+        if body_id is None:
+            body_id = len(self._body_ids)
+            self._body_ids[fingerprint] = body_id
+            self._write_line({'body': body_id, 'text': content.decode('utf-8', 'replace')})
+        self._write_line({'t': round(t, 3), 'endpoint': endpoint, 'status': status, 'body': body_id})
+        self.change_cnt += 1
+        return True
+
+    def body_cnt(self):
+        return len(self._body_ids)
+
+    def close(self):
+        self._file.close()
+
+
+class ReplayArchive():
+    # A recording, loaded for playback: page_at() says what an endpoint
+    #  looked like at any point in it.
+    def __init__(self, file_name):
+        bodies = {}
+        self._times = {}
+        self._pages = {}
+        self.duration = 0.0
+        with gzip.open(file_name, 'rt', encoding='utf-8') as archive_f:
+            header = json.loads(archive_f.readline())
+            if header.get('format') != FORMAT_VERSION:
+                raise ValueError(f'"{file_name}" isn\'t a scoring manager recording this can read.')
+            self.base_address = header.get('base_address')
+            self.started = header.get('started')
+            for line in archive_f:
+                record = json.loads(line)
+                if 'text' in record:
+                    bodies[record['body']] = record['text'].encode('utf-8')
+                    continue
+                endpoint = record['endpoint']
+                self._times.setdefault(endpoint, []).append(record['t'])
+                self._pages.setdefault(endpoint, []).append((record['status'], bodies[record['body']]))
+                self.duration = max(self.duration, record['t'])
+
+    def endpoints(self):
+        return list(self._pages.keys())
+
+    def page_at(self, endpoint, t):
+        # Returns (status, body) for the endpoint at t seconds in. Before its
+        #  first recorded response, that's the first one.
+        times = self._times.get(endpoint)
+        if times is None:
+            return NO_RESPONSE, b''
+        idx = max(0, bisect.bisect_right(times, t) - 1)
+        return self._pages[endpoint][idx]
+
+    def changes(self, endpoint):
+        # [(t, status, body)] for every change to the endpoint
+        return [(t, status, body) for t, (status, body)
+                in zip(self._times.get(endpoint, []), self._pages.get(endpoint, []))]
+
+
+def iter_new_pages(file_name):
+    # Goes through a recording a line at a time, without loading it all,
+    #  yielding (t, endpoint, status, content) just for the first time each
+    #  page body shows up. (A body's line always comes right before the
+    #  change that first has it.)
+    with gzip.open(file_name, 'rt', encoding='utf-8') as archive_f:
+        header = json.loads(archive_f.readline())
+        if header.get('format') != FORMAT_VERSION:
+            raise ValueError(f'"{file_name}" isn\'t a scoring manager recording this can read.')
+        new_body = None
+        for line in archive_f:
+            record = json.loads(line)
+            if 'text' in record:
+                new_body = (record['body'], record['text'].encode('utf-8'))
+                continue
+            if new_body is not None and record['body'] == new_body[0]:
+                yield record['t'], record['endpoint'], record['status'], new_body[1]
+            new_body = None
@@ -0,0 +1,143 @@
+import heapq
+import itertools
+import threading
+import time
+import traceback
+
+
+class ScheduledCall():
+    # What call_at()/call_later() hand back. cancel() it to make sure it
+    #  never runs.
+    __slots__ = ['deadline', 'seq', 'func', 'args', 'state', '_scheduler']
+
+    WAITING = 0
+    RUNNING = 1
+    DONE = 2
+    CANCELLED = 3
+
+    def __init__(self, scheduler, deadline, seq, func, args):
+        self._scheduler = scheduler
+        self.deadline = deadline
+        self.seq = seq
+        self.func = func
+        self.args = args
+        self.state = self.WAITING
+
+    def __lt__(self, other):
+        # earliest first, and in the order they were scheduled for a tie
+        return (self.deadline, self.seq) < (other.deadline, other.seq)
+
+    def cancel(self):
+        # Returns True if it was still waiting to run, in which case it now
+        #  never will. False if it's already run (or is running right now,
+        #  on the scheduler thread) or was already cancelled.
+        return self._scheduler._cancel(self)
+
+    def pending(self):
+        return self.state == self.WAITING
+
+
+class Scheduler():
+    # Runs functions at given times, all on one thread, in deadline order,
+    #  instead of a threading.Timer (and a thread) for every one of them.
+    #  Deadlines are on the time.monotonic() clock, so changes to the system
+    #  clock don't affect them.
+    # Functions should be quick: anything slow holds up everything else
+    #  that's due.
+    def __init__(self, name='Scheduler'):
+        self._cond = threading.Condition()
+        self._queue = []
+        self._seq = itertools.count()
+        self._cancelled_cnt = 0
+        self._stopping = False
+
+        self._run_cnt = 0
+        self._max_lateness = 0.0
+
+        self._thread = threading.Thread(target=self._worker_thread_func, name=name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    @staticmethod
+    def time():
+        return time.monotonic()
+
+    def call_at(self, deadline, func, *args):
+        with self._cond:
+            call = ScheduledCall(self, deadline, next(self._seq), func, args)
+            heapq.heappush(self._queue, call)
+            if self._queue[0] is call:
+                # new earliest deadline, so the worker needs to wake up sooner
+                self._cond.notify()
+            return call
+
+    def call_later(self, delay, func, *args):
+        return self.call_at(self.time() + delay, func, *args)
+
+    def _cancel(self, call):
+        with self._cond:
+            if call.state != ScheduledCall.WAITING:
+                return False
+            call.state = ScheduledCall.CANCELLED
+            # it stays in the queue until it comes up, unless cancelled
+            #  calls start to pile up
+            self._cancelled_cnt += 1
+            if self._cancelled_cnt > 64 and self._cancelled_cnt > len(self._queue) // 2:
+                self._queue = [queued for queued in self._queue
+                               if queued.state == ScheduledCall.WAITING]
+                heapq.heapify(self._queue)
+                self._cancelled_cnt = 0
+            return True
+
+    def _next_due(self):
+        # Waits for the next call to come due, and returns it (marked as
+        #  running), or None once stopped
+        with self._cond:
+            while not self._stopping:
+                if len(self._queue) == 0:
+                    self._cond.wait()
+                    continue
+                call = self._queue[0]
+                if call.state == ScheduledCall.CANCELLED:
+                    heapq.heappop(self._queue)
+                    self._cancelled_cnt = max(0, self._cancelled_cnt - 1)
+                    continue
+                delay = call.deadline - self.time()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._queue)
+                call.state = ScheduledCall.RUNNING
+                self._run_cnt += 1
+                self._max_lateness = max(self._max_lateness, -delay)
+                return call
+            return None
+    # end of _next_due
+
+    def _worker_thread_func(self):
+        while True:
+            call = self._next_due()
+            if call is None:
+                return
+            try:
+                call.func(*call.args)
+            except Exception:
+                print(f'ERROR: Scheduled call to {call.func} failed:')
+                traceback.print_exc()
+            call.state = ScheduledCall.DONE
+    # end of _worker_thread_func
+
+    def stop(self, timeout=None):
+        # Anything still waiting doesn't get run
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def get_stats(self):
+        with self._cond:
+            return {
+                'run': self._run_cnt,
+                'waiting': len(self._queue) - self._cancelled_cnt,
+                'max_lateness': self._max_lateness,
+            }
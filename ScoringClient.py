@@ -0,0 +1,182 @@
+import requests
+from requests.adapters import HTTPAdapter
+import threading
+import hashlib
+from Metrics import NO_METRICS
+
+class ScoringClient():
+    # path for each of the scoring manager pages we pull from
+    ENDPOINTS = {
+        'match':    '/Marquee/Match',
+        'upcoming': '/Marquee/PitRefresh',
+        'phase':    '/phase',
+        'lookup':   '/lookup',
+    }
+
+    def __init__(self, base_address, pool_size=4, timeouts=None, default_timeout=5.0):
+        self._init_common(base_address, timeouts, default_timeout)
+
+        # One session for all requests, so that connections get kept alive
+        #  and reused instead of doing a new TCP connection for every poll.
+        self._session = requests.Session()
+        self._adapter = HTTPAdapter(pool_connections=pool_size,
+                                    pool_maxsize=pool_size)
+        self._session.mount('http://', self._adapter)
+        self._session.mount('https://', self._adapter)
+
+    def _init_common(self, base_address, timeouts, default_timeout):
+        self._base_addr = base_address
+        self._default_timeout = default_timeout
+        self._timeouts = {}
+        if timeouts is not None:
+            for endpoint, timeout in timeouts.items():
+                if endpoint not in self.ENDPOINTS:
+                    print(f'WARNING: Ignoring timeout for unknown endpoint "{endpoint}".')
+                    continue
+                self._timeouts[endpoint] = float(timeout)
+
+        self._stats_lock = threading.Lock()
+        self._request_cnt = {endpoint: 0 for endpoint in self.ENDPOINTS}
+        self._error_cnt = {endpoint: 0 for endpoint in self.ENDPOINTS}
+        self._unchanged_cnt = {endpoint: 0 for endpoint in self.ENDPOINTS}
+
+        # last seen fingerprint and cache validators for each endpoint
+        self._fingerprints = {}
+        self._validators = {}
+        # where get_if_changed() timings go, if anywhere
+        self.metrics = NO_METRICS
+
+    @classmethod
+    def from_config(cls, config, default_timeout=5.0, **kwargs):
+        try:
+            pool_size = config['http_pool_size']
+        except KeyError:
+            pool_size = 4
+        try:
+            timeouts = config['http_timeouts']
+        except KeyError:
+            timeouts = None
+        return cls(config['base_address'], pool_size, timeouts, default_timeout, **kwargs)
+
+    def timeout_for(self, endpoint):
+        return self._timeouts.get(endpoint, self._default_timeout)
+
+    def url_for(self, endpoint):
+        return self._base_addr + self.ENDPOINTS[endpoint]
+
+    def _count_request(self, endpoint):
+        with self._stats_lock:
+            self._request_cnt[endpoint] += 1
+
+    def _count_error(self, endpoint):
+        with self._stats_lock:
+            self._error_cnt[endpoint] += 1
+
+    def get(self, endpoint, **kwargs):
+        if 'timeout' not in kwargs:
+            kwargs['timeout'] = self.timeout_for(endpoint)
+        self._count_request(endpoint)
+        try:
+            return self._session.get(self.url_for(endpoint), **kwargs)
+        except requests.exceptions.RequestException:
+            self._count_error(endpoint)
+            raise
+
+    def get_if_changed(self, endpoint):
+        # Returns (resp, changed). 'changed' is False when the server says
+        #  the page is not modified (304) or when the body is byte-for-byte
+        #  the same as the last one seen for this endpoint.
+        start = self.metrics.clock()
+        resp = self.get(endpoint, headers=self._conditional_headers(endpoint))
+        self.metrics.observe_since('http_request_seconds', start, endpoint=endpoint)
+        return resp, self._check_changed_timed(endpoint, resp)
+
+    def _check_changed_timed(self, endpoint, resp):
+        start = self.metrics.clock()
+        changed = self._check_changed(endpoint, resp)
+        self.metrics.observe_since('change_detection_seconds', start, endpoint=endpoint)
+        return changed
+
+    def _conditional_headers(self, endpoint):
+        headers = {}
+        etag, last_modified = self._validators.get(endpoint, (None, None))
+        if etag is not None:
+            headers['If-None-Match'] = etag
+        if last_modified is not None:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+    def _check_changed(self, endpoint, resp):
+        if resp is None:
+            return True
+
+        if resp.status_code == 304:
+            with self._stats_lock:
+                self._unchanged_cnt[endpoint] += 1
+            return False
+        if resp.status_code != 200:
+            return True
+
+        fingerprint = hashlib.blake2b(resp.content, digest_size=16).digest()
+        self._validators[endpoint] = (resp.headers.get('ETag'),
+                                      resp.headers.get('Last-Modified'))
+        if self._fingerprints.get(endpoint) == fingerprint:
+            with self._stats_lock:
+                self._unchanged_cnt[endpoint] += 1
+            return False
+        self._fingerprints[endpoint] = fingerprint
+        return True
+
+    def forget(self, endpoint):
+        # drop the fingerprint so that the next get_if_changed() is always
+        #  treated as a change
+        self._fingerprints.pop(endpoint, None)
+        self._validators.pop(endpoint, None)
+
+    def _connection_counts(self):
+        # Sum up what urllib3 has seen across all of the pools. Every request
+        #  that didn't need a new connection was served from the pool.
+        num_connections = 0
+        num_requests = 0
+        pools = self._adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            try:
+                pool = pools[key]
+            except KeyError:
+                # evicted while we were looking, skip it
+                continue
+            num_connections += pool.num_connections
+            num_requests += pool.num_requests
+        return num_connections, num_requests
+
+    def get_stats(self):
+        num_connections, num_requests = self._connection_counts()
+        with self._stats_lock:
+            stats = {
+                'requests': dict(self._request_cnt),
+                'errors': dict(self._error_cnt),
+                'unchanged': dict(self._unchanged_cnt),
+            }
+        stats['connections_opened'] = num_connections
+        stats['connections_reused'] = max(num_requests - num_connections, 0)
+        if num_requests > 0:
+            stats['reuse_ratio'] = stats['connections_reused'] / num_requests
+        else:
+            stats['reuse_ratio'] = 0.0
+        return stats
+
+    def print_stats(self):
+        stats = self.get_stats()
+        total = sum(stats['requests'].values())
+        print(f'HTTP client: {total} requests, '
+              f'{stats["connections_opened"]} connections opened, '
+              f'{stats["connections_reused"]} reused '
+              f'({stats["reuse_ratio"]*100:.1f}% reuse).')
+        match_cnt = stats['requests']['match']
+        if match_cnt > 0:
+            unchanged_cnt = stats['unchanged']['match']
+            print(f'HTTP client: {unchanged_cnt} of {match_cnt} match polls unchanged '
+                  f'({unchanged_cnt/match_cnt*100:.1f}% skipped).')
+
+    def close(self):
+        self._session.close()
@@ -0,0 +1,233 @@
+from collections import namedtuple
+import lxml.html
+from lxml import etree
+from lxml.cssselect import CSSSelector
+
+QUAD_COLORS = ['red', 'green', 'blue', 'yellow']
+
+# Parsed /Marquee/Match page. Any part that couldn't be found is None.
+#  fields is {field_num: {color: team_text}}
+MatchPage = namedtuple('MatchPage', ['timer', 'phase', 'match_num', 'fields', 'errors'])
+# One row of the /Marquee/PitRefresh table. quads is {color: team_text}
+UpcomingRow = namedtuple('UpcomingRow', ['match_num', 'field_num', 'quads'])
+# Parsed /Marquee/PitRefresh page. rows is None if no rows were found.
+UpcomingPage = namedtuple('UpcomingPage', ['rows', 'errors'])
+# Parsed /phase page. phase is None if it couldn't be parsed.
+PhasePage = namedtuple('PhasePage', ['phase', 'errors'])
+# Parsed /lookup page. teams is a list of (team_num, team_name), or None
+#  if the team list couldn't be found.
+LookupPage = namedtuple('LookupPage', ['teams', 'errors'])
+
+
+def _text(elem):
+    return elem.text if elem.text is not None else ''
+
+
+def _classes(elem):
+    return elem.get('class', '').split()
+
+
+class ScoringPageParser():
+    # All of the selectors get compiled down to XPath once, up front, instead
+    #  of running the CSS selector engine for every element on every poll.
+    def __init__(self, quad_colors=QUAD_COLORS):
+        self.QUAD_COLORS = list(quad_colors)
+
+        self._sel_timer = CSSSelector('.nameAndTimer > h2')
+        self._sel_phase_and_num = CSSSelector('.nameAndTimer > h3')
+        self._sel_fields = CSSSelector('.fields > .field')
+        self._sel_field_rows = CSSSelector('table > tr')
+
+        self._sel_upcoming_rows = CSSSelector('table > tbody > tr')
+
+        self._sel_phase = CSSSelector('h2')
+
+        self._sel_team_select = CSSSelector('#LookupInfo > .row > select.form-control:first-of-type')
+        # skip the first (selected) option, get the rest
+        self._sel_team_options = CSSSelector('option[selected] ~ option')
+
+    def load(self, content):
+        # Returns the parsed document root, or None if the document is empty
+        #  (or otherwise couldn't be parsed at all).
+        try:
+            return lxml.html.fromstring(content)
+        except (etree.ParserError, ValueError):
+            return None
+
+    def parse_match_page(self, content):
+        # Returns None if the document is empty, which means that we're
+        #  between matches.
+        root = self.load(content)
+        if root is None:
+            return None
+
+        errors = []
+
+        elem_timer = self._sel_timer(root)
+        timer = _text(elem_timer[0]) if elem_timer else None
+
+        phase = None
+        match_num = None
+        elem_phase_and_num = self._sel_phase_and_num(root)
+        if elem_phase_and_num:
+            split_str = _text(elem_phase_and_num[0]).split(' ')
+            phase = split_str[0]
+            try:
+                match_num = int(split_str[-1])
+            except ValueError:
+                errors.append(f'Error parsing match number from "{split_str[-1]}".')
+
+        fields = None
+        elem_fields = self._sel_fields(root)
+        if elem_fields:
+            fields = {}
+            for elem_field in elem_fields:
+                # walk the field's table once, picking out the field number
+                #  and each of the quadrants as we go
+                field_num = None
+                quads = {}
+                for elem_row in self._sel_field_rows(elem_field):
+                    for elem_cell in elem_row:
+                        if elem_cell.tag == 'th':
+                            if field_num is None:
+                                field_num = _text(elem_cell)[6:]
+                        elif elem_cell.tag == 'td':
+                            for cls in _classes(elem_cell):
+                                if cls.startswith('light-'):
+                                    color = cls[6:]
+                                    if color in self.QUAD_COLORS and color not in quads:
+                                        quads[color] = _text(elem_cell).strip()
+                try:
+                    field_num = int(field_num)
+                except (TypeError, ValueError):
+                    errors.append('Failed parsing field number.')
+                    continue
+                for color in self.QUAD_COLORS:
+                    if color not in quads:
+                        errors.append(f'Error parsing {color} quad on field {field_num}.')
+                fields[field_num] = quads
+
+        return MatchPage(timer, phase, match_num, fields, errors)
+    # end of parse_match_page
+
+    def parse_upcoming_page(self, content):
+        root = self.load(content)
+        if root is None:
+            return UpcomingPage(None, [])
+
+        elem_rows = self._sel_upcoming_rows(root)
+        if not elem_rows:
+            return UpcomingPage(None, [])
+
+        errors = []
+        rows = []
+        for elem_row in elem_rows:
+            row = self.parse_upcoming_row(elem_row)
+            if row is None:
+                # just skip this row
+                continue
+            if isinstance(row, str):
+                errors.append(row)
+                continue
+            rows.append(row)
+        return UpcomingPage(rows, errors)
+    # end of parse_upcoming_page
+
+    def parse_upcoming_row(self, elem_row):
+        # Returns an UpcomingRow, None if the row doesn't have a match/field
+        #  cell, or an error string if that cell couldn't be parsed.
+        match_field_text = None
+        quads = {}
+        for elem_cell in elem_row.iter('td'):
+            if match_field_text is None and elem_cell.get('style') == 'white-space:nowrap':
+                match_field_text = _text(elem_cell)
+            for cls in _classes(elem_cell):
+                if cls in self.QUAD_COLORS and cls not in quads:
+                    # TODO: unescape html?
+                    quads[cls] = _text(elem_cell).strip()
+        if match_field_text is None:
+            return None
+
+        match_split = match_field_text.split(' - ')
+        try:
+            match_num = int(match_split[0])
+            field_num = int(match_split[1])
+        except (IndexError, ValueError):
+            return 'Failed parsing out upcoming match table match number & field number. Skipping row and attempting to continue.'
+
+        for color in self.QUAD_COLORS:
+            if color not in quads:
+                # fill in with blank
+                quads[color] = ''
+        return UpcomingRow(match_num, field_num, quads)
+    # end of parse_upcoming_row
+
+    def parse_upcoming_row_chunks(self, chunks):
+        # Parses the raw HTML of a handful of upcoming table rows (each one
+        #  '<tr>...</tr>') all in one go. Returns a list with the same thing
+        #  parse_upcoming_row() would return for each chunk, or None if the
+        #  chunks didn't turn out to be exactly one row each.
+        root = self.load(b'<table><tbody>' + b''.join(chunks) + b'</tbody></table>')
+        if root is None:
+            return None
+        elem_rows = self._sel_upcoming_rows(root)
+        if len(elem_rows) != len(chunks):
+            return None
+        return [self.parse_upcoming_row(elem_row) for elem_row in elem_rows]
+
+    def upcoming_rows_to_table(self, rows):
+        # {match_num: {field_num: {color: team_text}}}, the same shape as
+        #  the current match table
+        table = {}
+        for row in rows:
+            if row.match_num not in table:
+                table[row.match_num] = {}
+            table[row.match_num][row.field_num] = dict(row.quads)
+        return table
+
+    def parse_phase_page(self, content):
+        root = self.load(content)
+        if root is None:
+            return PhasePage(None, ['Couldn\'t find phase header line in the phase schedule.'])
+
+        elem_phase = self._sel_phase(root)
+        if not elem_phase:
+            # no phase found
+            return PhasePage(None, ['Couldn\'t find phase header line in the phase schedule.'])
+
+        header = _text(elem_phase[0])
+        if header[-6:] == ' Phase':
+            return PhasePage(header[:-6], [])
+        return PhasePage(None, [f'Not sure how to parse the phase from the header text "{header}".'])
+    # end of parse_phase_page
+
+    def parse_lookup_page(self, content):
+        root = self.load(content)
+        if root is None:
+            return LookupPage(None, ['Couldn\'t find team list selection in lookup page.'])
+
+        elem_team_select = self._sel_team_select(root)
+        if not elem_team_select:
+            # no team list
+            return LookupPage(None, ['Couldn\'t find team list selection in lookup page.'])
+
+        elem_options = []
+        for elem_select in elem_team_select:
+            elem_options.extend(self._sel_team_options(elem_select))
+        if not elem_options:
+            # no team list
+            return LookupPage(None, ['Couldn\'t find team list options in lookup page.'])
+
+        errors = []
+        teams = []
+        for elem_option in elem_options:
+            try:
+                team_num = int(elem_option.values()[-1])
+                team_name = _text(elem_option).split(' (')[0]
+                teams.append((team_num, team_name))
+            except ValueError:
+                errors.append(f'Failed to parse number: "{elem_option.values()[-1]}". Skipping.')
+            except IndexError:
+                errors.append(f'Indexing error for option with text "{elem_option.text}"')
+        return LookupPage(teams, errors)
+    # end of parse_lookup_page
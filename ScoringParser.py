@@ -1,238 +1,688 @@
 import requests
 import threading
-import os.path
 import math
-from pyquery import PyQuery as pq
-from flask import Flask, jsonify
-import logging
-from obswebsocket import obsws, requests as obsreqs
+import time
+import traceback
+# flask and obswebsocket only get imported if the webserver or the OBS
+#  websocket is actually turned on, since they take a while to load
+from LabelOutput import LabelOutput, LabelUpdate
+from FileLabelSink import FileLabelSink
 import sys
+import contextlib
+from ScoringClient import ScoringClient
+from ScoringPageParser import ScoringPageParser
+from UpcomingMatches import UpcomingMatches
+from StateCache import StateCache, cache_file_name, table_to_rows, rows_to_table
+from MatchHistory import MatchHistory, history_file_name, team_key
+from TimerModel import TimerModel, parse_timer_text
+from Scheduler import Scheduler
+from MatchState import SharedMatchState
+from Reconnect import ConnectionTracker, probe_address, probe_connection
+import Metrics
+from StateBroadcaster import StateBroadcaster, sse_message, SSE_KEEPALIVE, SSE_KEEPALIVE_PERIOD
+from PrebuiltPage import PrebuiltPage
+import json
 
 class ScoringParser():
-    def __init__(self, config):
+    # Pass in a StartupTimer to get a breakdown of how long startup took.
+    def __init__(self, config, startup_timer=None):
+        self._init_state(config)
+        self._startup = startup_timer
+        
+        # shared keep-alive client for all scoring manager requests
+        self._client = ScoringClient.from_config(config, self.CONNECTION_TIMEOUT)
+        self._client.metrics = self._metrics
+        self._startup_mark('setup')
+        
+        if not self._use_obsws:
+            # do file-based changes
+            self._init_file_sink()
+            self._startup_mark('label files')
+        else:
+            # do OBS websocket -based changes
+            self._init_obsws()
+        
+        # labels get written by the output stage's own thread, not the
+        #  polling thread
+        self._output = LabelOutput(self._write_labels)
+        
+        # switchovers and the manual timer's ticks all run on this one thread
+        self._scheduler = Scheduler('ScoringScheduler')
+        
+        self.start()
+    # end of __init__
+    
+    def _startup_mark(self, phase):
+        if self._startup is not None:
+            self._startup.mark(phase)
+    
+    def _note_labels_written(self):
+        if self._startup is not None and len(self._label_text) > 0:
+            self._startup.note_label_written()
+    
+    def _init_state(self, config):
         self._cfg = config
         self._base_addr = config['base_address']
         
-        self._stop_connect_retry_flag = threading.Event()
-        self._stop_parsing_flag = threading.Event()
+        # set by stop()
+        self._stop_flag = threading.Event()
+        self._web_server = None
         self.CONNECTION_RETRY_DELAY = 1.0
         self.CONNECTION_TIMEOUT = 5.0
+        # While the scoring manager's unreachable, the tries back off from
+        #  CONNECTION_RETRY_DELAY up to reconnect_max_delay apart. Each try
+        #  starts with a quick check that its port is open at all, which
+        #  gives up after reconnect_probe_timeout.
+        try:
+            reconnect_max_delay = config['reconnect_max_delay']
+        except KeyError:
+            reconnect_max_delay = 15.0
+        try:
+            self.PROBE_TIMEOUT = config['reconnect_probe_timeout']
+        except KeyError:
+            self.PROBE_TIMEOUT = 1.0
+        self._probe_addr = probe_address(self._base_addr)
+        self._connection = ConnectionTracker(self.CONNECTION_RETRY_DELAY, reconnect_max_delay)
+        
+        # With metrics turned on, there are timings for each step from
+        #  polling the scoring manager to the labels being written, and
+        #  they're up at /metrics
+        try:
+            metrics_enabled = bool(config['metrics'])
+        except KeyError:
+            metrics_enabled = False
+        self._metrics = Metrics.Metrics() if metrics_enabled else Metrics.NO_METRICS
+        # when the match page being handled on this thread was received
+        self._response_local = threading.local()
         self.PARSING_PERIOD = config['parsing_period']
+        # Polling slows down (by PARSING_BACKOFF each time) up to the idle
+        #  period while we're sitting between matches with nothing scheduled.
+        try:
+            self.IDLE_PARSING_PERIOD = max(config['idle_parsing_period'], self.PARSING_PERIOD)
+        except KeyError:
+            self.IDLE_PARSING_PERIOD = self.PARSING_PERIOD
+        try:
+            self.PARSING_BACKOFF = max(config['parsing_backoff'], 1.0)
+        except KeyError:
+            self.PARSING_BACKOFF = 1.5
+        self._poll_delay = self.PARSING_PERIOD
         
         self.QUAD_COLORS = ['red', 'green', 'blue', 'yellow']
+        self._page_parser = ScoringPageParser(self.QUAD_COLORS)
         
         self.connected_status = False
 
         self.QUICK_RETRY_MAX_CNT = 4
         
-        self._between_matches = False
-        self._upcoming_matches = {}
+        # The upcoming match table gets kept up to date in the background
+        #  (every upcoming_refresh_period, and right after each match), so
+        #  that it's ready to go when it's time to switch over
+        self._upcoming_store = UpcomingMatches(self._page_parser)
+        try:
+            self.UPCOMING_REFRESH_PERIOD = config['upcoming_refresh_period']
+        except KeyError:
+            self.UPCOMING_REFRESH_PERIOD = 15.0
+        self._refresh_upcoming_flag = threading.Event()
         self._quick_rety_cnt = 0
         
-        self._cur_match_phase = 'Seeding'
-        self._cur_match_num = 0
-        self._cur_match_table = {}
-        self._prev_match_phase = ''
-        self._prev_match_num = 0
-        self._prev_match_table = {}
+        # The polling, switchover and webserver threads all share the match
+        #  state (phase, match number, tables, timer text) through this. Take
+        #  one get() and work from that; changes go through update() or
+        #  modify(), never by changing the state or its tables in place.
+        self._match_state = SharedMatchState()
         
-        self._cur_web_time = ''
-        self._prev_timer_text = None
+        # what the web pages show, for pushing changes out to them
+        self._state_hub = StateBroadcaster()
+        # built once, not on every request
+        self._timer_page = PrebuiltPage.from_file('timer_page.html')
+        
+        # If enabled, the timer keeps counting down between polls and gets
+        #  shown at timer_display_rate, with the polls just keeping it in sync
+        try:
+            self._extrapolate_timer = bool(config['timer_extrapolation'])
+        except KeyError:
+            self._extrapolate_timer = False
+        try:
+            drift_threshold = config['timer_drift_threshold']
+        except KeyError:
+            drift_threshold = 1.0
+        try:
+            self.TIMER_DISPLAY_PERIOD = 1.0 / config['timer_display_rate']
+        except KeyError:
+            self.TIMER_DISPLAY_PERIOD = 0.1
+        # a tick can come up to a couple of polls late before it counts as
+        #  being paused
+        self._timer_model = TimerModel(drift_threshold,
+                                       pause_time=1.0 + max(0.5, 2*self.PARSING_PERIOD))
+        # Held from reading the timer (model or page) through to setting the
+        #  web time and handing off the label, by both the display thread and
+        #  the polling, so the display thread can never overwrite a newer
+        #  polled time (like the final 00:00) with one it read before it.
+        self._timer_display_lock = threading.Lock()
+        
+        # Last text successfully written to each label, keyed by label:
+        #  'timer', 'match', or (field_num, color) for the quadrants
+        self._label_text = {}
+        self._field_nums = [idx+1 for idx in range(len(config['fields']))]
         
         self._cur_manual_timer_seconds = 0
+        # The manual timer counts down from manual_timer_length once the
+        #  scoring manager's timer starts for a match, and runs on its own
+        #  from there. It ends at _manual_timer_end (on the monotonic clock).
+        try:
+            self.MANUAL_TIMER_LENGTH = config['manual_timer_length']
+        except KeyError:
+            self.MANUAL_TIMER_LENGTH = 180
+        self._manual_timer_lock = threading.Lock()
+        self._manual_timer_end = None
+        self._manual_timer_call = None
+        # (phase, match_num) the scoring manager's timer was last seen
+        #  starting for, and the last (phase, match_num, seconds) polled
+        self._timer_started_match = None
+        self._last_polled_timer = None
         self._last_text_timer = ''
         self._last_test_field = []
         
-        # inner helper for opening files safely
-        def try_open_file(fname, rel_path):
-            if fname is None or fname == '':
-                return None
-            try:
-                return open(os.path.join(rel_path, fname), 'w')
-            except FileNotFoundError:
-                print(f'Could not open file "{os.path.join(rel_path, fname)}", not found.')
-                
-        if ('use_obs_websocket' not in config) or (not config['use_obs_websocket']):
-            # do file-based changes
-            # open up all the files:
-            self._timer_f = try_open_file(config['timer_file'], config['rel_file_path'])
-            self._mnum_f = try_open_file(config['match_num_file'], config['rel_file_path'])
-            self._field_fs = {}
-            for idx, field in enumerate(config['fields']):
-                self._field_fs[idx+1] = {}
-                for color in self.QUAD_COLORS:
-                    self._field_fs[idx+1][color] = try_open_file(
-                                    field[color+'_file'], config['rel_file_path'])
-            # set the right label change functions
-            self.set_timer_label = self.set_timer_label_file
-            self.set_match_label = self.set_match_label_file
-            self.set_quadrant_labels = self.set_quadrant_labels_file
-        else:
-            # do OBS websocket -based changes
-            self._obs_client = obsws(config['obs_websocket_addr'], config['obs_websocket_port'], config['obs_websocket_pw'])
-            self._obs_client.connect()
-            
-            
-            if self._obs_config_and_validate_text(config['timer_source']):
-                self._timer_src = config['timer_source']
-            else:
-                print('Errors encountered while validating timer source.')
-                print('WARNING: Will continue with NO timer source setting.')
-                self._timer_src = None
-                
+        self._use_obsws = ('use_obs_websocket' in config) and bool(config['use_obs_websocket'])
+        
+        self.team_num2name = {}
+        self.team_name2num = {}
+        # set when the team list came out of the cache and still needs
+        #  checking against the scoring manager
+        self._teams_need_refresh = False
+        
+        # The team list, phase, upcoming schedule and what the labels show
+        #  get saved to cache_file, and picked back up from there at startup.
+        #  Labels and match number only get picked back up if the cache is
+        #  less than cache_max_age seconds old.
+        cache_file = cache_file_name(config)
+        self._cache = None if cache_file is None else StateCache(cache_file, self._base_addr)
+        try:
+            self.CACHE_MAX_AGE = config['cache_max_age']
+        except KeyError:
+            self.CACHE_MAX_AGE = 12 * 3600
+        
+        # Timer starts, match ends, switchovers, phase changes and the teams
+        #  in each match all get logged to history_file, to be looked up by
+        #  match or team at /history/... Leave out history_file to turn it off.
+        history_file = history_file_name(config)
+        self._history = None if history_file is None else MatchHistory(history_file)
+    # end of _init_state
+    
+    def _init_file_sink(self):
+        config = self._cfg
+        # open up all the files:
+        label_file_names = {}
+        label_file_names['timer'] = config['timer_file']
+        label_file_names['match'] = config['match_num_file']
+        for idx, field in enumerate(config['fields']):
+            for color in self.QUAD_COLORS:
+                label_file_names[(idx+1, color)] = field[color+'_file']
+        try:
+            write_mode = config['file_write_mode']
+        except KeyError:
+            write_mode = 'inplace'
+        try:
+            fsync_policy = config['file_fsync']
+        except KeyError:
+            fsync_policy = 'never'
+        self._file_sink = FileLabelSink(config['rel_file_path'], label_file_names,
+                                        write_mode, fsync_policy)
+        # set the right label change function
+        self._write_label = self.write_label_file
+    # end of _init_file_sink
+    
+    def _init_obsws(self):
+        from ObsBatchClient import ObsBatchClient
+        config = self._cfg
+        self._obs_client = ObsBatchClient(config['obs_websocket_addr'], config['obs_websocket_port'], config['obs_websocket_pw'])
+        self._obs_client.connect()
+        self._startup_mark('OBS connect')
+        # label changes made inside of label_batch() get collected
+        #  here (per thread) and sent to OBS as one batch
+        self._obs_batch_local = threading.local()
+        
+        # Check all of the sources in one batch, then send out whatever
+        #  fixes they need in another, instead of a few round-trips per
+        #  source, one source at a time
+        src_names = self._obs_source_names()
+        get_reqs = self._obs_source_get_requests(src_names)
+        self._obs_client.call_batch(list(get_reqs.values()))
+        setup_reqs = self._obs_source_setup_requests(get_reqs)
+        self._obs_client.call_batch(list(setup_reqs.values()))
+        self._set_obs_sources(src_names, setup_reqs)
+        self._startup_mark('OBS sources')
+        # set the right label change function
+        self._write_label = self.write_label_obsws
+    # end of _init_obsws
+    
+    def _obs_source_names(self):
+        # OBS source name for each label, from the config
+        src_names = {}
+        src_names['timer'] = self._cfg['timer_source']
+        src_names['match'] = self._cfg['match_num_source']
+        for idx, field in enumerate(self._cfg['fields']):
+            for color in self.QUAD_COLORS:
+                src_names[(idx+1, color)] = field[color+'_source']
+        return src_names
+    
+    def _label_description(self, key):
+        if key == 'timer':
+            return 'timer'
+        if key == 'match':
+            return 'match num'
+        return f'quadrant [{key[0]},{key[1]}]'
+    
+    def _obs_source_get_requests(self, src_names):
+        # {src_name: GetInputSettings request}, once for each source, even
+        #  if it's used for more than one label
+        from obswebsocket import requests as obsreqs
+        return {src_name: obsreqs.GetInputSettings(inputName=src_name)
+                for src_name in dict.fromkeys(src_names.values())
+                if src_name is not None and src_name != ''}
+    
+    def _obs_source_setup_requests(self, get_reqs):
+        # Takes the answered requests from _obs_source_get_requests(), and
+        #  returns {src_name: SetInputSettings request} for each source that
+        #  checks out, to make sure that it isn't reading from a file, and to
+        #  clear its text.
+        from obswebsocket import requests as obsreqs
+        setup_reqs = {}
+        for src_name, resp in get_reqs.items():
+            if not resp.status:
+                print(f'ERROR: No matching source name: "{src_name}"')
+                continue
+            if resp.getInputKind() != 'text_gdiplus_v2':
+                print(f'ERROR: Source type for "{src_name}" is "{resp.getInputKind()}"; expected "text_gdiplus_v2"')
+                continue
             
-            if self._obs_config_and_validate_text(config['match_num_source']):
-                self._mnum_src = config['match_num_source']
+            settings = {'text': ''}
+            if resp.getInputSettings().get('read_from_file', False):
+                print(f'Reconfiguring source "{src_name}" to NOT read from file.')
+                settings['read_from_file'] = False
+            print(f'Clearing text on source "{src_name}".')
+            setup_reqs[src_name] = obsreqs.SetInputSettings(inputName=src_name, inputSettings=settings)
+        return setup_reqs
+    # end of _obs_source_setup_requests
+    
+    def _set_obs_sources(self, src_names, setup_reqs):
+        # Takes the answered requests from _obs_source_setup_requests(), and
+        #  sets up each label with its source, if it's good
+        self._label_srcs = {}
+        for key, src_name in src_names.items():
+            if src_name is None or src_name == '':
+                print(f'ERROR: no source name.')
+                is_valid = False
+            elif src_name not in setup_reqs:
+                is_valid = False
             else:
-                print('Errors encountered while validating match num source.')
-                print('WARNING: Will continue with NO match num source setting.')
-                self._mnum_src = None
-                
-            self._field_srcs = {}
-            for idx, field in enumerate(config['fields']):
-                self._field_srcs[idx+1] = {}
-                for color in self.QUAD_COLORS:
-                    if self._obs_config_and_validate_text(field[color+'_source']):
-                        self._field_srcs[idx+1][color] = field[color+'_source']
-                    else:
-                        print(f'Errors encountered while validating quadrant [{idx+1},{color}] source.')
-                        print(f'WARNING: Will continue with NO quadrant [{idx+1},{color}] source setting.')
-                        self._field_srcs[idx+1][color] = None
-            # set the right label change functions
-            self.set_timer_label = self.set_timer_label_obsws
-            self.set_match_label = self.set_match_label_obsws
-            self.set_quadrant_labels = self.set_quadrant_labels_obsws
-            
-        # parse team numbers:
-        self.parse_team_numbers()
+                is_valid = setup_reqs[src_name].status
+                if not is_valid:
+                    print(f'ERROR: Failed setting settings on source "{src_name}".')
+            self._set_obs_source(key, src_name, is_valid)
+    
+    def _set_obs_source(self, key, src_name, is_valid):
+        if is_valid:
+            self._label_srcs[key] = src_name
+        else:
+            print(f'Errors encountered while validating {self._label_description(key)} source.')
+            print(f'WARNING: Will continue with NO {self._label_description(key)} source setting.')
+            self._label_srcs[key] = None
+    
+    def start(self):
+        # The team list gets fetched in the background once we're connected
+        #  (and until that works out, whatever came out of the cache gets
+        #  used), so a scoring manager that's down doesn't hold up starting.
+        self._teams_need_refresh = True
+        if self.load_cache():
+            self._startup_mark('cache')
         #print(f'{self.team_name2num=}')
         #print(f'{self.team_num2name=}')
         
         # set up threads
-        self._parsing_thread = None
-        self._switchover_thread = None
-        self._connect_thread = threading.Thread(
-                target=self.make_connection_thread_func)
-        self._connect_thread.daemon = True
+        self._switchover_call = None
+        self._timer_display_thread = None
+        self._upcoming_thread = None
+        self._supervisor_thread = threading.Thread(target=self.supervisor_thread_func,
+                                                   name='ScoringSupervisor')
+        self._supervisor_thread.daemon = True
         # start up the connection thread:
         print('Starting...')
-        self._connect_thread.start()
+        self._supervisor_thread.start()
+        
+        if self._extrapolate_timer:
+            self._timer_display_thread = threading.Thread(
+                    target=self.timer_display_thread_func)
+            self._timer_display_thread.daemon = True
+            self._timer_display_thread.start()
+        
+        self._upcoming_thread = threading.Thread(target=self.upcoming_refresh_thread_func,
+                                                 name='UpcomingRefresh')
+        self._upcoming_thread.daemon = True
+        self._upcoming_thread.start()
         
         
+        self._startup_mark('threads')
+        
         # set up webserver, if enabled
-        if config['host_timer_webserver']:
+        if self._cfg['host_timer_webserver']:
             self.init_webserver()
+            self._startup_mark('webserver')
+        if self._startup is not None:
+            self._startup.print_report()
+    # end of start
 
 
-    def _obs_config_and_validate_text(self, src_name):
-        if src_name is None or src_name == '':
-            print(f'ERROR: no source name.')
-            return False
-            
-        resp = self._obs_client.call(obsreqs.GetInputSettings(inputName=src_name))
-        
-        if not resp.status:
-            print(f'ERROR: No matching source name: "{src_name}"')
+    def load_cache(self):
+        # Picks up where we left off from the cache file, if there is one.
+        #  Returns True if the team list came out of it.
+        if self._cache is None:
             return False
-        if resp.getInputKind() != 'text_gdiplus_v2':
-            print(f'ERROR: Source type for "{src_name}" is "{resp.getInputKind()}"; expected "text_gdiplus_v2"')
+        data, age = self._cache.load()
+        if data is None:
             return False
         
-        settings = resp.getInputSettings()
-        if settings['read_from_file']:
-            print(f'Reconfiguring source "{src_name}" to NOT read from file.')
-            if not self._obs_client.call(obsreqs.SetInputSettings(inputName=src_name, inputSettings={'read_from_file': False})).status:
-                print('ERROR: Failed setting settings on source.')
-                return False
-        print(f'Clearing text on source "{src_name}".')
-        if not self._obs_client.call(obsreqs.SetInputSettings(inputName=src_name, inputSettings={'text': ''})).status:
-            print('ERROR: Failed setting text settings on source.')
-            return False
-        return True
+        if 'teams' in data:
+            team_num2name = rows_to_table(data['teams'])
+            self.set_team_lookup(team_num2name,
+                                 {team_name: team_num for team_num, team_name in team_num2name.items()})
+        if 'upcoming' in data:
+            upcoming_matches = {match_num: rows_to_table(fields) for match_num, fields in data['upcoming']}
+            self._upcoming_store.restore(upcoming_matches)
+            self.set_upcoming_matches(upcoming_matches)
+        if 'phase' in data:
+            self._match_state.update(phase=data['phase'])
         
-    def make_connection_thread_func(self):
-        addr = self._base_addr + "/Marquee/Match"
-        
-        while not self._stop_connect_retry_flag.wait(self.CONNECTION_RETRY_DELAY):
+        if age <= self.CACHE_MAX_AGE:
+            # put the labels back up the way they were
+            self._match_state.update(match_num=data.get('match_num', 0),
+                                     between_matches=data.get('between_matches', False))
+            match = None
+            if 'match_label' in data:
+                match = tuple(data['match_label'])
+            match_table = None
+            if 'fields' in data:
+                match_table = rows_to_table(data['fields'])
+            if match is not None or match_table is not None:
+                self.submit_labels(LabelUpdate(match=match, match_table=match_table))
+        self.publish_match_state()
+        print(f'Loaded cached event info ({age:.0f} seconds old), checking it against the scoring manager once connected.')
+        return 'teams' in data
+    # end of load_cache
+    
+    def _update_cache(self, **changes):
+        if self._cache is not None:
+            self._cache.update(**changes)
+    
+    def supervisor_thread_func(self):
+        # The one thread that owns the connection to the scoring manager for
+        #  as long as we're running: wait for it, poll it until the
+        #  connection's lost, and start over. Nothing that goes wrong in
+        #  there gets to end the thread.
+        while not self._stop_flag.is_set():
             try:
-                resp = requests.get(addr, timeout=self.CONNECTION_TIMEOUT)
-                if resp is None or resp.status_code != 200:
-                    print(f'Connection failed with response code {resp.status_code}.')
-                    continue
-                else:
-                    print('Connection successful.')
-                    self._stop_connect_retry_flag.set()
-                    self._stop_parsing_flag.clear()
-                    # Start the parsing update thread
-                    self._parsing_thread = threading.Thread(
-                            target = self.parsing_update_thread_func)
-                    self._parsing_thread.daemon = True
-                    self.connected_status = True
-                    self._parsing_thread.start()
-            except requests.exceptions.Timeout:
-                print(f'Connection request timed out.')
-                # keep looping
+                if self.wait_for_connection():
+                    self.poll_until_lost()
+            except Exception:
+                print('ERROR: Unexpected error while polling the scoring manager, starting over:')
+                traceback.print_exc()
+                if self.connected_status:
+                    self.note_connection_lost('unexpected error')
+                self._stop_flag.wait(self.note_connect_failure('unexpected error', quiet=True))
+        self._connection.note_stopped()
+    # end of supervisor_thread_func
     
-    def parsing_update_thread_func(self):
-        addr = self._base_addr + "/Marquee/Match"
-        
-        while not self._stop_parsing_flag.wait(self.PARSING_PERIOD):
+    def wait_for_connection(self):
+        # Returns True once connected, or False if stopped first.
+        # The first try is straight away, then they back off. In between
+        #  tries, the scoring manager's port gets probed every
+        #  CONNECTION_RETRY_DELAY (which is cheap), and as soon as it opens
+        #  back up (like once the scoring manager PC's done rebooting),
+        #  there's a try right away instead of waiting out the backoff.
+        retry_time = time.monotonic()
+        port_was_open = False
+        while True:
+            wait_time = min(retry_time - time.monotonic(), self.CONNECTION_RETRY_DELAY)
+            if self._stop_flag.wait(max(0, wait_time)):
+                return False
+            error = probe_connection(self._probe_addr, self.PROBE_TIMEOUT)
+            port_open = error is None
+            if port_open and (not port_was_open or time.monotonic() >= retry_time):
+                error = self._try_connect()
+                if error is None:
+                    self.note_connected()
+                    return True
+                retry_time = time.monotonic() + self.note_connect_failure(error)
+            elif time.monotonic() >= retry_time:
+                retry_time = time.monotonic() + self.note_connect_failure(error)
+            port_was_open = port_open
+    # end of wait_for_connection
+    
+    def _try_connect(self):
+        # Returns None if the scoring manager answered, otherwise what went
+        #  wrong
+        try:
+            resp = self._client.get('match')
+        except requests.exceptions.Timeout:
+            return 'request timed out'
+        except requests.exceptions.RequestException as e:
+            return str(e)
+        if resp is None:
+            return 'no response'
+        if resp.status_code != 200:
+            return f'response code {resp.status_code}'
+        return None
+    
+    def poll_until_lost(self):
+        self._poll_delay = self.PARSING_PERIOD
+        while not self._stop_flag.wait(self._poll_delay):
             
             try:
-                resp = requests.get(addr, timeout=self.CONNECTION_TIMEOUT)
+                resp, changed = self._client.get_if_changed('match')
+                received = self._metrics.clock()
             except requests.exceptions.Timeout:
                 print('Request timed out while getting update, retrying.')
                 resp = None
+            except requests.exceptions.RequestException:
+                print('Request failed while getting update, retrying.')
+                resp = None
                 
-            if resp is not None and resp.status_code != 200:
+            if resp is not None and resp.status_code not in (200, 304):
                 print(f'Request failed with status {resp.status_code} while getting update, retrying.')
                 resp = None
                 
             if resp is None:
-                self._quick_rety_cnt += 1
-                if self._quick_rety_cnt >= self.QUICK_RETRY_MAX_CNT:
-                    print('Too many retries. Connection lost, starting over.')
-                    # retried enough, go back to the slower retry thread
-                    self._stop_parsing_flag.set()
-                    self._stop_connect_retry_flag.clear()
-                    self._connect_thread = threading.Thread(
-                            target=self.make_connection_thread_func)
-                    self._connect_thread.daemon = True
-                    self._connect_thread.start()
-                    self.connected_status = False
+                self._poll_delay = self.PARSING_PERIOD
+                if self.note_poll_failure():
+                    # retried enough, go back to waiting for a connection
+                    return
                 continue
                 
             # connection was good
-            if self._quick_rety_cnt != 0:
-                print('Connection restored.')
-                self._quick_rety_cnt = 0
-                self.connected_status = True
+            self.note_poll_success()
             
-            # start parsing:
+            if not changed:
+                self.note_timer_unchanged()
+            elif self.handle_polled_match_content(resp.content, received):
+                # just now between matches
+                if not self._upcoming_store.loaded:
+                    # nothing to switch over to yet, so it's worth the wait
+                    self.refresh_upcoming_matches()
+                else:
+                    self.request_upcoming_refresh()
+                self.start_between_matches()
+            # (if it's the same page as last time, there's nothing new to
+            #  parse and the labels are already up to date)
+            
+            self._poll_delay = self.next_poll_delay(changed)
+        # end of while self._stop_flag.wait
+    # end of poll_until_lost
+    
+    def note_connected(self):
+        print('Connection successful.')
+        self._quick_rety_cnt = 0
+        self._connection.note_connected()
+        self.set_connected_status(True)
+        # check what we've got against the scoring manager
+        self.request_upcoming_refresh()
+    
+    def note_connect_failure(self, error, quiet=False):
+        # Returns how long to wait before trying again
+        retry_delay = self._connection.note_failed_attempt(error)
+        if not quiet:
+            print(f'Connection failed: {error}. Trying again in {retry_delay:.1f} s.')
+        self.publish_connection_stats()
+        return retry_delay
+    
+    def note_connection_lost(self, error):
+        if self.connected_status:
+            self.set_connected_status(False)
+        self._connection.note_lost(error)
+        self.publish_connection_stats()
+        # make sure the first page after reconnecting gets parsed
+        self._client.forget('match')
+    
+    def get_connection_stats(self):
+        return self._connection.get_stats()
+    
+    def publish_connection_stats(self):
+        self._state_hub.publish({'connection': self._connection.get_stats()})
+    
+    def print_connection_stats(self):
+        self._connection.print_stats()
+    
+    def upcoming_refresh_thread_func(self):
+        # Like the supervisor thread, nothing that goes wrong in a refresh
+        #  gets to end the thread: it just tries again next time.
+        while not self._stop_flag.is_set():
+            self._refresh_upcoming_flag.wait(self.UPCOMING_REFRESH_PERIOD)
+            self._refresh_upcoming_flag.clear()
+            if self._stop_flag.is_set():
+                return
             try:
-                root_parse = pq(resp.content)
-                need_to_handle_between_matches = False
-            except:
-                # assume excpetion caused by document being empty, which
-                # means that we're between matches
-                need_to_handle_between_matches = True
+                if self.connected_status:
+                    if self._teams_need_refresh:
+                        self.refresh_team_numbers()
+                    self.refresh_upcoming_matches()
+            except Exception:
+                print('ERROR: Unexpected error while refreshing the upcoming matches:')
+                traceback.print_exc()
+    # end of upcoming_refresh_thread_func
+    
+    def request_upcoming_refresh(self):
+        # refresh the upcoming match table (and the team list, if that came
+        #  out of the cache) now, in the background
+        self._refresh_upcoming_flag.set()
+    
+    def note_poll_failure(self):
+        # Returns True once there have been too many failed polls in a row,
+        #  which means the connection is lost and we need to start over.
+        self._quick_rety_cnt += 1
+        self._metrics.inc('poll_retries_total')
+        if self._quick_rety_cnt < self.QUICK_RETRY_MAX_CNT:
+            return False
+        print('Too many retries. Connection lost, starting over.')
+        self._client.print_stats()
+        self.note_connection_lost('too many failed polls')
+        return True
+    
+    def timer_display_thread_func(self):
+        while not self._stop_flag.wait(self.TIMER_DISPLAY_PERIOD):
+            self.refresh_timer_display()
+    
+    def refresh_timer_display(self):
+        # While the timer's counting down, show the extrapolated time. (When
+        #  it's not, the polls take care of showing what the page says.)
+        with self._timer_display_lock:
+            if not self._timer_model.is_running():
+                return
+            self._show_timer_text(self._timer_model.text())
+    
+    def _show_timer_text(self, timer_text):
+        # call with self._timer_display_lock held
+        if timer_text == self._match_state.get().web_time:
+            return
+        self._set_web_time(timer_text)
+        if not self._cfg['manual_timer']:
+            self.set_timer_label(timer_text)
+    
+    def observe_timer(self, timer_text):
+        # Returns the timer text that should be shown for a freshly polled
+        #  timer. Call with self._timer_display_lock held.
+        if not self._extrapolate_timer:
+            return timer_text
+        self._timer_model.update(timer_text)
+        return self._timer_model.text()
+    
+    def note_timer_unchanged(self):
+        # polled again, and the page (so the timer too) is the same
+        if not self._extrapolate_timer:
+            return
+        with self._timer_display_lock:
+            if self._timer_model.confirm():
+                # it's stopped counting, so show exactly what the page says
+                self._show_timer_text(self._timer_model.text())
+    
+    def set_connected_status(self, status):
+        self.connected_status = status
+        self._state_hub.publish({'connected': status,
+                                 'connection': self._connection.get_stats()})
+    
+    def next_poll_delay(self, changed):
+        # Poll at the full rate while a match is on (or staged and about to
+        #  start), while a switchover is coming up, and as soon as the page
+        #  changes. Only back off while sitting between matches with nothing
+        #  scheduled, when all we're waiting for is the next match to load.
+        if changed or not self._match_state.get().between_matches or self.switchover_pending():
+            return self.PARSING_PERIOD
+        return min(self._poll_delay * self.PARSING_BACKOFF, self.IDLE_PARSING_PERIOD)
+    
+    def note_poll_success(self):
+        if self._quick_rety_cnt != 0:
+            print('Connection restored.')
+            self._quick_rety_cnt = 0
+            self.set_connected_status(True)
+    
+    def handle_polled_match_content(self, content, received):
+        # handle_match_content(), with the labels it sets tagged with when
+        #  the page was received, for the latency metrics
+        self._response_local.received = received
+        try:
+            return self.handle_match_content(content)
+        finally:
+            self._response_local.received = None
+    
+    def handle_match_content(self, content):
+        # Updates the current match state from a /Marquee/Match page, and
+        #  sends off any label changes. Returns True if we just now went to
+        #  being between matches, in which case the caller needs to grab the
+        #  upcoming match table and then call start_between_matches().
+        
+        # start parsing:
+        start = self._metrics.clock()
+        page = self._page_parser.parse_match_page(content)
+        self._metrics.observe_since('parse_seconds', start, page='match')
+        # no page means that the document was empty, which
+        # means that we're between matches
+        need_to_handle_between_matches = page is None
+        
+        if not need_to_handle_between_matches:
+            # Doc isn't empty, so go ahead and check the timer
+            # If timer is 00:00, that's the other possible indicator
+            # that we actually *are* between matches
             
-            if not need_to_handle_between_matches:
-                # Doc isn't empty, so go ahead and check the timer
-                # If timer is 00:00, that's the other possible indicator
-                # that we actually *are* between matches
-                
-                # get timer:
-                elem_timer = root_parse('.nameAndTimer > h2')
-                if not elem_timer:
-                    # no timer found, loop over and try again
-                    print('Couldn''t find the timer field')
-                    continue
-                timer_text = elem_timer[0].text
-                if (timer_text == '00:00' or timer_text == '0:00') and (self._cur_web_time == ''):
+            # get timer:
+            if page.timer is None:
+                # no timer found, loop over and try again
+                print('Couldn''t find the timer field')
+                return False
+            timer_text = page.timer
+            with self._timer_display_lock:
+                display_text = self.observe_timer(timer_text)
+                if (timer_text == '00:00' or timer_text == '0:00') and (self._match_state.get().web_time == ''):
                     pass # don't change the blank timer text field
                 else:
-                    self._cur_web_time = elem_timer[0].text
+                    self._set_web_time(display_text)
                 
                 if (timer_text == '00:00') or (timer_text == '0:00'):
                     # match is over, so we do need to handle between-match condition
@@ -242,400 +692,581 @@ class ScoringParser():
                     # After the first time, between_matches will be tru, and the upcoming
                     #  switchover logic will take over setting the timer label at the
                     #  appropriate time.
-                    if not self._between_matches:
-                        self.set_timer_label(self._cur_web_time)
+                    state = self._match_state.get()
+                    if not state.between_matches and not self._cfg['manual_timer']:
+                        self.set_timer_label(state.web_time)
                         
                 else:
                     need_to_handle_between_matches = False
                     # Not between matches, time text label will get set later along
                     #  with match num and quads
+        
+        
+        # If we're between matches, handle that now.
+        # This 'if' block returns, so no other parsing happens if
+        #  need_to_handle_between_matches == True
+        if need_to_handle_between_matches:
+            # See if we're just now going to be in between matches:
+            old_state, state = self._match_state.modify(
+                    lambda state: {'between_matches': True})
+            if (not old_state.between_matches):
+                self.publish_match_state(state)
+                if state.match_num != 0:
+                    self._record_history('match_end', state)
+                return True
+            # nothing else to do when handling between match condition
+            return False
             
+        # Not handling between matches, handle normal during-match
+        
+        # see if there was a switchover scheduled that we need to remove now
+        self.cancel_switchover()
+        
+        # get match phase and num
+        if page.phase is None:
+            # Not found, re-loop
+            self._match_state.update(between_matches=False)
+            print('Couldn''t find the match phase field')
+            return False
+        changes = {'phase': page.phase, 'between_matches': False}
+        if page.match_num is not None:
+            changes['match_num'] = page.match_num
+        # get the field elements
+        # TODO: separate out team number from team name
+        if page.fields is None:
+            changes['match_table'] = {}
+        else:
+            changes['match_table'] = page.fields
+        # all at once, so a switchover (or a web page) never sees the new
+        #  phase with the old match number
+        old_state, state = self._match_state.modify(lambda state: changes)
+        self.publish_match_state(state)
+        self._record_state_changes(old_state, state)
+        if self._cfg['manual_timer'] or self._history is not None:
+            self.check_timer_start(page.timer, state)
+        
+        # errors from the match number and the field elements
+        for error in page.errors:
+            print(error)
+        
+        if page.fields is None:
+            # Not found, re-loop
+            print('Couldn''t find the field elements')
+            return False
+        self._update_cache(phase=state.phase, match_num=state.match_num,
+                           between_matches=False)
+        
+        # set all of the labels
+        self.set_all_labels_to_current(state)
+        return False
+    # end of handle_match_content
+    
+    def _record_history(self, event, state, match_table=None):
+        if self._history is not None:
+            self._history.record(event, state.phase, state.match_num, match_table)
+    
+    def _record_state_changes(self, old_state, state):
+        # what changed from one match page (or phase page) to the next
+        if self._history is None:
+            return
+        if state.phase != old_state.phase:
+            self._record_history('phase_change', state)
+        if len(state.match_table) > 0 and \
+                ((state.phase, state.match_num) != (old_state.phase, old_state.match_num)
+                 or state.match_table != old_state.match_table):
+            self._record_history('quads', state, state.match_table)
+    
+    def publish_match_state(self, state=None):
+        # the parsed match state, for /state.json and /events
+        if state is None:
+            state = self._match_state.get()
+        self._state_hub.publish({
+            'phase': state.phase,
+            'match_num': state.match_num,
+            'match_table': state.match_table,
+            'between_matches': state.between_matches,
+        })
+    
+    def set_upcoming_matches(self, upcoming_matches):
+        self._match_state.update(upcoming=upcoming_matches)
+        self._state_hub.publish({'upcoming': upcoming_matches})
+        self._update_cache(upcoming=[[match_num, table_to_rows(fields)]
+                                     for match_num, fields in upcoming_matches.items()])
+    
+    def start_between_matches(self):
+        # if cur_match_num is 0, then switch immediately, since there's not
+        #  really an existing match up at that point
+        state = self._match_state.get()
+        if (state.match_num is None or state.match_num == 0):
+            self.upcoming_match_switchover()
+        # else, check for auto_switchover to see if we need to auto switch
+        #  between matches
+        elif self._cfg['auto_switchover']:
+            effective_switchover_time = self._cfg['switchover_time']
             
-            # If we're between matches, handle that now.
-            # This 'if' block 'continue's, so no other parsing happens if
-            #  need_to_handle_between_matches == True
-            if need_to_handle_between_matches:
-                # See if we're just now going to be in between matches:
-                if (not self._between_matches):
-                    self._between_matches = True
-                    # grab the upcoming match table
-                    self._upcoming_matches = self.parse_upcoming_matches_table()
-                    
-                    # if cur_match_num is 0, then switch immediately, since there's not
-                    #  really an existing match up at that point
-                    if (self._cur_match_num is None or self._cur_match_num == 0):
-                        self.upcoming_match_switchover()
-                    # else, check for auto_switchover to see if we need to auto switch
-                    #  between matches
-                    elif self._cfg['auto_switchover']:
-                        effective_switchover_time = self._cfg['switchover_time']
-                        
-                        if self._cfg['manual_timer']:
-                            # if using manual timer, then check if there's still time left
-                            #  and compensate by adding it to the switchover_time
-                            effective_switchover_time = effective_switchover_time + \
-                                    self._cur_manual_timer_seconds
-                        
-                        # if it's 0, switch immediately
-                        if effective_switchover_time == 0:
-                            self.upcoming_match_switchover()
-                        else:
-                            self._switchover_thread = threading.Timer(
-                                    effective_switchover_time,
-                                    self.upcoming_match_switchover_timer_func)
-                            self._switchover_thread.daemon = True
-                            self._switchover_thread.start()
-                # nothing else to do when handling between match condition
-                continue
-                
-            # Not handling between matches, handle normal during-match
-            self._between_matches = False
-            
-            # see if there was a switchover scheduled that we need to remove now
-            if self._switchover_thread is not None:
-                try:
-                    self._switchover_thread.cancel()
-                except:
-                    # could be a case where thread is already running...
-                    # just catch it and let it go, it's fine.
-                    pass
-            
-            # get match phase and num
-            elem_match_phase_and_num = root_parse('.nameAndTimer > h3')
-            if not elem_match_phase_and_num:
-                # Not found, re-loop
-                print('Couldn''t find the match phase field')
-                continue
-            split_str = elem_match_phase_and_num[0].text.split(' ')
-            self._cur_match_phase = split_str[0]
-            try:
-                self._cur_match_num = int(split_str[-1])
-            except ValueError:
-                print(f'Error parsing match number from "{split_str[-1]}".')
-                pass
-                #self._cur_match_num = 0
-            
-            # get the field elements
-            self._cur_match_table = {}
-            # TODO: separate out team number from team name
-            elem_field_elements = root_parse('.fields > .field')
-            if not elem_field_elements:
-                # Not found, re-loop
-                print('Couldn''t find the field elements')
-                continue
-            
-            for field_elem in elem_field_elements.items():
-                try:
-                    field_num = int(field_elem('table > tr > th')[0].text[6:])
-                except:
-                    print('Failed parsing field number.')
-                    continue
-                self._cur_match_table[field_num] = {}
-                
-                for color in self.QUAD_COLORS:
-                    elem_quad = field_elem('table > tr > td.light-'+color)
-                    if not elem_quad:
-                        print(f'Error parsing {color} quad on field {field_num}.')
-                        continue
-                    self._cur_match_table[field_num][color] = \
-                            elem_quad[0].text.strip() # TODO: unescape html?
-                        
+            if self._cfg['manual_timer']:
+                # if using manual timer, then check if there's still time left
+                #  and compensate by adding it to the switchover_time
+                effective_switchover_time = effective_switchover_time + \
+                        self._cur_manual_timer_seconds
             
-            # set all of the labels
-            self.set_all_labels_to_current()
-        # end of while self._stop_parsing_flag.wait
-    # end of parsing_update_thread_func
+            # if it's 0, switch immediately
+            if effective_switchover_time == 0:
+                self.upcoming_match_switchover()
+            else:
+                self.schedule_switchover(effective_switchover_time)
+    # end of start_between_matches
+    
+    def schedule_switchover(self, delay):
+        self.cancel_switchover()
+        self._switchover_call = self._scheduler.call_later(
+                delay,
+                self.upcoming_match_switchover_timer_func)
+    
+    def switchover_pending(self):
+        switchover_call = self._switchover_call
+        return switchover_call is not None and switchover_call.pending()
+    
+    def cancel_switchover(self):
+        # once this returns, a scheduled switchover that hadn't started yet
+        #  won't
+        switchover_call = self._switchover_call
+        if switchover_call is not None:
+            switchover_call.cancel()
+            self._switchover_call = None
     
     def upcoming_match_switchover_timer_func(self):
-        # TODO: TBD if I need to do anything else here.
+        # Runs on the scheduler thread. Scheduled switchovers only happen
+        #  when we've got a match number, so this never has to go fetch the
+        #  phase (and hold up the manual timer while it does).
         self.upcoming_match_switchover()
         
     def upcoming_match_switchover(self):
-        if len(self._upcoming_matches) > 0:
-            if self._cur_match_num == 0:
-                # Could be an accidental reset in the middle of the match schedule.
-                # Check the upcoming match table for the lowest number and assume
-                # that's the next match number.
-                lowest_num = min(self._upcoming_matches.keys())
-                self._cur_match_num = lowest_num
-                self.parse_match_phase()
+        if self.switchover_needs_phase():
+            self.parse_match_phase()
+        self.apply_upcoming_match_switchover()
+    
+    def switchover_needs_phase(self):
+        # Without a match number to go on, the switchover will have to guess
+        #  at the next match, and needs the phase from the phase schedule.
+        state = self._match_state.get()
+        return len(state.upcoming) > 0 and state.match_num == 0
+    
+    def apply_upcoming_match_switchover(self):
+        old_state, state = self._match_state.modify(self._next_match_changes)
+        if state is not old_state:
+            self._metrics.inc('switchovers_total')
+            self.stop_manual_timer()
+            if old_state.match_num == 0:
                 print(f'Unsure about last match number. Assuming next match is '+
-                      f'{self._cur_match_phase} {self._cur_match_num} based on '+
+                      f'{state.phase} {state.match_num} based on '+
                       'upcoming match table.')
-            else:
-                # Advance the match number
-                self._cur_match_num += 1
             
+            self.publish_match_state(state)
             try:
-                cur_match_table = self._upcoming_matches[self._cur_match_num]
-                self.set_quadrant_labels(cur_match_table)
-                self._cur_web_time = '' # !!!
-                self.set_timer_label('')
-                self.set_match_label(self._cur_match_phase,self._cur_match_num)
+                cur_match_table = state.upcoming[state.match_num]
+                self._record_history('switchover', state, cur_match_table)
+                with self._timer_display_lock:
+                    self._set_web_time('') # !!!
+                    self._timer_model.reset()
+                    self.submit_labels(LabelUpdate('',
+                                                    (state.phase, state.match_num),
+                                                    cur_match_table))
             except KeyError:
                 # Means no more upcoming matches, we've reached the end of the
                 #  current phase
+                self._record_history('switchover', state)
                 blank_table = {}
-                for ridx in self._field_fs.keys():
+                for ridx in self._field_nums:
                     blank_table[ridx] = {}
                     for color in self.QUAD_COLORS:
                         blank_table[ridx][color] = ''
-                self.set_quadrant_labels(blank_table)
-                self._cur_web_time = '' # !!!
-                self.set_timer_label('')
-                self.set_match_label('','')
-    # end of upcoming_match_switchover
+                with self._timer_display_lock:
+                    self._set_web_time('') # !!!
+                    self._timer_model.reset()
+                    self.submit_labels(LabelUpdate('', ('',''), blank_table))
+            # a restart from here on shouldn't switch over again
+            self._update_cache(phase=state.phase, match_num=state.match_num,
+                               between_matches=True)
+    # end of apply_upcoming_match_switchover
     
-    def parse_upcoming_matches_table(self):
-        addr = self._base_addr + '/Marquee/PitRefresh'
-        
+    def _next_match_changes(self, state):
+        # What switching over to the next match changes, worked out and
+        #  swapped in together, so that a poll can't change the match number
+        #  in the middle of it
+        if len(state.upcoming) == 0:
+            return None
+        if not state.between_matches:
+            # the next match already showed up on the match page (while a
+            #  scheduled switchover was just starting), nothing to do
+            return None
+        if state.match_num == 0:
+            # Could be an accidental reset in the middle of the match schedule.
+            # Check the upcoming match table for the lowest number and assume
+            # that's the next match number.
+            return {'match_num': min(state.upcoming.keys())}
+        # Advance the match number
+        return {'match_num': state.match_num + 1}
+    
+    def _get_page(self, endpoint, what):
+        # Returns the response, or None (after saying why) if the request
+        #  didn't work out.
         try:
-            resp = requests.get(addr, timeout=self.CONNECTION_TIMEOUT)
+            resp = self._client.get(endpoint)
         except requests.exceptions.Timeout:
-            print('Request timed out while getting upcoming matches table.')
-            return {}
+            print(f'Request timed out while getting {what}.')
+            return None
+        except requests.exceptions.ConnectionError:
+            print(f'Request failed while getting {what}.')
+            return None
+        except requests.exceptions.RequestException as e:
+            print(f'Request failed while getting {what}: {e}')
+            return None
         
         if resp is None:
-            print('Request failed while getting upcoming matches table.')
-            return {}
+            print(f'Request failed while getting {what}.')
+            return None
             
         if resp.status_code != 200:
+            print(f'Request failed with code {resp.status_code} while getting {what}.')
+            return None
+        return resp
+    
+    def refresh_upcoming_matches(self):
+        # If the request doesn't work out, whatever we had before stays put
+        #  (and gets used for the switchover) rather than going blank.
+        try:
+            resp, changed = self._client.get_if_changed('upcoming')
+        except requests.exceptions.RequestException as e:
+            print(f'Request failed while getting upcoming matches table: {e}')
+            return
+        if resp.status_code not in (200, 304):
             print(f'Request failed with code {resp.status_code} while getting upcoming matches table.')
-            return {}
-        
-        root_parse = pq(resp.content)
-        
-        ret_dict = {}
-        
-        # get rows:
-        elem_rows = root_parse('table > tbody > tr')
-        if not elem_rows:
+            return
+        if changed:
+            self.handle_upcoming_content(resp.content)
+    
+    def handle_upcoming_content(self, content):
+        start = self._metrics.clock()
+        upcoming = self._upcoming_store.update(content)
+        self._metrics.observe_since('parse_seconds', start, page='upcoming')
+        if upcoming.rows is None:
             # no rows found
             print('Couldn\'t find the rows for the upcoming matches. That probably means we\'re at the end to the current phase.')
-            return {}
-        
-        for elem_row in elem_rows.items():
-            elem_match_field = elem_row("td[style='white-space:nowrap']")
-            if not elem_match_field:
-                # just skip this row
-                continue
-            match_split = elem_match_field[0].text.split(' - ')
-            try:
-                match_num = int(match_split[0])
-                field_num = int(match_split[1])
-            except (IndexError, ValueError):
-                print('Failed parsing out upcoming match table match number & field number. Skipping row and attempting to continue.')
-                continue
-                
-            # create empty dicts if they don't exist yet
-            if match_num not in ret_dict:
-                ret_dict[match_num] = {}
-            if field_num not in ret_dict[match_num]:
-                ret_dict[match_num][field_num] = {}
-            # get the color td's
-            for color in self.QUAD_COLORS:
-                elem_quad = elem_row('td.'+color)
-                if not elem_quad:
-                    # fill in with blank
-                    ret_dict[match_num][field_num][color] = ''
-                else:
-                    # TODO: unescape html?
-                    ret_dict[match_num][field_num][color] = elem_quad[0].text.strip()
-                    
-        #print(f'upcoming match table: {ret_dict}')
-        return ret_dict
-    # end of parse_upcoming_matches_table
+        for error in upcoming.errors:
+            print(error)
+        self.set_upcoming_matches(self._upcoming_store.table)
+    # end of handle_upcoming_content
     
     def parse_match_phase(self):
-        addr = self._base_addr + '/phase'
-        
-        try:
-            resp = requests.get(addr, timeout=self.CONNECTION_TIMEOUT)
-        except requests.exceptions.Timeout:
-            print('Request timed out while getting phase schedule.')
-            return
-        
+        resp = self._get_page('phase', 'phase schedule')
         if resp is None:
-            print('Request failed while getting phase schedule.')
-            return
-            
-        if resp.status_code != 200:
-            print(f'Request failed with code {resp.status_code} while getting phase schedule.')
-            return
-        
-        root_parse = pq(resp.content)
-        
-        elem_phase = root_parse('h2')
-        if not elem_phase:
-            # no phase found
-            print('Couldn\'t find phase header line in the phase schedule.')
             return
-            
-        if elem_phase[0].text[-6:] == ' Phase':
-            self._cur_match_phase = elem_phase[0].text[:-6]
-        else:
-            print(f'Not sure how to parse the phase from the header text "{elem_phase[0].text}".')
-    # end of parse_match_phase
+        self.handle_phase_content(resp.content)
     
-    def parse_team_numbers(self):
-        addr = self._base_addr + '/lookup'
+    def handle_phase_content(self, content):
+        phase_page = self._page_parser.parse_phase_page(content)
+        for error in phase_page.errors:
+            print(error)
+        if phase_page.phase is not None:
+            old_state, state = self._match_state.modify(lambda state: {'phase': phase_page.phase})
+            self.publish_match_state(state)
+            self._record_state_changes(old_state, state)
+            self._update_cache(phase=state.phase)
+    # end of handle_phase_content
+    
+    def handle_lookup_content(self, content):
+        # Returns False (keeping the team list we've already got) if the
+        #  page couldn't be parsed
+        team_num2name = {}
+        team_name2num = {}
         
-        self.team_num2name = {}
-        self.team_name2num = {}
+        lookup = self._page_parser.parse_lookup_page(content)
+        for error in lookup.errors:
+            print(error)
+        if lookup.teams is None:
+            return False
+        for team_num, team_name in lookup.teams:
+            team_num2name[team_num] = team_name
+            team_name2num[team_name] = team_num
         
-        try:
-            resp = requests.get(addr, timeout=self.CONNECTION_TIMEOUT)
-        except requests.exceptions.Timeout:
-            print('Request timed out while getting team number lookup.')
-            return
-            
+        self.set_team_lookup(team_num2name, team_name2num)
+        return True
+    # end of handle_lookup_content
+    
+    def refresh_team_numbers(self):
+        # Fetches the team list. If that doesn't work out, we keep the team
+        #  list we've already got, and the upcoming refresher tries again
+        #  next time.
+        resp = self._get_page('lookup', 'team number lookup')
         if resp is None:
-            print('Request failed while getting team number lookup.')
+            self._teams_need_refresh = True
             return
-            
-        root_parse = pq(resp.content)
-        
-        elem_team_select = root_parse('#LookupInfo > .row > select.form-control:first-of-type')
-        if not elem_team_select:
-            # no team list
-            print('Couldn\'t find team list selection in lookup page.')
+        self._teams_need_refresh = not self.handle_lookup_content(resp.content)
+    
+    def set_team_lookup(self, team_num2name, team_name2num):
+        self.team_num2name = team_num2name
+        self.team_name2num = team_name2num
+        self._state_hub.publish({'teams': team_num2name})
+        self._update_cache(teams=table_to_rows(team_num2name))
+    
+    
+    @contextlib.contextmanager
+    def label_batch(self):
+        # Collects all of the label changes made inside of the 'with' block
+        #  and sends them to OBS together as one request batch at the end.
+        # File-based labels all get written out in one flush cycle at the end.
+        if not self._use_obsws:
+            self._file_sink.begin_batch()
+            try:
+                yield
+            finally:
+                self._file_sink.end_batch()
             return
-            
-        elem_options = elem_team_select('option[selected] ~ option') # skip the first (selected) option, get the rest
-        if not elem_options:
-            # no team list
-            print('Couldn\'t find team list options in lookup page.')
+        if getattr(self._obs_batch_local, 'pending', None) is not None:
+            # already collecting a batch
+            yield
             return
-        
-        for elem_option in elem_options:
-            try:
-                team_num = int(elem_option.values()[-1])
-                team_name = elem_option.text.split(' (')[0]
-                self.team_num2name[team_num] = team_name
-                self.team_name2num[team_name] = team_num
-            except ValueError:
-                print(f'Failed to parse number: "{elem_option.values()[-1]}". Skipping.')
-            except IndexError:
-                print(f'Indexing error for option with text "{elem_option.text}"')
+        self._obs_batch_local.pending = []
+        try:
+            yield
+        finally:
+            pending = self._obs_batch_local.pending
+            self._obs_batch_local.pending = None
+            self._obs_send(pending)
+    # end of label_batch
+    
+    def print_http_stats(self):
+        self._client.print_stats()
     
+    def print_output_stats(self):
+        self._output.print_stats()
     
-    def set_all_labels_to_current(self):
+    def set_all_labels_to_current(self, state=None):
+        if state is None:
+            state = self._match_state.get()
+        timer_text = None
         if not self._cfg['manual_timer']:
-            self.set_timer_label(self._cur_web_time)
+            timer_text = state.web_time
         # if using manual timer, then the timer label gets set by the
         #   manual timer's countdown function
         
-        # set match number and (optionally) phase
-        self.set_match_label(self._cur_match_phase, self._cur_match_num)
-        
         # only attempt to set quadrant labels if the match table isn't empty
-        if len(self._cur_match_table) > 0:
-            self.set_quadrant_labels(self._cur_match_table)
+        match_table = None
+        if len(state.match_table) > 0:
+            match_table = state.match_table
+        
+        # set match number and (optionally) phase
+        self.submit_labels(LabelUpdate(timer_text,
+                                        (state.phase, state.match_num),
+                                        match_table))
     # end of set_all_labels_to_current
     
-    def set_timer_label_file(self, timer_text):
-        if self._prev_timer_text == timer_text:
-            # nothing to do, the lable hasn't changed.
-            return
-        if self._timer_f is not None:
-            # clear the file, write it, and flush it
-            self._timer_f.truncate(0)
-            self._timer_f.seek(0)
-            self._timer_f.write(timer_text)
-            self._timer_f.flush()
-        self._prev_timer_text = timer_text
-    # end of set_timer_label
-    
-    def set_match_label_file(self, match_phase, match_num, force_rewrite=False):
-        if self._prev_match_num == match_num and self._prev_match_phase == match_phase and not force_rewrite:
-            # nothing to do, the label hasn't changed.
-            return
-        if self._mnum_f is not None:
+    def _set_web_time(self, timer_text):
+        self._match_state.update(web_time=timer_text)
+        self._state_hub.publish({'timer': timer_text})
+    
+    def submit_labels(self, update):
+        # Hands the new label text off to the output stage (which writes it
+        #  out with the file or OBS websocket functions below), and pushes the
+        #  match number and quadrants out to the web pages. (The web pages'
+        #  timer is the web time, see _set_web_time().)
+        changes = {}
+        labels = self._labels_for_update(update)
+        if 'match' in labels:
+            changes['match'] = labels['match']
+        if update.match_table is not None:
+            changes['fields'] = {str(field_num): dict(field_table)
+                                 for field_num, field_table in update.match_table.items()}
+        self._state_hub.publish(changes)
+        cached = {}
+        if update.match is not None:
+            cached['match_label'] = list(update.match)
+        if update.match_table is not None:
+            cached['fields'] = table_to_rows(update.match_table)
+        if len(cached) > 0:
+            self._update_cache(**cached)
+        received = getattr(self._response_local, 'received', None)
+        if received is not None and update.received is None:
+            update = update._replace(received=received)
+        self._output.submit(update)
+    
+    # These hand the new label text off to the output stage too.
+    def set_timer_label(self, timer_text):
+        self.submit_labels(LabelUpdate(timer=timer_text))
+    
+    def set_match_label(self, match_phase, match_num):
+        self.submit_labels(LabelUpdate(match=(match_phase, match_num)))
+    
+    def set_quadrant_labels(self, match_table):
+        self.submit_labels(LabelUpdate(match_table=match_table))
+    
+    def _labels_for_update(self, update):
+        # Breaks a LabelUpdate down into the text for each individual label
+        labels = {}
+        if update.timer is not None:
+            labels['timer'] = update.timer
+        if update.match is not None:
+            match_phase, match_num = update.match
             if self._cfg['show_match_phase']:
-                match_string = f'{match_phase} {match_num}'
+                labels['match'] = f'{match_phase} {match_num}'
             else:
-                match_string = str(match_num)
-            # clear the file, write it, and flush it
-            self._mnum_f.truncate(0)
-            self._mnum_f.seek(0)
-            self._mnum_f.write(match_string)
-            self._mnum_f.flush()
-        self._prev_match_num = match_num
-        self._prev_match_phase = match_phase
-    # end of set_match_label
-    
-    def set_quadrant_labels_file(self, match_table, force_rewrite=False):
-        if self._prev_match_table == match_table and not force_rewrite:
-            # nothing to do, the table hasn't changed.
-            return
-        self._prev_match_table = {}
-        for field_num in match_table.keys():
-            for color in self.QUAD_COLORS:
-                if self._field_fs[field_num][color] is not None:
-                    # clear the file, write it, and flush it
-                    self._field_fs[field_num][color].truncate(0)
-                    self._field_fs[field_num][color].seek(0)
-                    self._field_fs[field_num][color].write(
-                            match_table[field_num][color])
-                    self._field_fs[field_num][color].flush()
-            # need to copy one field at a time to prev match table (to get a deep copy)
-            self._prev_match_table[field_num] = match_table[field_num].copy()
-    # end of set_quadrant_labels
-    
-    def set_timer_label_obsws(self, timer_text):
-        if self._prev_timer_text == timer_text:
-            # nothing to do, the lable hasn't changed.
+                labels['match'] = str(match_num)
+        if update.match_table is not None:
+            for field_num, field_table in update.match_table.items():
+                for color in self.QUAD_COLORS:
+                    if color in field_table:
+                        labels[(field_num, color)] = field_table[color]
+        return labels
+    # end of _labels_for_update
+    
+    def _write_labels(self, update):
+        # Runs on the output stage's thread. Only writes the labels whose
+        #  text actually changed. Returns False if any label didn't get
+        #  written, so the output stage will try again.
+        labels = self._labels_for_update(update)
+        to_write = self._labels_to_write(labels)
+        start = self._metrics.clock()
+        with self.label_batch():
+            for key, text in to_write.items():
+                self._write_label(key, text)
+        self._note_labels_written()
+        all_written = self._all_labels_written(labels)
+        self._observe_label_write(update, len(to_write), start, all_written)
+        return all_written
+    # end of _write_labels
+    
+    def _observe_label_write(self, update, num_labels, start, all_written):
+        if not self._metrics.enabled or num_labels == 0:
             return
-        if self._timer_src is not None:
-            if not self._obs_client.call(obsreqs.SetInputSettings(
-                        inputName=self._timer_src,
-                        inputSettings={'text': timer_text}
-                    )).status:
-                print('ERROR: Failed to set timer text via OBS websocket.')
-                return
-        self._prev_timer_text = timer_text
-    # end of set_timer_label
+        # labels get written together, so each one gets its share
+        now = self._metrics.clock()
+        sink = 'obs' if self._use_obsws else 'file'
+        self._metrics.observe('label_write_seconds', (now - start) / num_labels,
+                              count=num_labels, sink=sink)
+        if all_written and update.received is not None:
+            self._metrics.observe('label_latency_seconds', now - update.received, sink=sink)
+    
+    def _labels_to_write(self, labels):
+        # just the labels whose text is different from what's already there
+        return {key: text for key, text in labels.items()
+                if self._label_text.get(key) != text}
+    
+    def _all_labels_written(self, labels):
+        return len(self._labels_to_write(labels)) == 0
+    
+    def write_label_file(self, key, text):
+        def on_success():
+            self._label_text[key] = text
+        # labels without a file (or for fields we don't have) are just skipped
+        self._file_sink.write(key, text, on_success)
+    # end of write_label_file
     
-    def set_match_label_obsws(self, match_phase, match_num, force_rewrite=False):
-        if self._prev_match_num == match_num and self._prev_match_phase == match_phase and not force_rewrite:
-            # nothing to do, the label hasn't changed.
+    def _obs_set_text(self, src_name, text, on_success, error_msg):
+        # Queues up the text change if we're in a label_batch(), otherwise
+        #  sends it right away. on_success gets called once OBS says it worked.
+        from obswebsocket import requests as obsreqs
+        req = obsreqs.SetInputSettings(inputName=src_name, inputSettings={'text': text})
+        pending = getattr(self._obs_batch_local, 'pending', None)
+        if pending is not None:
+            pending.append((req, on_success, error_msg))
+        else:
+            self._obs_send([(req, on_success, error_msg)])
+    
+    def _obs_send(self, pending):
+        if len(pending) == 0:
             return
-        if self._mnum_src is not None:
-            if self._cfg['show_match_phase']:
-                match_string = f'{match_phase} {match_num}'
+        if len(pending) == 1:
+            self._obs_client.call(pending[0][0])
+        else:
+            self._obs_client.call_batch([req for req, _, _ in pending])
+        self._obs_handle_results(pending)
+    # end of _obs_send
+    
+    def _obs_handle_results(self, pending):
+        # map each result back to whoever asked for it
+        for req, on_success, error_msg in pending:
+            if req.status:
+                on_success()
             else:
-                match_string = str(match_num)
-            if not self._obs_client.call(obsreqs.SetInputSettings(
-                        inputName=self._mnum_src,
-                        inputSettings={'text': match_string}
-                    )).status:
-                print('ERROR: Failed to set match number text via OBS websocket.')
-                return
-        self._prev_match_num = match_num
-        self._prev_match_phase = match_phase
-    # end of set_match_label
+                print(error_msg)
     
-    def set_quadrant_labels_obsws(self, match_table, force_rewrite=False):
-        if self._prev_match_table == match_table and not force_rewrite:
-            # nothing to do, the table hasn't changed.
+    def write_label_obsws(self, key, text):
+        def on_success():
+            self._label_text[key] = text
+        # labels without a source (or for fields we don't have) are just skipped
+        src_name = self._label_srcs.get(key)
+        if src_name is None:
+            on_success()
             return
-        self._prev_match_table = {}
-        
-        for field_num in match_table.keys():
-            had_error = False
-            for color in self.QUAD_COLORS:
-                if self._field_srcs[field_num][color] is not None:
-                    if not self._obs_client.call(obsreqs.SetInputSettings(
-                                inputName=self._field_srcs[field_num][color],
-                                inputSettings={'text': match_table[field_num][color]}
-                            )).status:
-                        print(f'ERROR: Failed to set quadrant [{field_num},{color}] text via OBS websocket.')
-                        had_error = True
-            if not had_error:
-                # need to copy one field at a time to prev match table (to get a deep copy)
-                self._prev_match_table[field_num] = match_table[field_num].copy()
-    # end of set_quadrant_labels
+        error_msg = f'ERROR: Failed to set {self._label_description(key)} text via OBS websocket.'
+        self._obs_set_text(src_name, text, on_success, error_msg)
+    # end of write_label_obsws
+    
+    
+    def _now(self):
+        # the clock that _call_at() deadlines are on
+        return time.monotonic()
+    
+    def _call_at(self, deadline, func):
+        return self._scheduler.call_at(deadline, func)
+    
+    def check_timer_start(self, timer_text, state):
+        # The first time the scoring manager's timer is seen counting down
+        #  for a match, that goes in the history, and the manual timer starts.
+        match = (state.phase, state.match_num)
+        secs = parse_timer_text(timer_text)
+        last_polled = self._last_polled_timer
+        self._last_polled_timer = (match, secs)
+        if secs is None or last_polled is None or last_polled[0] != match or last_polled[1] is None:
+            return
+        if secs < last_polled[1] and self._timer_started_match != match:
+            self._timer_started_match = match
+            self._record_history('timer_start', state)
+            if self._cfg['manual_timer']:
+                # By the time it's seen to drop, the match has been going for
+                #  as long as it dropped by (usually the first second)
+                self.start_manual_timer(max(0, self.MANUAL_TIMER_LENGTH - (last_polled[1] - secs)))
     
+    def start_manual_timer(self, secs=None):
+        # Counts down from secs (manual_timer_length by default). Each tick
+        #  gets scheduled for when the shown second rolls over, worked out
+        #  from when the countdown started, so a late tick never pushes the
+        #  ones after it back, and it can't drift.
+        if secs is None:
+            secs = self.MANUAL_TIMER_LENGTH
+        with self._manual_timer_lock:
+            self._cancel_manual_timer_tick()
+            self._manual_timer_end = self._now() + secs
+        self._manual_timer_tick()
+    
+    def stop_manual_timer(self):
+        # leaves the timer label showing whatever it last showed
+        with self._manual_timer_lock:
+            self._cancel_manual_timer_tick()
+            self._manual_timer_end = None
+    
+    def _cancel_manual_timer_tick(self):
+        if self._manual_timer_call is not None:
+            self._manual_timer_call.cancel()
+            self._manual_timer_call = None
+    
+    def _manual_timer_tick(self):
+        with self._manual_timer_lock:
+            if self._manual_timer_end is None:
+                # stopped
+                return
+            remaining = self._manual_timer_end - self._now()
+            secs = max(0, math.ceil(round(remaining, 6)))
+            self._cur_manual_timer_seconds = secs
+            self.set_manual_timer_text()
+            if secs > 0:
+                self._manual_timer_call = self._call_at(self._manual_timer_end - (secs - 1),
+                                                        self._manual_timer_tick)
+            else:
+                self._manual_timer_call = None
+                self._manual_timer_end = None
+    # end of _manual_timer_tick
     
     def set_manual_timer_text(self):
         seconds = math.floor(self._cur_manual_timer_seconds % 60)
@@ -643,6 +1274,86 @@ class ScoringParser():
         timer_text = f'{minutes:01d}:{seconds:02d}'
         self.set_timer_label(timer_text)
         
+    def metrics_text(self):
+        # /metrics, in Prometheus text format
+        conn_stats = self._connection.get_stats()
+        client_stats = self._client.get_stats()
+        output_stats = self._output.get_stats()
+        extra = [
+            ('connected', 'gauge', 'Whether the scoring manager is connected.',
+             1 if conn_stats['state'] == 'connected' else 0, {}),
+            ('reconnects_total', 'counter', 'Connections to the scoring manager after the first.',
+             conn_stats['reconnects'], {}),
+            ('connect_failures_total', 'counter', 'Failed tries at connecting to the scoring manager.',
+             conn_stats['failed_attempts'], {}),
+            ('connections_lost_total', 'counter', 'Times the connection to the scoring manager was lost.',
+             conn_stats['lost'], {}),
+            ('label_write_retries_total', 'counter', 'Label updates that had to be written again.',
+             output_stats['retries'], {}),
+            ('label_updates_dropped_total', 'counter', 'Label updates merged into a newer one before being written.',
+             output_stats['dropped'], {}),
+        ]
+        for endpoint, count in client_stats['requests'].items():
+            extra.append(('http_requests_total', 'counter', 'Requests to the scoring manager.',
+                          count, {'endpoint': endpoint}))
+        for endpoint, count in client_stats['errors'].items():
+            extra.append(('http_errors_total', 'counter', 'Requests to the scoring manager that failed.',
+                          count, {'endpoint': endpoint}))
+        for endpoint, count in client_stats['unchanged'].items():
+            extra.append(('http_unchanged_total', 'counter', 'Pages that hadn\'t changed since the last time.',
+                          count, {'endpoint': endpoint}))
+        return self._metrics.render(extra)
+    # end of metrics_text
+    
+    def history_team_json_data(self, team):
+        # /history/team/<team number (or name)>: the matches the team's been
+        #  in, and the last one
+        team = team_key(team)
+        if isinstance(team, str):
+            # a name: go by its number if it's in the team list, since the
+            #  quadrants might only show numbers
+            for team_name, team_num in self.team_name2num.items():
+                if team_name.strip().casefold() == team:
+                    team = team_num
+                    break
+        matches = self._history.team_matches(team)
+        return {
+            'team': team,
+            'last_played': matches[-1] if len(matches) > 0 else None,
+            'matches': matches,
+        }
+    
+    def history_match_json_data(self, match_num, phase=None):
+        # /history/match/<match_num>[?phase=...]: everything that happened in it
+        return {'match': match_num, 'events': self._history.match_events(match_num, phase)}
+    
+    def timer_json_data(self):
+        return {'timer': self._match_state.get().web_time}
+    
+    def state_json_response(self, if_none_match=None, since=None):
+        # /state.json: everything we've parsed, so that other tools can read
+        #  it from here instead of polling the scoring manager themselves.
+        #  Returns (status, headers, body)
+        if since is not None:
+            since = self._state_hub.start_version(since)
+        return self._state_hub.respond(if_none_match, since)
+    
+    def sse_stream(self, last_event_id=None):
+        # Server-Sent Events for one client: the state, then just the changes
+        #  as they happen. Runs for as long as the client stays connected.
+        #  A client that's reconnecting picks up with whatever it missed
+        #  since the last event it saw.
+        version, changes = self._state_hub.changes_since(self._state_hub.start_version(last_event_id))
+        yield sse_message(version, changes)
+        while not self._state_hub.is_closed():
+            new_version, changes = self._state_hub.wait_for_changes(version, SSE_KEEPALIVE_PERIOD)
+            if new_version == version:
+                yield SSE_KEEPALIVE
+                continue
+            version = new_version
+            yield sse_message(version, changes)
+    # end of sse_stream
+    
     def init_webserver(self):
         try:
             ip = self._cfg['webserver_hostip']
@@ -653,37 +1364,127 @@ class ScoringParser():
         except KeyError:
             port = 9269
         
+        try:
+            server_type = self._cfg['webserver']
+        except KeyError:
+            server_type = 'werkzeug'
+        try:
+            threads = self._cfg['webserver_threads']
+        except KeyError:
+            threads = 64
+        
+        from flask import Flask, request, Response
         app = Flask(__name__)
         
         @app.route('/timer')
         def timer_page():
-            page = '<html><head><style>body {background-color: black;' +\
-               'font-family: "Trebuchet MS", sans-serif;' +\
-               '}</style></head><body> ' +\
-               '<div style="width: 100%; height: auto; bottom: 0px; top: 0px; left: 0; position: absolute;"> ' +\
-               '<div id="timer" style="height: 100vh; display: flex; justify-content: center; align-items: center; ' +\
-               'font-size: 50vh; color: white;">00:00</div></div></body></html>' +\
-               '<script type="text/javascript" src="'+self._cfg['base_address']+'/js/jquery-3.4.1.min.js"></script>' +\
-               '<script type="text/javascript" src="'+self._cfg['base_address']+'/js/bootstrap.min.js"></script>' +\
-               '<script type="text/javascript" src="'+self._cfg['base_address']+'/js/jquery-ui.min.js"></script>' +\
-               '<script type="text/javascript" src="'+self._cfg['base_address']+'/js/jquery.ba-throttle-debounce.min.js"></script>' +\
-               '<script>' +\
-               'function RefreshMatch() { var jqxhr = $.get("/timer.json", function(data) { $("#timer").html(data.timer); })' +\
-               '.fail(function() { $("#timer").html("---");} );}' +\
-               '''
-                $(document)
-                    .ready(function() {
-                        $('.navbar').hide();
-                        $('body').css('grid-template-rows', 'auto');
-                        setInterval(RefreshMatch, 100);
-                    });
-                ''' +\
-               '</script>'
-            return page
+            status, headers, body = self._timer_page.respond(request.headers.get('If-None-Match'),
+                                                             request.headers.get('Accept-Encoding'))
+            return Response(body, status=status, headers=headers)
         @app.route('/timer.json')
         def timer_json():
-            return jsonify({'timer': self._cur_web_time})
+            return Response(json.dumps(self.timer_json_data()), mimetype='application/json',
+                            headers={'Cache-Control': 'no-cache'})
+        @app.route('/state.json')
+        def state_json():
+            status, headers, body = self.state_json_response(request.headers.get('If-None-Match'),
+                                                             request.args.get('since'))
+            return Response(body, status=status, headers=headers)
+        if self._metrics.enabled:
+            @app.route('/metrics')
+            def metrics():
+                return Response(self.metrics_text(), content_type=Metrics.CONTENT_TYPE,
+                                headers={'Cache-Control': 'no-cache'})
+        if self._history is not None:
+            @app.route('/history/team/<team>')
+            def history_team(team):
+                return Response(json.dumps(self.history_team_json_data(team)),
+                                mimetype='application/json', headers={'Cache-Control': 'no-cache'})
+            @app.route('/history/match/<int:match_num>')
+            def history_match(match_num):
+                return Response(json.dumps(self.history_match_json_data(match_num, request.args.get('phase'))),
+                                mimetype='application/json', headers={'Cache-Control': 'no-cache'})
+        @app.route('/events')
+        def events():
+            return Response(self.sse_stream(request.headers.get('Last-Event-ID')),
+                            mimetype='text/event-stream',
+                            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
             
-        log = logging.getLogger('werkzeug')
-        log.setLevel(logging.ERROR)
-        threading.Thread(target=lambda: app.run(host=ip, port=port, debug=False, use_reloader=False)).start()
\ No newline at end of file
+        if server_type == 'waitress':
+            try:
+                from waitress.server import create_server
+            except ImportError:
+                print('WARNING: waitress isn\'t installed, using the Flask development server for the timer page.')
+                server_type = 'werkzeug'
+        
+        if server_type == 'waitress':
+            # every /events client holds on to one of the threads
+            self._web_server = create_server(app, host=ip, port=port, threads=threads,
+                                             connection_limit=threads*2, ident='ScoringParser')
+            serve_func = self._web_server.run
+        else:
+            # the Flask development server, but one that can be shut down
+            import logging
+            from werkzeug.serving import make_server
+            log = logging.getLogger('werkzeug')
+            log.setLevel(logging.ERROR)
+            self._web_server = make_server(ip, port, app, threaded=True)
+            serve_func = self._web_server.serve_forever
+        self._web_thread = threading.Thread(target=serve_func, name='TimerWebserver')
+        self._web_thread.daemon = True
+        self._web_thread.start()
+    # end of init_webserver
+    
+    def _stop_webserver(self):
+        if self._web_server is None:
+            return
+        if hasattr(self._web_server, 'shutdown'):
+            # werkzeug
+            self._web_server.shutdown()
+            self._web_server.server_close()
+        else:
+            # waitress: its loop keeps going for as long as it has sockets to
+            #  watch, and can't have them closed out from under it. So its
+            #  socket map gets emptied from its own thread (through its
+            #  trigger), which ends the loop, and then they get closed.
+            web_server = self._web_server
+            dispatchers = []
+            def stop_loop():
+                dispatchers.extend(web_server._map.values())
+                web_server._map.clear()
+            web_server.trigger.pull_trigger(stop_loop)
+            self._web_thread.join(self.CONNECTION_TIMEOUT)
+            if self._web_thread.is_alive():
+                print('WARNING: The timer webserver didn\'t stop in time.')
+            for dispatcher in dispatchers:
+                dispatcher.close()
+            web_server.task_dispatcher.shutdown()
+        self._web_thread.join(self.CONNECTION_TIMEOUT)
+        self._web_server = None
+    
+    def stop(self):
+        # Stops polling and the timer webserver, and waits for the last
+        #  labels to get written.
+        self._stop_flag.set()
+        self.cancel_switchover()
+        self.stop_manual_timer()
+        self._scheduler.stop(self.CONNECTION_TIMEOUT)
+        self._refresh_upcoming_flag.set()
+        for thread in [self._supervisor_thread, self._timer_display_thread,
+                       self._upcoming_thread]:
+            if thread is not None:
+                thread.join(self.CONNECTION_TIMEOUT)
+        # lets any /events clients go
+        self._state_hub.close()
+        self._stop_webserver()
+        self._output.stop()
+        if self._use_obsws:
+            self._obs_client.disconnect()
+        else:
+            self._file_sink.close()
+        if self._cache is not None:
+            self._cache.close()
+        if self._history is not None:
+            self._history.close()
+        self._client.close()
+    # end of stop
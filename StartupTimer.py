@@ -0,0 +1,38 @@
+import threading
+import time
+
+
+class StartupTimer():
+    # Keeps track of how long each part of startup takes, from launch up to
+    #  the first label getting written, so that it's easy to see where the
+    #  time goes on a slow laptop.
+    # mark() gets called at the end of each part, with its name.
+    def __init__(self, launch_time=None):
+        self._lock = threading.Lock()
+        self._launch_time = time.perf_counter() if launch_time is None else launch_time
+        self._last_time = self._launch_time
+        self.phases = []
+        self.first_label_time = None
+
+    def mark(self, phase):
+        with self._lock:
+            now = time.perf_counter()
+            self.phases.append((phase, now - self._last_time))
+            self._last_time = now
+
+    def note_label_written(self):
+        # only the first one counts
+        with self._lock:
+            if self.first_label_time is not None:
+                return
+            self.first_label_time = time.perf_counter() - self._launch_time
+        print(f'First label written {self.first_label_time:.3f} s after launch.')
+
+    def print_report(self):
+        with self._lock:
+            phases = list(self.phases)
+            total = self._last_time - self._launch_time
+        print('Startup times:')
+        for phase, secs in phases:
+            print(f'  {phase:<14}{secs*1000:>8.1f} ms')
+        print(f'  {"total":<14}{total*1000:>8.1f} ms')
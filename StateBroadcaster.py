@@ -0,0 +1,138 @@
+import json
+import os
+import threading
+
+
+class StateBroadcaster():
+    # Keeps the latest display state (timer, match number, quadrants) for
+    #  the webserver, and lets any number of clients wait for it to change,
+    #  so that they can be sent just the changes instead of polling.
+    #
+    # Every change bumps the version. A client that's fallen behind gets
+    #  everything that changed since the last version it saw, all at once.
+    # Listeners added with add_listener() get called (on whichever thread
+    #  made the change) after every change; that's how the asyncio engine
+    #  wakes up its clients.
+    # Published values get handed out as-is, so they must never be changed
+    #  in place afterwards; publish a new one instead.
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._state = {}
+        self._changed_version = {}
+        self._listeners = []
+        self._closed = False
+        self.version = 0
+        # ETags are the version, plus something different every run so that
+        #  a restart doesn't make a client think it's up to date
+        self._etag_prefix = os.urandom(4).hex()
+        self._snapshot_version = None
+        self._snapshot_body = None
+
+    def publish(self, changes):
+        # changes is {key: value}. Anything that's the same as before is
+        #  ignored.
+        with self._cond:
+            changed = {key: value for key, value in changes.items()
+                       if key not in self._state or self._state[key] != value}
+            if len(changed) == 0:
+                return
+            self.version += 1
+            for key, value in changed.items():
+                self._state[key] = value
+                self._changed_version[key] = self.version
+            self._cond.notify_all()
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener()
+
+    def changes_since(self, version):
+        # Returns (version, {key: value}) with everything that's changed
+        #  after the given version. Version 0 gets the whole state.
+        with self._cond:
+            return self.version, {key: self._state[key]
+                                  for key, changed in self._changed_version.items()
+                                  if changed > version}
+
+    def etag(self, version):
+        return f'"{self._etag_prefix}-{version}"'
+
+    def snapshot_json(self):
+        # Returns (version, body) with the whole state as JSON, only
+        #  building it once per version no matter how many clients ask
+        with self._cond:
+            if self._snapshot_version != self.version:
+                self._snapshot_body = json.dumps({'version': self.version,
+                                                  'state': self._state}).encode()
+                self._snapshot_version = self.version
+            return self._snapshot_version, self._snapshot_body
+
+    def respond(self, if_none_match=None, since=None):
+        # For the state.json endpoints. Returns (status, headers, body).
+        #  Clients that send back the ETag they got last time get a 304
+        #  (with no body) if nothing has changed since. With since, the body
+        #  only has what's changed after that version (same as the events
+        #  stream), otherwise it has the whole state.
+        headers = {'Content-Type': 'application/json', 'Cache-Control': 'no-cache'}
+        if since is None:
+            version, body = self.snapshot_json()
+        else:
+            version, changes = self.changes_since(since)
+            body = json.dumps({'version': version, 'changes': changes}).encode()
+        headers['ETag'] = self.etag(version)
+        if if_none_match is not None and headers['ETag'] in [tag.strip() for tag in if_none_match.split(',')]:
+            return 304, headers, b''
+        return 200, headers, body
+
+    def start_version(self, client_version):
+        # Where to pick up from for a client that says it's seen
+        #  client_version (from Last-Event-ID or ?since=), or None. Anything
+        #  that doesn't make sense gets the whole state.
+        try:
+            version = int(client_version)
+        except (TypeError, ValueError):
+            return 0
+        if version < 0 or version > self.version:
+            # must be from before we were restarted
+            return 0
+        return version
+
+    def wait_for_changes(self, version, timeout=None):
+        # Blocks until there's something newer than version (or timeout, or
+        #  close()), then same as changes_since()
+        with self._cond:
+            self._cond.wait_for(lambda: self.version > version or self._closed, timeout)
+        return self.changes_since(version)
+
+    def add_listener(self, listener):
+        with self._cond:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        with self._cond:
+            try:
+                self._listeners.remove(listener)
+            except ValueError:
+                pass
+
+    def is_closed(self):
+        return self._closed
+
+    def close(self):
+        # wakes everyone up so that they can go away
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener()
+
+
+def sse_message(version, changes):
+    # one Server-Sent Events message with the changes as JSON
+    return f'id: {version}\nevent: state\ndata: {json.dumps(changes)}\n\n'.encode()
+
+
+# sent when there's been nothing to send for a while, so that proxies and
+#  browsers don't give up on the connection
+SSE_KEEPALIVE = b': keepalive\n\n'
+SSE_KEEPALIVE_PERIOD = 15.0
@@ -0,0 +1,132 @@
+import json
+import os
+import threading
+import time
+
+
+def table_to_rows(table):
+    # {num: {...}} -> [[num, {...}], ...], since JSON keys can only be strings
+    return [[num, value] for num, value in table.items()]
+
+
+def rows_to_table(rows):
+    return {num: value for num, value in rows}
+
+
+def cache_file_name(config):
+    # Returns the cache file for a config, or None if caching is turned off
+    try:
+        file_name = config['cache_file']
+    except KeyError:
+        return None
+    if file_name is None or file_name == '':
+        return None
+    return file_name
+
+
+def invalidate_cache_file(config):
+    file_name = cache_file_name(config)
+    if file_name is None:
+        return
+    try:
+        os.remove(file_name)
+        print(f'Removed cache file "{file_name}".')
+    except FileNotFoundError:
+        pass
+
+
+class StateCache():
+    # Keeps what we know about the event (team list, phase, upcoming
+    #  schedule, what the labels are showing) in a small JSON file, so that
+    #  after a restart it's all there straight away instead of waiting on
+    #  the scoring manager. Everything loaded from it still gets checked
+    #  against the scoring manager once it's reachable.
+    #
+    # update() only hands the changes to the writer thread (and only when
+    #  something's actually changed), so the polling never waits on the disk.
+    #  The writer thread writes whatever's built up since its last write to a
+    #  temp file that gets renamed over the old one, so a crash part way
+    #  through never leaves a broken cache behind.
+    FORMAT_VERSION = 1
+
+    def __init__(self, file_name, base_address):
+        self._file_name = file_name
+        self._base_addr = base_address
+        self._cond = threading.Condition()
+        self._data = {}
+        self._dirty = False
+        self._stopping = False
+        self.write_cnt = 0
+        self._thread = threading.Thread(target=self._writer_thread_func, name='StateCache')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def load(self):
+        # Returns (data, age in seconds), or (None, None) if there's no
+        #  usable cache
+        try:
+            with open(self._file_name, 'r', encoding='utf-8') as cache_f:
+                saved = json.load(cache_f)
+        except FileNotFoundError:
+            return None, None
+        except (OSError, ValueError) as e:
+            print(f'WARNING: Couldn\'t read cache file "{self._file_name}", ignoring it: {e}')
+            return None, None
+        if not isinstance(saved, dict) or saved.get('format') != self.FORMAT_VERSION:
+            print(f'WARNING: Cache file "{self._file_name}" is from a different version, ignoring it.')
+            return None, None
+        if saved.get('base_address') != self._base_addr:
+            print(f'Cache file "{self._file_name}" is for a different scoring manager, ignoring it.')
+            return None, None
+        data = saved.get('data', {})
+        with self._cond:
+            self._data = dict(data)
+        return data, max(0.0, time.time() - saved.get('saved', 0.0))
+    # end of load
+
+    def update(self, **changes):
+        with self._cond:
+            if all(key in self._data and self._data[key] == value
+                   for key, value in changes.items()):
+                return
+            self._data.update(changes)
+            self._dirty = True
+            self._cond.notify()
+
+    def close(self):
+        # writes out any changes that haven't been yet
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _writer_thread_func(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._dirty or self._stopping)
+                # (the values never get changed in place, just replaced, so
+                #  a shallow copy is enough to write from)
+                data = dict(self._data) if self._dirty else None
+                self._dirty = False
+                stopping = self._stopping
+            if data is not None:
+                self._write(data)
+            if stopping:
+                return
+
+    def _write(self, data):
+        saved = {
+            'format': self.FORMAT_VERSION,
+            'base_address': self._base_addr,
+            'saved': time.time(),
+            'data': data,
+        }
+        tmp_name = self._file_name + '.tmp'
+        try:
+            with open(tmp_name, 'w', encoding='utf-8') as cache_f:
+                json.dump(saved, cache_f, separators=(',', ':'))
+            os.replace(tmp_name, self._file_name)
+            self.write_cnt += 1
+        except OSError as e:
+            print(f'WARNING: Couldn\'t write cache file "{self._file_name}": {e}')
+    # end of _write
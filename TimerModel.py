@@ -0,0 +1,160 @@
+import math
+import threading
+import time
+
+
+def parse_timer_text(timer_text):
+    # 'M:SS' or 'MM:SS' to seconds, or None if it isn't a timer
+    try:
+        minutes, seconds = timer_text.split(':')
+        return int(minutes) * 60 + int(seconds)
+    except (AttributeError, ValueError):
+        return None
+
+
+def format_timer_text(secs, like_text=''):
+    # seconds back to text, with the minutes padded the same way as like_text
+    minutes_width = 2 if len(like_text.split(':')[0]) >= 2 else 1
+    return f'{secs // 60:0{minutes_width}d}:{secs % 60:02d}'
+
+
+class TimerModel():
+    # Keeps the match timer counting down between polls, so that it can be
+    #  shown at display rate instead of only as often as the scoring manager
+    #  gets polled.
+    #
+    # Once the polled timer is seen to tick down, the time left gets worked
+    #  out from a monotonic clock, starting from the last tick that was seen.
+    #  Each poll after that is only used to line the clock back up:
+    #   - a tick had to happen somewhere between the poll before it and the
+    #     poll that saw it. Lining that window up with the ones from earlier
+    #     ticks narrows down when the scoring manager's second actually
+    #     rolls over, so the clock ends up ticking within a few ms of it,
+    #     even with slow polls. The shown time never goes back up, so if
+    #     the clock was a little ahead, it just holds until the scoring
+    #     manager catches up.
+    #   - if the polled time is more than drift_threshold seconds away from
+    #     what the clock says, it jumps straight to the polled time.
+    #   - if the timer goes back up (reset), or the polls stop seeing it
+    #     tick (paused), it stops counting and just shows what's polled.
+    #   - if there haven't been any polls for a while, it stops counting
+    #     rather than run on by itself.
+    # All times are from time.monotonic(), unless a 'now' is passed in.
+    def __init__(self, drift_threshold=1.0, pause_time=1.5, stale_time=5.0):
+        self.DRIFT_THRESHOLD = drift_threshold
+        # more than a second without a tick means it's been paused
+        self.PAUSE_TIME = pause_time
+        self.STALE_TIME = stale_time
+        self._lock = threading.Lock()
+        self.resync_cnt = 0
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._last_text = ''
+            self._last_secs = None
+            self._last_change_time = None
+            self._last_seen_time = None
+            self._running = False
+            self._anchor_secs = None
+            self._anchor_time = None
+            self._anchor_earliest = None
+            self._shown_secs = None
+
+    def _predicted_secs(self, now):
+        return max(self._anchor_secs - math.floor(now - self._anchor_time), 0)
+
+    def _start_counting(self, secs, now):
+        self._running = True
+        self._anchor_secs = secs
+        self._anchor_time = now
+        self._anchor_earliest = self._last_seen_time
+        self._shown_secs = secs
+
+    def _line_up_tick(self, secs, now):
+        # The tick to secs happened after the last poll and no later than
+        #  now. Shift the window we already have to this tick and keep just
+        #  the overlap. Anchoring on the end of the window means the clock
+        #  is never early.
+        shift = self._anchor_secs - secs
+        earliest = max(self._anchor_earliest + shift, self._last_seen_time)
+        latest = min(self._anchor_time + shift, now)
+        if earliest > latest:
+            # doesn't line up (scoring manager's clock isn't quite steady),
+            #  so start over from this tick
+            earliest = self._last_seen_time
+            latest = now
+        self._anchor_secs = secs
+        self._anchor_time = latest
+        self._anchor_earliest = earliest
+
+    def update(self, timer_text, now=None):
+        # A freshly polled timer text. Any time it's polled but the page
+        #  hasn't changed, call confirm() instead.
+        if now is None:
+            now = time.monotonic()
+        secs = parse_timer_text(timer_text)
+        with self._lock:
+            if secs is None:
+                self._running = False
+            elif secs != self._last_secs:
+                if self._running:
+                    predicted = self._predicted_secs(now)
+                    if secs > self._last_secs:
+                        # went back up, must have been reset
+                        self._running = False
+                    elif abs(secs - predicted) > self.DRIFT_THRESHOLD:
+                        self.resync_cnt += 1
+                        self._start_counting(secs, now)
+                    else:
+                        # just a tick, line the clock up with it
+                        self._line_up_tick(secs, now)
+                elif self._last_secs is not None and secs == self._last_secs - 1:
+                    # ticked down by one, so it's counting
+                    self._start_counting(secs, now)
+                self._last_change_time = now
+            if secs == 0:
+                # nothing left to count
+                self._running = False
+            self._last_text = timer_text
+            self._last_secs = secs
+            self._last_seen_time = now
+    # end of update
+
+    def confirm(self, now=None):
+        # The timer got polled again and it hasn't changed. Returns True if
+        #  that means it's just now been paused.
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            self._last_seen_time = now
+            if not self._running:
+                return False
+            if now - self._last_change_time > self.PAUSE_TIME:
+                self._running = False
+                return True
+            if abs(self._last_secs - self._predicted_secs(now)) > self.DRIFT_THRESHOLD:
+                self.resync_cnt += 1
+                self._start_counting(self._last_secs, now)
+            return False
+    # end of confirm
+
+    def is_running(self, now=None):
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            return self._is_running(now)
+
+    def _is_running(self, now):
+        return self._running and now - self._last_seen_time <= self.STALE_TIME
+
+    def text(self, now=None):
+        # What the timer should show right now
+        if now is None:
+            now = time.monotonic()
+        with self._lock:
+            if not self._is_running(now):
+                return self._last_text
+            secs = min(self._predicted_secs(now), self._shown_secs)
+            self._shown_secs = secs
+            return format_timer_text(secs, self._last_text)
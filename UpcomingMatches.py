@@ -0,0 +1,101 @@
+import re
+import threading
+from ScoringPageParser import UpcomingPage
+
+_TBODY_START = re.compile(rb'<tbody[^>]*>', re.IGNORECASE)
+_TBODY_END = re.compile(rb'</tbody\s*>', re.IGNORECASE)
+_ROW_START = re.compile(rb'<tr[\s>]', re.IGNORECASE)
+
+
+def split_upcoming_rows(content):
+    # Cuts the raw upcoming matches page up into the HTML for each row of
+    #  its table, without parsing it. Returns None if the page isn't laid
+    #  out the way we expect (a single tbody).
+    start = _TBODY_START.search(content)
+    if start is None:
+        return None
+    end = _TBODY_END.search(content, start.end())
+    if end is None or _TBODY_START.search(content, end.end()) is not None:
+        return None
+    body = content[start.end():end.start()]
+    row_starts = [m.start() for m in _ROW_START.finditer(body)]
+    return [body[row_start:row_end]
+            for row_start, row_end in zip(row_starts, row_starts[1:] + [len(body)])]
+
+
+class UpcomingMatches():
+    # The upcoming match schedule, as {match_num: {field_num: {color: team_text}}}
+    #  (table), kept up to date from the /Marquee/PitRefresh page.
+    # Most of that page stays the same from one refresh to the next (a match
+    #  finishing just drops a few rows off the top), so each row's raw HTML
+    #  is remembered along with what it parsed to, and only the rows that
+    #  are new since last time get parsed.
+    # update() can be called from any thread. table gets replaced, never
+    #  changed in place, so it's always safe to read.
+    def __init__(self, page_parser):
+        self._page_parser = page_parser
+        self._lock = threading.Lock()
+        self._row_cache = {}
+        self.table = {}
+        # whether there's been a good page yet
+        self.loaded = False
+        self.rows_parsed = 0
+        self.rows_reused = 0
+
+    def update(self, content):
+        # Returns the same UpcomingPage that parse_upcoming_page() would,
+        #  and updates table to match (empty if there are no rows).
+        with self._lock:
+            page = self._parse_incremental(content)
+            if page is None:
+                # not laid out like we expected, parse the whole thing
+                page = self._page_parser.parse_upcoming_page(content)
+                self._row_cache = {}
+                self.rows_parsed += len(page.rows) if page.rows is not None else 0
+            if page.rows is None:
+                self.table = {}
+            else:
+                self.table = self._page_parser.upcoming_rows_to_table(page.rows)
+            self.loaded = True
+            return page
+    # end of update
+
+    def restore(self, table):
+        # Starts off with a table from before (out of the cache). The next
+        #  update() replaces it.
+        with self._lock:
+            self.table = table
+            self.loaded = True
+
+    def _parse_incremental(self, content):
+        chunks = split_upcoming_rows(content)
+        if chunks is None:
+            return None
+        if len(chunks) == 0:
+            self._row_cache = {}
+            return UpcomingPage(None, [])
+
+        new_chunks = [chunk for chunk in chunks if chunk not in self._row_cache]
+        row_cache = {chunk: self._row_cache[chunk] for chunk in chunks if chunk in self._row_cache}
+        if len(new_chunks) > 0:
+            parsed = self._page_parser.parse_upcoming_row_chunks(new_chunks)
+            if parsed is None:
+                return None
+            row_cache.update(zip(new_chunks, parsed))
+        self.rows_parsed += len(new_chunks)
+        self.rows_reused += len(chunks) - len(new_chunks)
+        # only keep what's still on the page
+        self._row_cache = row_cache
+
+        errors = []
+        rows = []
+        for chunk in chunks:
+            row = row_cache[chunk]
+            if row is None:
+                continue
+            if isinstance(row, str):
+                errors.append(row)
+                continue
+            rows.append(row)
+        return UpcomingPage(rows, errors)
+    # end of _parse_incremental
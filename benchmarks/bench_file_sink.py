@@ -0,0 +1,81 @@
+# Measures label writes per second for the 'inplace' and 'atomic' file sink
+#  modes, and how often a reader polling the file (like OBS does) sees a torn
+#  label: one that is blank or isn't one of the texts that was written.
+#
+# Run from the repo root:
+#   python benchmarks/bench_file_sink.py [seconds per case]
+import os
+import sys
+import tempfile
+import threading
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from FileLabelSink import FileLabelSink
+
+LABEL_TEXTS = ['Team 12 Robotics', 'Team 345 Mechanical Marvels', 'Team 6 Bots']
+NUM_LABELS = 10
+
+
+def reader_thread_func(paths, stop_flag, counts):
+    valid = set(LABEL_TEXTS)
+    while not stop_flag.is_set():
+        for path in paths:
+            try:
+                with open(path, 'r') as label_f:
+                    text = label_f.read()
+            except OSError:
+                counts['failed'] += 1
+                continue
+            counts['reads'] += 1
+            if text not in valid:
+                counts['torn'] += 1
+
+
+def run_case(write_mode, fsync_policy, duration):
+    with tempfile.TemporaryDirectory() as rel_path:
+        file_names = {idx: f'label{idx}.txt' for idx in range(NUM_LABELS)}
+        sink = FileLabelSink(rel_path, file_names, write_mode, fsync_policy)
+        # start every label off with valid text
+        sink.begin_batch()
+        for key in file_names:
+            sink.write(key, LABEL_TEXTS[0], lambda: None)
+        sink.end_batch()
+
+        paths = [os.path.join(rel_path, fname) for fname in file_names.values()]
+        stop_flag = threading.Event()
+        counts = {'reads': 0, 'torn': 0, 'failed': 0}
+        reader = threading.Thread(target=reader_thread_func, args=(paths, stop_flag, counts))
+        reader.start()
+
+        writes = 0
+        start = time.perf_counter()
+        while time.perf_counter() - start < duration:
+            # one update that changes every label, like a match switchover
+            text = LABEL_TEXTS[writes // NUM_LABELS % len(LABEL_TEXTS)]
+            sink.begin_batch()
+            for key in file_names:
+                sink.write(key, text, lambda: None)
+            sink.end_batch()
+            writes += NUM_LABELS
+        elapsed = time.perf_counter() - start
+
+        stop_flag.set()
+        reader.join()
+        sink.close()
+    return writes / elapsed, counts
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    print(f'{"mode":<10}{"fsync":<8}{"writes/s":>12}{"reads":>10}{"torn":>8}{"torn %":>9}')
+    for write_mode in ['inplace', 'atomic']:
+        for fsync_policy in ['never', 'data']:
+            rate, counts = run_case(write_mode, fsync_policy, duration)
+            torn_pct = counts['torn'] / max(counts['reads'], 1) * 100
+            print(f'{write_mode:<10}{fsync_policy:<8}{rate:>12.0f}{counts["reads"]:>10}'
+                  f'{counts["torn"]:>8}{torn_pct:>8.2f}%')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+# What the /metrics instrumentation costs per poll: the clock() and
+#  observe_since() calls a changed match page goes through (HTTP round trip,
+#  change detection, parse, label write, latency), with metrics turned off
+#  and on, next to the time it takes to parse the page itself.
+#
+# Run from the repo root:
+#   python benchmarks/bench_metrics.py
+import os
+import sys
+import timeit
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Metrics import Metrics, NO_METRICS
+from ScoringPageParser import ScoringPageParser, QUAD_COLORS
+import sample_pages
+
+
+def one_poll(metrics):
+    start = metrics.clock()
+    metrics.observe_since('http_request_seconds', start, endpoint='match')
+    start = metrics.clock()
+    metrics.observe_since('change_detection_seconds', start, endpoint='match')
+    start = metrics.clock()
+    metrics.observe_since('parse_seconds', start, page='match')
+    if metrics.enabled:
+        metrics.observe('label_write_seconds', 0.0001, count=13, sink='file')
+        metrics.observe('label_latency_seconds', 0.002, sink='file')
+
+
+def main():
+    number = 20000
+    page_parser = ScoringPageParser(QUAD_COLORS)
+    content = sample_pages.match_page()
+    parse_time = min(timeit.repeat(lambda: page_parser.parse_match_page(content),
+                                   number=2000, repeat=3)) / 2000
+
+    print(f'{"metrics":<10}{"us/poll":>10}{"% of parse":>12}')
+    for name, metrics in [('off', NO_METRICS), ('on', Metrics())]:
+        per_poll = min(timeit.repeat(lambda: one_poll(metrics), number=number, repeat=3)) / number
+        print(f'{name:<10}{per_poll*1e6:>10.2f}{per_poll / parse_time * 100:>11.1f}%')
+    print(f'(parsing the match page takes {parse_time*1e6:.1f} us)')
+
+
+if __name__ == '__main__':
+    main()
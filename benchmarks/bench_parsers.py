@@ -0,0 +1,102 @@
+# Compares the per-page parse time of ScoringPageParser against the PyQuery
+#  based parsing that ScoringParser used to do.
+#
+# Run from the repo root:
+#   python benchmarks/bench_parsers.py
+import os
+import sys
+import timeit
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pyquery import PyQuery as pq
+from ScoringPageParser import ScoringPageParser, QUAD_COLORS
+import sample_pages
+
+
+# --- the old PyQuery code paths, kept here for comparison ---
+def pq_match_page(content):
+    root_parse = pq(content)
+    timer = root_parse('.nameAndTimer > h2')[0].text
+    split_str = root_parse('.nameAndTimer > h3')[0].text.split(' ')
+    phase, match_num = split_str[0], int(split_str[-1])
+    table = {}
+    for field_elem in root_parse('.fields > .field').items():
+        field_num = int(field_elem('table > tr > th')[0].text[6:])
+        table[field_num] = {}
+        for color in QUAD_COLORS:
+            elem_quad = field_elem('table > tr > td.light-'+color)
+            table[field_num][color] = elem_quad[0].text.strip()
+    return timer, phase, match_num, table
+
+
+def pq_upcoming_page(content):
+    root_parse = pq(content)
+    ret_dict = {}
+    for elem_row in root_parse('table > tbody > tr').items():
+        elem_match_field = elem_row("td[style='white-space:nowrap']")
+        if not elem_match_field:
+            continue
+        match_split = elem_match_field[0].text.split(' - ')
+        match_num = int(match_split[0])
+        field_num = int(match_split[1])
+        ret_dict.setdefault(match_num, {}).setdefault(field_num, {})
+        for color in QUAD_COLORS:
+            elem_quad = elem_row('td.'+color)
+            ret_dict[match_num][field_num][color] = elem_quad[0].text.strip() if elem_quad else ''
+    return ret_dict
+
+
+def pq_phase_page(content):
+    return pq(content)('h2')[0].text[:-6]
+
+
+def pq_lookup_page(content):
+    elem_team_select = pq(content)('#LookupInfo > .row > select.form-control:first-of-type')
+    teams = []
+    for elem_option in elem_team_select('option[selected] ~ option'):
+        teams.append((int(elem_option.values()[-1]), elem_option.text.split(' (')[0]))
+    return teams
+# --- end of old code paths ---
+
+
+def check_same_results(parser, pages):
+    page = parser.parse_match_page(pages['match'])
+    assert (page.timer, page.phase, page.match_num, page.fields) == pq_match_page(pages['match'])
+    upcoming = parser.parse_upcoming_page(pages['upcoming'])
+    assert parser.upcoming_rows_to_table(upcoming.rows) == pq_upcoming_page(pages['upcoming'])
+    assert parser.parse_phase_page(pages['phase']).phase == pq_phase_page(pages['phase'])
+    assert parser.parse_lookup_page(pages['lookup']).teams == pq_lookup_page(pages['lookup'])
+
+
+def time_per_call(func, content, min_time=0.5):
+    timer = timeit.Timer(lambda: func(content))
+    number, _ = timer.autorange()
+    number = max(number, int(number * min_time / 0.2))
+    return min(timer.repeat(repeat=3, number=number)) / number
+
+
+def main():
+    pages = {
+        'match': sample_pages.match_page(num_fields=3),
+        'upcoming': sample_pages.upcoming_page(num_fields=3, num_rows=120),
+        'phase': sample_pages.phase_page(),
+        'lookup': sample_pages.lookup_page(num_teams=60),
+    }
+    parser = ScoringPageParser()
+    check_same_results(parser, pages)
+
+    cases = [
+        ('/Marquee/Match', 'match', pq_match_page, parser.parse_match_page),
+        ('/Marquee/PitRefresh', 'upcoming', pq_upcoming_page, parser.parse_upcoming_page),
+        ('/phase', 'phase', pq_phase_page, parser.parse_phase_page),
+        ('/lookup', 'lookup', pq_lookup_page, parser.parse_lookup_page),
+    ]
+    print(f'{"page":<22}{"pyquery (us)":>14}{"compiled (us)":>15}{"speedup":>10}')
+    for name, key, old_func, new_func in cases:
+        old_time = time_per_call(old_func, pages[key])
+        new_time = time_per_call(new_func, pages[key])
+        print(f'{name:<22}{old_time*1e6:>14.1f}{new_time*1e6:>15.1f}{old_time/new_time:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
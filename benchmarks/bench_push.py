@@ -0,0 +1,162 @@
+# Load test for the timer webserver: 50 clients (like OBS browser sources
+#  and arena screens) either polling /timer.json every 100 ms the way the old
+#  timer page did, or holding /events open and getting changes pushed.
+#  Reports the requests the webserver had to handle, the updates the clients
+#  saw, and the parser process' CPU use, for both engines.
+#
+# Run from the repo root:
+#   python benchmarks/bench_push.py [seconds per case] [clients]
+import asyncio
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fake_scoring_manager
+
+SERVER_PORT = 19468
+WEB_PORT = 19469
+POLL_PERIOD = 0.1
+
+
+def parser_config(engine, rel_path):
+    fields = []
+    for field_num in range(1, fake_scoring_manager.NUM_FIELDS+1):
+        fields.append({color + '_file': f'f{field_num}_{color}.txt'
+                       for color in ['red', 'green', 'blue', 'yellow']})
+    return {
+        'base_address': f'http://127.0.0.1:{SERVER_PORT}',
+        'parsing_period': 0.1,
+        'engine': engine,
+        'manual_timer': False,
+        'host_timer_webserver': True,
+        'webserver_hostip': '127.0.0.1',
+        'webserver_port': WEB_PORT,
+        'auto_switchover': True,
+        'switchover_time': 10.0,
+        'show_match_phase': True,
+        'use_obs_websocket': False,
+        'rel_file_path': rel_path,
+        'timer_file': 'timer.txt',
+        'match_num_file': 'match_num.txt',
+        'fields': fields,
+    }
+
+
+def run_child(engine, duration):
+    # Runs the parser in its own process. Says 'ready' once it's up, then
+    #  prints one line of JSON with its CPU use over the next 'duration'
+    #  seconds.
+    import contextlib
+    import io
+    with tempfile.TemporaryDirectory() as rel_path:
+        with contextlib.redirect_stdout(io.StringIO()):
+            if engine == 'asyncio':
+                from AsyncScoringParser import AsyncScoringParser
+                AsyncScoringParser(parser_config(engine, rel_path))
+            else:
+                from ScoringParser import ScoringParser
+                ScoringParser(parser_config(engine, rel_path))
+            time.sleep(2.0)
+        print('ready', flush=True)
+        cpu_start = time.process_time()
+        time.sleep(duration)
+        cpu = time.process_time() - cpu_start
+        print(json.dumps({'cpu_pct': cpu / duration * 100}), flush=True)
+        # the Flask thread doesn't stop, so just go
+        os._exit(0)
+
+
+async def poll_client(session, url, stop_time, counts):
+    last = None
+    while time.monotonic() < stop_time:
+        try:
+            async with session.get(url) as resp:
+                data = await resp.json()
+            counts['requests'] += 1
+            if data['timer'] != last:
+                last = data['timer']
+                counts['updates'] += 1
+        except Exception:
+            counts['errors'] += 1
+        await asyncio.sleep(POLL_PERIOD)
+
+
+async def push_client(session, url, stop_time, counts):
+    try:
+        async with session.get(url) as resp:
+            counts['requests'] += 1
+            while time.monotonic() < stop_time:
+                try:
+                    line = await asyncio.wait_for(resp.content.readline(),
+                                                  stop_time - time.monotonic())
+                except asyncio.TimeoutError:
+                    break
+                if line.startswith(b'data:'):
+                    counts['updates'] += 1
+    except Exception:
+        counts['errors'] += 1
+
+
+async def run_clients(mode, num_clients, duration):
+    import aiohttp
+    counts = {'requests': 0, 'updates': 0, 'errors': 0}
+    stop_time = time.monotonic() + duration
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        if mode == 'poll':
+            url = f'http://127.0.0.1:{WEB_PORT}/timer.json'
+            client_func = poll_client
+        else:
+            url = f'http://127.0.0.1:{WEB_PORT}/events'
+            client_func = push_client
+        await asyncio.gather(*(client_func(session, url, stop_time, counts)
+                               for idx in range(num_clients)))
+    return counts
+
+
+def run_case(engine, mode, num_clients, duration):
+    child = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--child',
+                              engine, str(duration)],
+                             stdout=subprocess.PIPE, text=True)
+    try:
+        child.stdout.readline()  # ready
+        counts = asyncio.run(run_clients(mode, num_clients, duration))
+        result = json.loads(child.stdout.readline())
+    finally:
+        child.wait(10)
+    return counts, result['cpu_pct']
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    num_clients = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    server = multiprocessing.Process(target=fake_scoring_manager.serve, args=(SERVER_PORT,))
+    server.daemon = True
+    server.start()
+    time.sleep(1.0)
+
+    print(f'{num_clients} clients, {duration:.0f} s each')
+    print(f'{"engine":<9}{"mode":<6}{"requests/s":>12}{"updates/client/s":>18}'
+          f'{"errors":>8}{"parser CPU %":>14}')
+    try:
+        for engine in ['threads', 'asyncio']:
+            for mode in ['poll', 'push']:
+                counts, cpu_pct = run_case(engine, mode, num_clients, duration)
+                print(f'{engine:<9}{mode:<6}{counts["requests"] / duration:>12.1f}'
+                      f'{counts["updates"] / duration / num_clients:>18.2f}'
+                      f'{counts["errors"]:>8}{cpu_pct:>14.1f}')
+    finally:
+        server.terminate()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        run_child(sys.argv[2], float(sys.argv[3]))
+    else:
+        main()
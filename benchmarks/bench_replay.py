@@ -0,0 +1,199 @@
+# End to end, offline: a synthetic event (a few matches, with the time in
+#  between) gets played back sped up by replay_scoring_manager.py, the parser
+#  polls it and sends the labels to fake_obs.py, and the requests OBS got
+#  are checked against what the scoring manager was showing when:
+#   - timer latency: from the scoring manager's timer changing to OBS
+#     getting the new text
+#   - switchover: from a match ending to OBS showing the next match (from
+#     the upcoming match table, before the scoring manager has it up)
+#   - how many requests and batches OBS got, and the parser's CPU use
+# Works the same on a recording from record_scoring_manager.py, given its
+#  file name (without the switchover checks, which need the synthetic event).
+#
+# Run from the repo root:
+#   python benchmarks/bench_replay.py [threads|asyncio] [speed] [recording]
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import urllib.request
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ReplayArchive import ArchiveWriter, ReplayArchive
+import fake_obs
+import replay_scoring_manager
+import sample_pages
+
+REPLAY_PORT = 19580
+OBS_PORT = 19581
+NUM_FIELDS = 3
+NUM_MATCHES = 3
+MATCH_SECS = 30
+# scoring manager time (not sped up) between a match ending and the next one
+#  being loaded, and then between it being loaded and starting
+POST_SECS = 40
+STAGED_SECS = 10
+
+
+def timer_text(secs):
+    return f'{secs // 60:02d}:{secs % 60:02d}'
+
+
+def build_event(file_name):
+    # Returns {match_num: (recording time it ended, recording time it got loaded)}
+    writer = ArchiveWriter(file_name, 'synthetic', started=0.0)
+    writer.record('phase', 200, sample_pages.phase_page(), t=0.0)
+    writer.record('lookup', 200, sample_pages.lookup_page(), t=0.0)
+    times = {}
+    t = 0.0
+    for match_num in range(1, NUM_MATCHES+1):
+        num_rows = (NUM_MATCHES - match_num + 1) * NUM_FIELDS
+        writer.record('upcoming', 200, sample_pages.upcoming_page(NUM_FIELDS, num_rows, match_num), t=t)
+        loaded = t
+        writer.record('match', 200, sample_pages.match_page(NUM_FIELDS, match_num, timer_text(MATCH_SECS)), t=t)
+        t += STAGED_SECS
+        for remaining in range(MATCH_SECS-1, -1, -1):
+            t += 1.0
+            writer.record('match', 200, sample_pages.match_page(NUM_FIELDS, match_num, timer_text(remaining)), t=t)
+        times[match_num] = (t, loaded)
+        # the match that's just been played drops off of the schedule
+        num_rows = (NUM_MATCHES - match_num) * NUM_FIELDS
+        writer.record('upcoming', 200, sample_pages.upcoming_page(NUM_FIELDS, num_rows, match_num+1), t=t+2.0)
+        t += POST_SECS
+    writer.close()
+    return times
+
+
+def parser_config(engine, switchover_time):
+    fields = []
+    for field_num in range(1, NUM_FIELDS+1):
+        fields.append({color + '_source': f'F{field_num}{color}'
+                       for color in sample_pages.QUAD_COLORS})
+    return {
+        'base_address': f'http://127.0.0.1:{REPLAY_PORT}',
+        'parsing_period': 0.1,
+        'engine': engine,
+        'manual_timer': False,
+        'host_timer_webserver': False,
+        'auto_switchover': True,
+        'switchover_time': switchover_time,
+        'show_match_phase': True,
+        'use_obs_websocket': True,
+        'obs_websocket_addr': '127.0.0.1',
+        'obs_websocket_port': OBS_PORT,
+        'obs_websocket_pw': '',
+        'timer_source': 'Timer',
+        'match_num_source': 'Match',
+        'fields': fields,
+    }
+
+
+def get_json(url):
+    with urllib.request.urlopen(url) as resp:
+        return json.loads(resp.read())
+
+
+def text_changes(calls, src_name):
+    # [(time, text)] for each time the source's text got set
+    changes = []
+    for call in calls:
+        if call['type'] == 'SetInputSettings' and call['data'].get('inputName') == src_name:
+            settings = call['data'].get('inputSettings', {})
+            if 'text' in settings:
+                changes.append((call['time'], settings['text']))
+    return changes
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values)-1, int(len(values) * pct))]
+
+
+def main():
+    engine = sys.argv[1] if len(sys.argv) > 1 else 'threads'
+    speed = float(sys.argv[2]) if len(sys.argv) > 2 else 5.0
+    recording = sys.argv[3] if len(sys.argv) > 3 else None
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        match_times = None
+        if recording is None:
+            recording = os.path.join(tmp_dir, 'event.jsonl.gz')
+            match_times = build_event(recording)
+        archive = ReplayArchive(recording)
+        obs = multiprocessing.Process(target=fake_obs.serve, kwargs={'port': OBS_PORT})
+        replay = multiprocessing.Process(target=replay_scoring_manager.serve, args=(recording,),
+                                         kwargs={'port': REPLAY_PORT, 'speed': speed})
+        for server in [obs, replay]:
+            server.daemon = True
+            server.start()
+        time.sleep(1.0)
+        try:
+            status = get_json(f'http://127.0.0.1:{REPLAY_PORT}/replay.json')
+            # half of the time between matches, at playback speed
+            switchover_time = POST_SECS / speed / 2
+            if engine == 'asyncio':
+                from AsyncScoringParser import AsyncScoringParser
+                scoring_parser = AsyncScoringParser(parser_config(engine, switchover_time))
+            else:
+                from ScoringParser import ScoringParser
+                scoring_parser = ScoringParser(parser_config(engine, switchover_time))
+            cpu_start = time.process_time()
+            run_time = archive.duration / speed + 2.0
+            print(f'Playing back {archive.duration:.0f} s at {speed:g}x ({run_time:.0f} s), {engine} engine')
+            time.sleep(max(0, status['started'] + run_time - time.time()))
+            cpu = time.process_time() - cpu_start
+            scoring_parser.stop()
+            calls = get_json(f'http://127.0.0.1:{OBS_PORT}/calls.json')['calls']
+        finally:
+            obs.terminate()
+            replay.terminate()
+
+    def wall_time(t):
+        # when the playback got to t seconds into the recording
+        return status['started'] + (t - status['start_at']) / speed
+
+    # timer latency: the first time OBS got each new timer text
+    timer_sets = text_changes(calls, 'Timer')
+    latencies = []
+    missed = 0
+    for t, page_status, body in archive.changes('match'):
+        # (the first page is up before the parser's connected)
+        if b'<h2>' not in body or t < 1.0:
+            continue
+        text = body.split(b'<h2>')[1].split(b'</h2>')[0].decode()
+        changed_at = wall_time(t)
+        sets = [set_time for set_time, set_text in timer_sets
+                if set_text == text and set_time >= changed_at - 0.001]
+        if len(sets) == 0:
+            missed += 1
+            continue
+        latencies.append(sets[0] - changed_at)
+    if len(latencies) > 0:
+        print(f'timer latency: {len(latencies)} changes, p50 {percentile(latencies, 0.5)*1000:.0f} ms, '
+              f'p99 {percentile(latencies, 0.99)*1000:.0f} ms, max {max(latencies)*1000:.0f} ms, '
+              f'{missed} never shown')
+
+    if match_times is not None:
+        match_sets = text_changes(calls, 'Match')
+        for match_num in range(2, NUM_MATCHES+1):
+            ended, _ = match_times[match_num-1]
+            _, loaded = match_times[match_num]
+            shown = [set_time for set_time, text in match_sets
+                     if text == f'Seeding {match_num}' and set_time >= wall_time(ended)]
+            if len(shown) == 0:
+                print(f'switchover to match {match_num}: never happened')
+                continue
+            after_end = shown[0] - wall_time(ended)
+            before_loaded = wall_time(loaded) - shown[0]
+            print(f'switchover to match {match_num}: {after_end:.2f} s after the last one ended '
+                  f'(switchover_time {switchover_time:.2f} s), {before_loaded:.2f} s before the '
+                  f'scoring manager had it up')
+
+    batches = len({call['batch'] for call in calls if 'batch' in call})
+    print(f'OBS: {len(calls)} requests, {batches} batches; parser CPU {cpu / run_time * 100:.1f}%')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+# Accuracy of a manual timer countdown over a full match: the obvious
+#  sleep(1) loop vs. ticks on the Scheduler at deadlines worked out from when
+#  the countdown started (what ScoringParser does). Every tick writes a label,
+#  which takes a few ms, and optionally there are busy threads competing for
+#  the GIL. Reports how late the ticks were, and how far off the end of the
+#  countdown was, against one frame at 60 fps.
+#
+# Run from the repo root:
+#   python benchmarks/bench_scheduler.py [match seconds] [busy threads]
+import math
+import os
+import sys
+import threading
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Scheduler import Scheduler
+
+FRAME = 1 / 60
+# about what writing a label takes
+LABEL_WRITE_TIME = 0.005
+
+
+def write_label(secs):
+    time.sleep(LABEL_WRITE_TIME)
+
+
+def sleep_loop_countdown(match_secs):
+    # returns [(seconds shown, how late it was shown)]
+    ticks = []
+    start = time.monotonic()
+    secs = match_secs
+    while True:
+        ticks.append((secs, time.monotonic() - (start + match_secs - secs)))
+        write_label(secs)
+        if secs == 0:
+            return ticks
+        time.sleep(1.0)
+        secs -= 1
+
+
+def scheduler_countdown(match_secs):
+    scheduler = Scheduler('BenchScheduler')
+    ticks = []
+    done = threading.Event()
+    end = scheduler.time() + match_secs
+
+    def tick():
+        now = scheduler.time()
+        secs = max(0, math.ceil(round(end - now, 6)))
+        ticks.append((secs, now - (end - secs)))
+        write_label(secs)
+        if secs > 0:
+            scheduler.call_at(end - (secs - 1), tick)
+        else:
+            done.set()
+
+    tick()
+    done.wait()
+    scheduler.stop()
+    return ticks
+
+
+def busy_thread_func(stop_flag):
+    while not stop_flag.is_set():
+        sum(range(1000))
+
+
+def report(name, ticks, match_secs):
+    shown = [secs for secs, lateness in ticks]
+    skipped = (match_secs + 1) - len(set(shown))
+    lateness = [lateness for secs, lateness in ticks]
+    end_drift = lateness[-1]
+    print(f'{name:<12}{len(ticks):>7}{skipped:>9}{max(lateness)*1000:>14.1f}'
+          f'{end_drift*1000:>14.1f}   {"ok" if abs(end_drift) < FRAME else "OFF"}')
+
+
+def main():
+    match_secs = int(sys.argv[1]) if len(sys.argv) > 1 else 150
+    num_busy = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+
+    stop_flag = threading.Event()
+    for idx in range(num_busy):
+        busy_thread = threading.Thread(target=busy_thread_func, args=(stop_flag,))
+        busy_thread.daemon = True
+        busy_thread.start()
+
+    print(f'{match_secs} s countdown, {num_busy} busy threads, '
+          f'one frame = {FRAME*1000:.1f} ms')
+    print(f'{"countdown":<12}{"ticks":>7}{"skipped":>9}{"max late ms":>14}'
+          f'{"end drift ms":>14}')
+    results = {}
+    # both at once, so they see the same load
+    cases = {'sleep loop': sleep_loop_countdown, 'scheduler': scheduler_countdown}
+    threads = []
+    for name, func in cases.items():
+        case_thread = threading.Thread(target=lambda name=name, func=func:
+                                       results.__setitem__(name, func(match_secs)))
+        case_thread.start()
+        threads.append(case_thread)
+    for case_thread in threads:
+        case_thread.join()
+    stop_flag.set()
+    for name in cases:
+        report(name, results[name], match_secs)
+
+
+if __name__ == '__main__':
+    main()
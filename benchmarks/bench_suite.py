@@ -0,0 +1,274 @@
+# The parsing and label writing the parser does per poll, timed on synthetic
+#  scoring manager pages from small to far bigger than any real event (up to
+#  16 fields, 1000 upcoming rows, 500 teams), with no network, threads or OBS:
+#   - match_poll: handling a changed /Marquee/Match page, parse through to
+#     handing the labels off (the polling loop's share of a poll)
+#   - upcoming_full: parsing the whole /Marquee/PitRefresh page into the
+#     upcoming match table
+#   - upcoming_refresh: the refresh after a match drops off the schedule
+#   - team_lookup: parsing the /lookup page into the team list
+#   - label_file / label_obs: writing every label, to files in a temp
+#     directory and to a stand-in OBS client that answers right away
+#
+# Each time gets compared against baselines.json (next to this file), and
+#  the run fails (exit code 1) if any case got more than --tolerance slower.
+#  Times are compared relative to a fixed pure-Python calibration loop timed
+#  in the same run, so baselines saved on one machine still mean something
+#  on another. After a change that's meant to make something slower (or
+#  faster), save new baselines with --save and commit them along with it.
+#
+# Run from the repo root:
+#   python benchmarks/bench_suite.py [--save] [--tolerance 0.5] [--quick]
+#                                    [--only match_poll] [--json results.json]
+import argparse
+import itertools
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import timeit
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from LabelOutput import LabelUpdate
+from ScoringParser import ScoringParser
+import sample_pages
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+BASELINE_FORMAT = 1
+
+
+class StubOutput():
+    # takes the place of the output stage: label updates just get counted
+    def __init__(self):
+        self.submitted = 0
+
+    def submit(self, update):
+        self.submitted += 1
+
+
+class StubObsClient():
+    # takes the place of ObsBatchClient, with every request working
+    def __init__(self):
+        self.requests = 0
+
+    def call(self, req):
+        req.status = True
+        self.requests += 1
+
+    def call_batch(self, reqs):
+        for req in reqs:
+            req.status = True
+        self.requests += len(reqs)
+
+
+class BenchParser(ScoringParser):
+    # Just ScoringParser's state, parsing and label writing: nothing gets
+    #  started, and labels go to files in rel_path (or to obs_client)
+    def __init__(self, num_fields, rel_path, obs_client=None):
+        fields = []
+        for field_num in range(1, num_fields+1):
+            fields.append({})
+            for color in sample_pages.QUAD_COLORS:
+                fields[-1][color+'_file'] = f'f{field_num}_{color}.txt'
+                fields[-1][color+'_source'] = f'F{field_num}{color}'
+        self._init_state({
+            'base_address': 'http://127.0.0.1:8080',
+            'parsing_period': 0.1,
+            'manual_timer': False,
+            'show_match_phase': True,
+            'use_obs_websocket': obs_client is not None,
+            'rel_file_path': rel_path,
+            'timer_file': 'timer.txt',
+            'match_num_file': 'match_num.txt',
+            'timer_source': 'Timer',
+            'match_num_source': 'Match',
+            'fields': fields,
+        })
+        self._startup = None
+        self._switchover_call = None
+        self._output = StubOutput()
+        if obs_client is None:
+            self._init_file_sink()
+        else:
+            self._obs_client = obs_client
+            self._obs_batch_local = threading.local()
+            self._label_srcs = self._obs_source_names()
+            self._write_label = self.write_label_obsws
+
+
+def time_per_call(func, min_time):
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    number = max(number, int(number * min_time / 0.2))
+    return min(timer.repeat(repeat=3, number=number)) / number
+
+
+def alternating(func, args):
+    # func called with each of args in turn, so every call sees a change
+    args_cycle = itertools.cycle(args)
+    return lambda: func(next(args_cycle))
+
+
+def calibration():
+    # fixed pure-Python work to compare the cases against
+    counts = {}
+    for idx in range(200):
+        key = f'key {idx % 50}'
+        counts[key] = counts.get(key, 0) + idx
+    return sorted(counts.items())
+
+
+def label_updates(num_fields):
+    # two label updates that change every label
+    updates = []
+    for match_num in [12, 13]:
+        match_table = {field_num: {color: f'{match_num*100 + field_num*4 + idx} Team'
+                                   for idx, color in enumerate(sample_pages.QUAD_COLORS)}
+                       for field_num in range(1, num_fields+1)}
+        updates.append(LabelUpdate(f'01:{match_num}', ('Seeding', match_num), match_table))
+    return updates
+
+
+def make_cases(tmp_dir):
+    # [(name, func)], func being one call of what's timed
+    cases = []
+    for num_fields in [1, 3, 8, 16]:
+        parser = BenchParser(num_fields, tmp_dir)
+        pages = [sample_pages.match_page(num_fields, timer=timer) for timer in ['01:23', '01:22']]
+        cases.append((f'match_poll/fields={num_fields}', alternating(parser.handle_match_content, pages)))
+
+    for num_fields, num_rows in [(3, 60), (3, 300), (8, 500), (16, 1000)]:
+        parser = BenchParser(num_fields, tmp_dir)
+        page_parser = parser._page_parser
+        content = sample_pages.upcoming_page(num_fields, num_rows)
+        cases.append((f'upcoming_full/fields={num_fields},rows={num_rows}',
+                      lambda page_parser=page_parser, content=content: page_parser.upcoming_rows_to_table(
+                          page_parser.parse_upcoming_page(content).rows)))
+        pages = [sample_pages.upcoming_page(num_fields, num_rows, first_match) for first_match in [1, 2]]
+        cases.append((f'upcoming_refresh/fields={num_fields},rows={num_rows}',
+                      alternating(parser.handle_upcoming_content, pages)))
+
+    for num_teams in [40, 200, 500]:
+        parser = BenchParser(3, tmp_dir)
+        content = sample_pages.lookup_page(num_teams)
+        cases.append((f'team_lookup/teams={num_teams}',
+                      lambda parser=parser, content=content: parser.handle_lookup_content(content)))
+
+    for num_fields in [1, 3, 16]:
+        parser = BenchParser(num_fields, tmp_dir)
+        cases.append((f'label_file/fields={num_fields}',
+                      alternating(parser._write_labels, label_updates(num_fields))))
+        parser = BenchParser(num_fields, tmp_dir, obs_client=StubObsClient())
+        cases.append((f'label_obs/fields={num_fields}',
+                      alternating(parser._write_labels, label_updates(num_fields))))
+    return cases
+# end of make_cases
+
+
+def load_baselines():
+    try:
+        with open(BASELINE_FILE, 'r') as baseline_f:
+            baselines = json.load(baseline_f)
+    except FileNotFoundError:
+        return None
+    if baselines.get('format') != BASELINE_FORMAT:
+        print(f'"{BASELINE_FILE}" is from a different version of the suite, ignoring it.')
+        return None
+    return baselines
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Time the per-poll parsing and label writing.')
+    arg_parser.add_argument('--save', action='store_true', help='save the results as the new baselines')
+    arg_parser.add_argument('--tolerance', type=float, default=0.5,
+                            help='how much slower than the baseline a case can get (0.5 = 50%%)')
+    arg_parser.add_argument('--quick', action='store_true', help='less time per case (noisier)')
+    arg_parser.add_argument('--only', help='just the cases whose names start with this')
+    arg_parser.add_argument('--json', help='also write the results to this file')
+    args = arg_parser.parse_args()
+    min_time = 0.1 if args.quick else 0.5
+
+    # The calibration loop gets timed again before each case, and the
+    #  fastest of those is what counts, so that the machine being busy for
+    #  a moment doesn't throw every case off
+    calibration_times = []
+
+    def time_case(func):
+        calibration_times.append(time_per_call(calibration, min_time / 5))
+        return time_per_call(func, min_time)
+
+    def relative_time(name):
+        return per_call[name] / min(calibration_times)
+
+    baselines = load_baselines()
+    baseline_cases = {} if baselines is None else baselines['cases']
+
+    def is_slower(name):
+        return (name in baseline_cases
+                and relative_time(name) / baseline_cases[name]['relative'] - 1 > args.tolerance)
+
+    per_call = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cases = make_cases(tmp_dir)
+        if args.only is not None:
+            cases = [(name, func) for name, func in cases if name.startswith(args.only)]
+        for name, func in cases:
+            per_call[name] = time_case(func)
+        # anything that looks slower gets timed a couple more times before
+        #  it counts, so that a blip doesn't fail the run
+        for name, func in cases:
+            for retry in range(2):
+                if not is_slower(name):
+                    break
+                per_call[name] = min(per_call[name], time_case(func))
+    calibration_time = min(calibration_times)
+
+    results = {}
+    regressions = []
+    print(f'{"case":<40}{"us/call":>10}{"relative":>10}{"baseline":>10}{"change":>9}')
+    for name, case_time in per_call.items():
+        relative = relative_time(name)
+        results[name] = {'us': round(case_time * 1e6, 2), 'relative': round(relative, 4)}
+        line = f'{name:<40}{case_time*1e6:>10.1f}{relative:>10.3f}'
+        if name in baseline_cases:
+            baseline = baseline_cases[name]['relative']
+            line += f'{baseline:>10.3f}{(relative / baseline - 1)*100:>+8.0f}%'
+            if is_slower(name):
+                line += '  SLOWER'
+                regressions.append(name)
+        print(line)
+    print(f'(relative = time per call / time per calibration loop, {calibration_time*1e6:.1f} us here)')
+
+    run = {
+        'format': BASELINE_FORMAT,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'calibration_us': round(calibration_time * 1e6, 2),
+        'cases': results,
+    }
+    if args.json is not None:
+        with open(args.json, 'w') as json_f:
+            json.dump(run, json_f, indent=2)
+    if args.save:
+        if args.only is not None and baselines is not None:
+            # keep the baselines for the cases that weren't run
+            run['cases'] = dict(baseline_cases, **results)
+        with open(BASELINE_FILE, 'w') as baseline_f:
+            json.dump(run, baseline_f, indent=2)
+            baseline_f.write('\n')
+        print(f'Saved baselines to "{BASELINE_FILE}".')
+        return
+    if baselines is None:
+        print('No baselines to compare against, save some with --save.')
+        return
+    if len(regressions) > 0:
+        print(f'{len(regressions)} case(s) more than {args.tolerance*100:.0f}% slower than the baseline: '
+              + ', '.join(regressions))
+        sys.exit(1)
+    print(f'All cases within {args.tolerance*100:.0f}% of the baselines.')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# Measures how often the shown timer is off from the scoring manager's real
+#  timer, for the raw polled text vs. the TimerModel extrapolation, at a few
+#  poll periods. Runs on a simulated clock, with some jitter on the polls and
+#  a random offset between the polls and the real timer's ticks.
+#
+# Run from the repo root:
+#   python benchmarks/bench_timer_model.py [trials per case]
+import os
+import random
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from TimerModel import TimerModel, parse_timer_text, format_timer_text
+
+MATCH_SECS = 150
+DISPLAY_PERIOD = 0.01
+# let it settle in before counting
+WARMUP = 3.0
+SIM_TIME = 30.0
+
+
+def true_secs(now, offset):
+    if now < offset:
+        return MATCH_SECS
+    return max(MATCH_SECS - int(now - offset), 0)
+
+
+def run_case(poll_period, rng):
+    offset = rng.uniform(0.0, 1.0)
+    model = TimerModel(pause_time=1.0 + max(0.5, 2*poll_period))
+    raw_text = ''
+    next_poll = 0.0
+    samples = 0
+    raw_wrong = 0
+    model_wrong = 0
+    for step in range(int(SIM_TIME / DISPLAY_PERIOD)):
+        now = step * DISPLAY_PERIOD
+        if now >= next_poll:
+            next_poll += poll_period * rng.uniform(0.9, 1.3)
+            text = format_timer_text(true_secs(now, offset), '00:00')
+            if text != raw_text:
+                model.update(text, now)
+            else:
+                model.confirm(now)
+            raw_text = text
+        if now < WARMUP:
+            model.text(now)
+            continue
+        samples += 1
+        actual = true_secs(now, offset)
+        raw_wrong += parse_timer_text(raw_text) != actual
+        model_wrong += parse_timer_text(model.text(now)) != actual
+    return samples, raw_wrong, model_wrong
+
+
+def main():
+    trials = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    rng = random.Random(1)
+    print(f'{"poll period":>12}{"raw wrong":>12}{"model wrong":>13}')
+    for poll_period in [0.1, 0.25, 0.5, 1.0]:
+        totals = [0, 0, 0]
+        for trial in range(trials):
+            for idx, count in enumerate(run_case(poll_period, rng)):
+                totals[idx] += count
+        samples, raw_wrong, model_wrong = totals
+        print(f'{poll_period:>12.2f}{raw_wrong / samples * 100:>11.1f}%'
+              f'{model_wrong / samples * 100:>12.1f}%')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+# Compares keeping the upcoming match table up to date with UpcomingMatches
+#  (only new rows get parsed) against parsing the whole /Marquee/PitRefresh
+#  page every time, over a run of matches where each one that finishes drops
+#  its rows off the top of the schedule. Also shows what the switchover used
+#  to wait on: the fetch and parse of the page, right when the match ended.
+#
+# Run from the repo root:
+#   python benchmarks/bench_upcoming.py [matches]
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ScoringPageParser import ScoringPageParser
+from UpcomingMatches import UpcomingMatches
+import sample_pages
+
+NUM_FIELDS = 3
+NUM_ROWS = 120
+
+
+def schedule_pages(num_matches):
+    # the page as it looks after each match has been played
+    return [sample_pages.upcoming_page(num_fields=NUM_FIELDS,
+                                       num_rows=NUM_ROWS - NUM_FIELDS * (idx % 10),
+                                       first_match=idx + 1)
+            for idx in range(num_matches)]
+
+
+def time_full(parser, pages):
+    start = time.perf_counter()
+    for page in pages:
+        upcoming = parser.parse_upcoming_page(page)
+        parser.upcoming_rows_to_table(upcoming.rows)
+    return time.perf_counter() - start
+
+
+def time_incremental(parser, pages):
+    store = UpcomingMatches(parser)
+    start = time.perf_counter()
+    for page in pages:
+        store.update(page)
+    return time.perf_counter() - start, store
+
+
+def main():
+    num_matches = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    parser = ScoringPageParser()
+    pages = schedule_pages(num_matches)
+
+    # both ways have to come up with the same table
+    store = UpcomingMatches(parser)
+    for page in pages[:20]:
+        store.update(page)
+        assert store.table == parser.upcoming_rows_to_table(parser.parse_upcoming_page(page).rows)
+
+    full = min(time_full(parser, pages) for _ in range(3))
+    incremental, store = min((time_incremental(parser, pages) for _ in range(3)),
+                             key=lambda result: result[0])
+    print(f'{num_matches} schedule updates, ~{NUM_ROWS} rows each')
+    print(f'{"":<14}{"per update (us)":>16}{"rows parsed":>13}')
+    print(f'{"full parse":<14}{full / num_matches * 1e6:>16.1f}'
+          f'{sum(len(parser.parse_upcoming_page(page).rows) for page in pages):>13}')
+    print(f'{"incremental":<14}{incremental / num_matches * 1e6:>16.1f}{store.rows_parsed:>13}')
+    print(f'speedup: {full / incremental:.1f}x')
+
+    # what the switchover reads now: the table that's already there
+    start = time.perf_counter()
+    for idx in range(100000):
+        store.table.get(idx % 50)
+    print(f'switchover lookup from the store: {(time.perf_counter() - start) / 100000 * 1e9:.0f} ns '
+          f'(was a fetch + {full / num_matches * 1e3:.2f} ms parse, with polling stopped)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+# Measures how CPU and memory use grow with the number of venues run by one
+#  MultiVenueParser, against a fake scoring manager serving the sample pages
+#  (one copy per venue, with a timer that ticks once a second).
+# Each venue count runs in its own process, so the memory numbers are the
+#  whole process (peak RSS). The "N processes" column is what running each
+#  venue in its own process (the one-venue number times N) would cost.
+#
+# Run from the repo root:
+#   python benchmarks/bench_venues.py [seconds per case] [venue counts...]
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fake_scoring_manager
+import sample_pages
+
+try:
+    import resource
+except ImportError:
+    # not on Windows
+    resource = None
+
+SERVER_PORT = 19368
+NUM_FIELDS = fake_scoring_manager.NUM_FIELDS
+
+
+def venue_config(num_venues, rel_path):
+    config = {
+        'parsing_period': 0.1,
+        'manual_timer': False,
+        'host_timer_webserver': False,
+        'auto_switchover': True,
+        'switchover_time': 10.0,
+        'show_match_phase': True,
+        'use_obs_websocket': False,
+        'rel_file_path': rel_path,
+        'venues': [],
+    }
+    for venue_idx in range(num_venues):
+        fields = []
+        for field_num in range(1, NUM_FIELDS+1):
+            fields.append({color + '_file': f'v{venue_idx}_f{field_num}_{color}.txt'
+                           for color in sample_pages.QUAD_COLORS})
+        config['venues'].append({
+            'name': f'v{venue_idx}',
+            'base_address': f'http://127.0.0.1:{SERVER_PORT}/v{venue_idx}',
+            'timer_file': f'v{venue_idx}_timer.txt',
+            'match_num_file': f'v{venue_idx}_match.txt',
+            'fields': fields,
+        })
+    return config
+
+
+def match_polls(parser):
+    return sum(venue._client.get_stats()['requests']['match']
+               for venue in parser.venues.values())
+
+
+def run_child(num_venues, duration):
+    # runs in its own process, prints one line of JSON with the results
+    import contextlib
+    import io
+    from MultiVenueParser import MultiVenueParser
+
+    with tempfile.TemporaryDirectory() as rel_path:
+        with contextlib.redirect_stdout(io.StringIO()):
+            parser = MultiVenueParser(venue_config(num_venues, rel_path))
+            # let everybody connect before measuring
+            time.sleep(2.0)
+            polls_start = match_polls(parser)
+            cpu_start = time.process_time()
+            wall_start = time.perf_counter()
+            time.sleep(duration)
+            cpu = time.process_time() - cpu_start
+            wall = time.perf_counter() - wall_start
+            polls = match_polls(parser) - polls_start
+            parser.stop()
+    max_rss_mb = None
+    if resource is not None:
+        # kilobytes on Linux
+        max_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({'venues': len(parser.venues), 'cpu_pct': cpu / wall * 100,
+                      'polls_per_s': polls / wall, 'max_rss_mb': max_rss_mb}))
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    venue_counts = [int(arg) for arg in sys.argv[2:]] or [1, 2, 4, 8, 16]
+
+    server = multiprocessing.Process(target=fake_scoring_manager.serve, args=(SERVER_PORT,))
+    server.daemon = True
+    server.start()
+    time.sleep(1.0)
+
+    single = None
+    print(f'{"venues":>6}{"polls/s":>10}{"CPU %":>9}{"CPU %/venue":>13}'
+          f'{"RSS MB":>9}{"MB/venue":>10}{"N processes MB":>16}')
+    try:
+        for num_venues in venue_counts:
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child',
+                                  str(num_venues), str(duration)],
+                                 capture_output=True, text=True, check=True).stdout
+            result = json.loads(out.strip().splitlines()[-1])
+            if single is None and num_venues == 1:
+                single = result
+            rss = result['max_rss_mb']
+            rss_text = f'{rss:>9.1f}{rss / num_venues:>10.1f}' if rss is not None else f'{"n/a":>9}{"n/a":>10}'
+            multi_text = f'{single["max_rss_mb"] * num_venues:>16.1f}' \
+                    if single is not None and rss is not None else f'{"n/a":>16}'
+            print(f'{result["venues"]:>6}{result["polls_per_s"]:>10.1f}{result["cpu_pct"]:>9.1f}'
+                  f'{result["cpu_pct"] / num_venues:>13.2f}{rss_text}{multi_text}')
+    finally:
+        server.terminate()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        run_child(int(sys.argv[2]), float(sys.argv[3]))
+    else:
+        main()
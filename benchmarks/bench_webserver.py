@@ -0,0 +1,195 @@
+# Throughput test for the timer webserver: lots of clients asking for the
+#  timer page and timer.json as fast as they can, against the old Flask
+#  development server setup (page built for every request, no compression,
+#  no caching), and the prebuilt page on waitress, werkzeug and the asyncio
+#  engine. Reports requests/s, latency, bytes sent and the parser process'
+#  CPU use.
+#
+# Run from the repo root:
+#   python benchmarks/bench_webserver.py [seconds per case] [clients]
+import asyncio
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fake_scoring_manager
+
+SERVER_PORT = 19568
+WEB_PORT = 19569
+BASE_ADDRESS = f'http://127.0.0.1:{SERVER_PORT}'
+
+
+def parser_config(engine, webserver, rel_path):
+    fields = []
+    for field_num in range(1, fake_scoring_manager.NUM_FIELDS+1):
+        fields.append({color + '_file': f'f{field_num}_{color}.txt'
+                       for color in ['red', 'green', 'blue', 'yellow']})
+    return {
+        'base_address': BASE_ADDRESS,
+        'parsing_period': 0.1,
+        'engine': engine,
+        'webserver': webserver,
+        'manual_timer': False,
+        'host_timer_webserver': True,
+        'webserver_hostip': '127.0.0.1',
+        'webserver_port': WEB_PORT,
+        'auto_switchover': True,
+        'switchover_time': 10.0,
+        'show_match_phase': True,
+        'use_obs_websocket': False,
+        'rel_file_path': rel_path,
+        'timer_file': 'timer.txt',
+        'match_num_file': 'match_num.txt',
+        'fields': fields,
+    }
+
+
+def legacy_timer_page_html():
+    # what ScoringParser used to build for every /timer request
+    page = '<html><head><style>body {background-color: black;' +\
+       'font-family: "Trebuchet MS", sans-serif;' +\
+       '}</style></head><body> ' +\
+       '<div style="width: 100%; height: auto; bottom: 0px; top: 0px; left: 0; position: absolute;"> ' +\
+       '<div id="timer" style="height: 100vh; display: flex; justify-content: center; align-items: center; ' +\
+       'font-size: 50vh; color: white;">00:00</div></div></body></html>' +\
+       '<script type="text/javascript" src="'+BASE_ADDRESS+'/js/jquery-3.4.1.min.js"></script>' +\
+       '<script type="text/javascript" src="'+BASE_ADDRESS+'/js/bootstrap.min.js"></script>' +\
+       '<script type="text/javascript" src="'+BASE_ADDRESS+'/js/jquery-ui.min.js"></script>' +\
+       '<script type="text/javascript" src="'+BASE_ADDRESS+'/js/jquery.ba-throttle-debounce.min.js"></script>' +\
+       '<script>' +\
+       'function RefreshMatch() { var jqxhr = $.get("timer.json", function(data) { $("#timer").html(data.timer); })' +\
+       '.fail(function() { $("#timer").html("---");} );}' +\
+       '$(document).ready(function() { $(".navbar").hide(); $("body").css("grid-template-rows", "auto");' +\
+       ' setInterval(RefreshMatch, 100); });' +\
+       '</script>'
+    return page
+
+
+def run_legacy_server():
+    # the old setup: Flask's own app.run(), jsonify, page built every time
+    import logging
+    from flask import Flask, jsonify
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    app = Flask(__name__)
+
+    @app.route('/timer')
+    def timer_page():
+        return legacy_timer_page_html()
+
+    @app.route('/timer.json')
+    def timer_json():
+        return jsonify({'timer': '1:23'})
+
+    app.run(host='127.0.0.1', port=WEB_PORT, threaded=True)
+
+
+def run_child(case, duration):
+    # Runs the webserver in its own process. Says 'ready' once it's up, then
+    #  prints one line of JSON with its CPU use over the next 'duration'
+    #  seconds.
+    import contextlib
+    import io
+    import threading
+    with tempfile.TemporaryDirectory() as rel_path:
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            if case == 'legacy':
+                server_thread = threading.Thread(target=run_legacy_server)
+                server_thread.daemon = True
+                server_thread.start()
+            elif case == 'asyncio':
+                from AsyncScoringParser import AsyncScoringParser
+                AsyncScoringParser(parser_config('asyncio', 'waitress', rel_path))
+            else:
+                from ScoringParser import ScoringParser
+                ScoringParser(parser_config('threads', case, rel_path))
+            time.sleep(2.0)
+        print('ready', flush=True)
+        cpu_start = time.process_time()
+        time.sleep(duration)
+        cpu = time.process_time() - cpu_start
+        print(json.dumps({'cpu_pct': cpu / duration * 100}), flush=True)
+        os._exit(0)
+
+
+async def client(session, stop_time, stats):
+    # alternates between the page (like a browser source reloading) and the
+    #  json, one request after another
+    paths = ['/timer', '/timer.json']
+    idx = 0
+    while time.monotonic() < stop_time:
+        url = f'http://127.0.0.1:{WEB_PORT}{paths[idx % 2]}'
+        idx += 1
+        start = time.perf_counter()
+        try:
+            async with session.get(url, headers={'Accept-Encoding': 'gzip'},
+                                   auto_decompress=False) as resp:
+                body = await resp.read()
+                if resp.status != 200:
+                    stats['errors'] += 1
+                    continue
+            stats['latencies'].append(time.perf_counter() - start)
+            stats['bytes'] += len(body)
+        except Exception:
+            stats['errors'] += 1
+            await asyncio.sleep(0.01)
+
+
+async def run_clients(num_clients, duration):
+    import aiohttp
+    stats = {'latencies': [], 'bytes': 0, 'errors': 0}
+    stop_time = time.monotonic() + duration
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await asyncio.gather(*(client(session, stop_time, stats)
+                               for idx in range(num_clients)))
+    return stats
+
+
+def run_case(case, num_clients, duration):
+    child = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--child',
+                              case, str(duration)],
+                             stdout=subprocess.PIPE, text=True)
+    try:
+        child.stdout.readline()  # ready
+        stats = asyncio.run(run_clients(num_clients, duration))
+        result = json.loads(child.stdout.readline())
+    finally:
+        child.wait(10)
+    return stats, result['cpu_pct']
+
+
+def main():
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 10.0
+    num_clients = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    server = multiprocessing.Process(target=fake_scoring_manager.serve, args=(SERVER_PORT,))
+    server.daemon = True
+    server.start()
+    time.sleep(1.0)
+
+    print(f'{num_clients} clients, {duration:.0f} s each')
+    print(f'{"server":<10}{"requests/s":>12}{"p50 ms":>9}{"p99 ms":>9}'
+          f'{"bytes/req":>11}{"errors":>8}{"CPU %":>8}')
+    try:
+        for case in ['legacy', 'werkzeug', 'waitress', 'asyncio']:
+            stats, cpu_pct = run_case(case, num_clients, duration)
+            latencies = sorted(stats['latencies'])
+            num = max(1, len(latencies))
+            p50 = latencies[num // 2] * 1000 if latencies else 0.0
+            p99 = latencies[min(num-1, int(num * 0.99))] * 1000 if latencies else 0.0
+            print(f'{case:<10}{len(latencies) / duration:>12.1f}{p50:>9.1f}{p99:>9.1f}'
+                  f'{stats["bytes"] / num:>11.0f}{stats["errors"]:>8}{cpu_pct:>8.1f}')
+    finally:
+        server.terminate()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        run_child(sys.argv[2], float(sys.argv[3]))
+    else:
+        main()
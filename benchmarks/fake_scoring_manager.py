@@ -0,0 +1,40 @@
+# A fake scoring manager for the benchmarks, serving the sample pages. The
+#  match page's timer counts down once a second, over and over. Every page is
+#  served under any prefix too (/<anything>/Marquee/Match, ...), so one
+#  server can stand in for several venues.
+import time
+
+import sample_pages
+
+NUM_FIELDS = 3
+MATCH_SECS = 150
+
+
+def serve(port, num_fields=NUM_FIELDS):
+    # runs forever, meant to be the target of a multiprocessing.Process
+    from aiohttp import web
+    start = time.monotonic()
+
+    async def match(request):
+        elapsed = int(time.monotonic() - start)
+        remaining = MATCH_SECS - elapsed % MATCH_SECS
+        timer = f'{remaining // 60:02d}:{remaining % 60:02d}'
+        return web.Response(body=sample_pages.match_page(num_fields, 12, timer),
+                            content_type='text/html')
+
+    def static(body):
+        async def handler(request):
+            return web.Response(body=body, content_type='text/html')
+        return handler
+
+    pages = [
+        ('/Marquee/Match', match),
+        ('/Marquee/PitRefresh', static(sample_pages.upcoming_page(num_fields))),
+        ('/phase', static(sample_pages.phase_page())),
+        ('/lookup', static(sample_pages.lookup_page())),
+    ]
+    app = web.Application()
+    for path, handler in pages:
+        app.router.add_get(path, handler)
+        app.router.add_get('/{prefix}' + path, handler)
+    web.run_app(app, host='127.0.0.1', port=port, print=None, access_log=None)
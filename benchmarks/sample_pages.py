@@ -0,0 +1,60 @@
+# Synthetic scoring manager pages for the benchmarks. The markup only has
+#  what the parsers look at, laid out the same way the scoring manager does.
+QUAD_COLORS = ['red', 'green', 'blue', 'yellow']
+
+
+def team_name(team_num):
+    return f'Team {team_num} Robotics'
+
+
+def match_page(num_fields=3, match_num=12, timer='01:23', phase='Seeding'):
+    fields = []
+    for field_num in range(1, num_fields+1):
+        quads = {}
+        for idx, color in enumerate(QUAD_COLORS):
+            quads[color] = f'{field_num*4+idx} {team_name(field_num*4+idx)}'
+        fields.append(
+            '<div class="field"><table>'
+            f'<tr><th colspan="2">Field {field_num}</th></tr>'
+            f'<tr><td class="light-red">{quads["red"]}</td>'
+            f'<td class="light-green">{quads["green"]}</td></tr>'
+            f'<tr><td class="light-blue">{quads["blue"]}</td>'
+            f'<td class="light-yellow">{quads["yellow"]}</td></tr>'
+            '</table></div>')
+    return ('<!DOCTYPE html><html><head><title>Match</title></head><body>'
+            '<div class="marquee"><div class="nameAndTimer">'
+            f'<h2>{timer}</h2><h3>{phase} Match {match_num}</h3></div>'
+            f'<div class="fields">{"".join(fields)}</div></div>'
+            '</body></html>').encode()
+
+
+def upcoming_page(num_fields=3, num_rows=60, first_match=1):
+    # each match's rows come out the same no matter where the page starts,
+    #  like the real schedule as matches get played
+    rows = []
+    for idx in range(num_rows):
+        match_num = first_match + idx // num_fields
+        field_num = idx % num_fields + 1
+        row_num = (first_match-1) * num_fields + idx
+        cells = ''.join(f'<td class="{color}">{row_num*4+cidx} {team_name(row_num*4+cidx)}</td>'
+                        for cidx, color in enumerate(QUAD_COLORS))
+        rows.append(f'<tr><td style="white-space:nowrap">{match_num} - {field_num}</td>'
+                    f'{cells}</tr>')
+    return ('<!DOCTYPE html><html><head><title>Pit</title></head><body>'
+            '<table class="table"><thead><tr><th>Match</th><th>Red</th>'
+            '<th>Green</th><th>Blue</th><th>Yellow</th></tr></thead>'
+            f'<tbody>{"".join(rows)}</tbody></table></body></html>').encode()
+
+
+def phase_page(phase='Seeding'):
+    return ('<!DOCTYPE html><html><body><div class="container">'
+            f'<h2>{phase} Phase</h2><table></table></div></body></html>').encode()
+
+
+def lookup_page(num_teams=40):
+    options = ''.join(f'<option value="{team_num}">{team_name(team_num)} (Some School)</option>'
+                      for team_num in range(1, num_teams+1))
+    return ('<!DOCTYPE html><html><body><div id="LookupInfo"><div class="row">'
+            '<select class="form-control"><option selected="selected">Select a team</option>'
+            f'{options}</select><select class="form-control"></select>'
+            '</div></div></body></html>').encode()
@@ -0,0 +1,211 @@
+# Rebuilds the match history after an event from saved scoring manager
+#  pages, as a CSV table with a row for each field of each match page
+#  (phase, match number, field, teams in each quadrant, timer) and each
+#  (match, field) of each upcoming match schedule page.
+#
+#   python bulk_parse.py <pages> [-o history.csv] [--workers 4]
+#
+# <pages> can be a directory of saved pages (gone through recursively, in
+#  name order), a .zip or .tar(.gz) of them, or a recording from
+#  record_scoring_manager.py. The pages get parsed by the same code the
+#  parser polls with, spread over a pool of processes. Each distinct page
+#  only gets parsed once (copies are skipped), and pages are read in as the
+#  pool gets to them, so memory use stays the same however big <pages> is
+#  (other than 16 bytes per distinct page, to spot the copies).
+import argparse
+import collections
+import csv
+import hashlib
+import os
+import sys
+import tarfile
+import zipfile
+from ScoringPageParser import ScoringPageParser, QUAD_COLORS
+
+COLUMNS = ['source', 'page', 'phase', 'match_num', 'field'] + QUAD_COLORS + ['timer']
+# how the pages are told apart when there's no endpoint to go by
+MATCH_PAGE_MARKER = b'nameAndTimer'
+UPCOMING_PAGE_MARKER = b'white-space:nowrap'
+
+
+def page_kind(content):
+    # 'match', 'upcoming', or None for anything else (phase, lookup, ...)
+    if MATCH_PAGE_MARKER in content:
+        return 'match'
+    if UPCOMING_PAGE_MARKER in content:
+        return 'upcoming'
+    return None
+
+
+def iter_directory(dir_name):
+    for dir_path, dir_names, file_names in os.walk(dir_name):
+        dir_names.sort()
+        for file_name in sorted(file_names):
+            path = os.path.join(dir_path, file_name)
+            try:
+                with open(path, 'rb') as page_f:
+                    content = page_f.read()
+            except OSError as e:
+                print(f'Couldn\'t read "{path}": {e}', file=sys.stderr)
+                continue
+            yield os.path.relpath(path, dir_name), page_kind(content), content
+
+
+def iter_zip(file_name):
+    with zipfile.ZipFile(file_name) as zip_f:
+        for info in zip_f.infolist():
+            if info.is_dir():
+                continue
+            content = zip_f.read(info)
+            yield info.filename, page_kind(content), content
+
+
+def iter_tar(file_name):
+    # (streamed, so the tar's index never gets built up in memory)
+    with tarfile.open(file_name, 'r|*') as tar_f:
+        for member in tar_f:
+            if not member.isfile():
+                continue
+            content = tar_f.extractfile(member).read()
+            yield member.name, page_kind(content), content
+
+
+def iter_recording(file_name):
+    from ReplayArchive import iter_new_pages
+    for t, endpoint, status, content in iter_new_pages(file_name):
+        if status == 200 and endpoint in ('match', 'upcoming'):
+            yield f'{t:.3f}', endpoint, content
+
+
+def iter_pages(source):
+    # (source name, page kind, content) for each page in source
+    if os.path.isdir(source):
+        return iter_directory(source)
+    if source.endswith('.jsonl.gz'):
+        return iter_recording(source)
+    if zipfile.is_zipfile(source):
+        return iter_zip(source)
+    if tarfile.is_tarfile(source):
+        return iter_tar(source)
+    raise ValueError(f'"{source}" isn\'t a directory, zip, tar or recording.')
+
+
+def iter_distinct(pages, counts):
+    # skips any page that's the same as one before it
+    seen = set()
+    for source, kind, content in pages:
+        counts['pages'] += 1
+        if kind is None:
+            counts['skipped'] += 1
+            continue
+        fingerprint = hashlib.blake2b(content, digest_size=16).digest()
+        if fingerprint in seen:
+            counts['duplicates'] += 1
+            continue
+        seen.add(fingerprint)
+        yield source, kind, content
+
+
+def iter_chunks(items, chunk_size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if len(chunk) > 0:
+        yield chunk
+
+
+def page_rows(page_parser, source, kind, content):
+    # the CSV rows for one page
+    rows = []
+    if kind == 'match':
+        page = page_parser.parse_match_page(content)
+        # (no page means it was between matches)
+        if page is None or page.fields is None:
+            return rows
+        for field_num, quads in sorted(page.fields.items()):
+            rows.append([source, kind, page.phase, page.match_num, field_num]
+                        + [quads.get(color, '') for color in QUAD_COLORS] + [page.timer])
+    elif kind == 'upcoming':
+        upcoming = page_parser.parse_upcoming_page(content)
+        if upcoming.rows is None:
+            return rows
+        table = page_parser.upcoming_rows_to_table(upcoming.rows)
+        for match_num, fields in sorted(table.items()):
+            for field_num, quads in sorted(fields.items()):
+                rows.append([source, kind, '', match_num, field_num]
+                            + [quads.get(color, '') for color in QUAD_COLORS] + [''])
+    return rows
+
+
+# each worker process' own parser, made the first time it's needed
+_page_parser = None
+
+
+def parse_chunk(chunk):
+    global _page_parser
+    if _page_parser is None:
+        _page_parser = ScoringPageParser(QUAD_COLORS)
+    rows = []
+    for source, kind, content in chunk:
+        rows.extend(page_rows(_page_parser, source, kind, content))
+    return rows
+
+
+def parse_all(chunks, workers, write_rows):
+    # Parses the chunks in a pool of worker processes, handing the rows to
+    #  write_rows() in the same order as the chunks. Only a few chunks per
+    #  worker are ever read in and waiting at once.
+    if workers <= 1:
+        for chunk in chunks:
+            write_rows(parse_chunk(chunk))
+        return
+    from concurrent.futures import ProcessPoolExecutor
+    max_in_flight = workers * 3
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = collections.deque()
+        for chunk in chunks:
+            if len(in_flight) >= max_in_flight:
+                write_rows(in_flight.popleft().result())
+            in_flight.append(pool.submit(parse_chunk, chunk))
+        while len(in_flight) > 0:
+            write_rows(in_flight.popleft().result())
+# end of parse_all
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Rebuild the match history from saved scoring manager pages.')
+    arg_parser.add_argument('pages', help='directory, .zip or .tar of saved pages, or a recording (.jsonl.gz)')
+    arg_parser.add_argument('-o', '--output', default='-', help='CSV file to write (default: stdout)')
+    arg_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='worker processes (1 to parse in this process)')
+    arg_parser.add_argument('--chunk-size', type=int, default=64,
+                            help='pages handed to a worker at a time')
+    args = arg_parser.parse_args()
+
+    counts = {'pages': 0, 'skipped': 0, 'duplicates': 0, 'rows': 0}
+    try:
+        pages = iter_pages(args.pages)
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    out_f = sys.stdout if args.output == '-' else open(args.output, 'w', newline='', encoding='utf-8')
+    try:
+        writer = csv.writer(out_f)
+        writer.writerow(COLUMNS)
+
+        def write_rows(rows):
+            writer.writerows(rows)
+            counts['rows'] += len(rows)
+        parse_all(iter_chunks(iter_distinct(pages, counts), args.chunk_size), args.workers, write_rows)
+    finally:
+        if out_f is not sys.stdout:
+            out_f.close()
+    print(f'{counts["pages"]} pages: {counts["duplicates"]} copies and {counts["skipped"]} other pages '
+          f'skipped, {counts["rows"]} rows written.', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+# Stands in for OBS (obs-websocket v5, no password), keeping track of every
+#  request it gets, so the parser can be run and measured without OBS. Every
+#  text source anyone asks about is there, as a text_gdiplus_v2 source.
+#
+#   python fake_obs.py [--port 4455] [--delay 0.005] [--log calls.jsonl]
+#
+# /calls.json has the requests received so far (?since=<n> for just the ones
+#  after the first n), and /inputs.json has each source's current text.
+import argparse
+import json
+import time
+from AsyncObsClient import OP_HELLO, OP_IDENTIFY, OP_IDENTIFIED, OP_REQUEST
+from ObsBatchClient import OP_REQUEST_RESPONSE, OP_REQUEST_BATCH, OP_REQUEST_BATCH_RESPONSE
+
+STATUS_SUCCESS = 100
+
+
+class FakeObs():
+    # delay is how long OBS takes to answer each message
+    def __init__(self, delay=0.0, log_file_name=None):
+        self.delay = delay
+        self.calls = []
+        self.inputs = {}
+        self._log_file = None if log_file_name is None else open(log_file_name, 'a', encoding='utf-8')
+
+    def _note_call(self, request_type, request_data, batch_id=None):
+        call = {'time': time.time(), 'type': request_type, 'data': request_data}
+        if batch_id is not None:
+            call['batch'] = batch_id
+        self.calls.append(call)
+        if self._log_file is not None:
+            self._log_file.write(json.dumps(call) + '\n')
+            self._log_file.flush()
+
+    def _response_data(self, request_type, request_data):
+        name = request_data.get('inputName')
+        settings = self.inputs.setdefault(name, {'text': '', 'read_from_file': False}) \
+                if name is not None else None
+        if request_type == 'GetInputSettings':
+            return {'inputKind': 'text_gdiplus_v2', 'inputSettings': dict(settings)}
+        if request_type == 'SetInputSettings':
+            settings.update(request_data.get('inputSettings', {}))
+        return {}
+
+    def _answer(self, request, batch_id=None):
+        request_type = request['requestType']
+        request_data = request.get('requestData') or {}
+        self._note_call(request_type, request_data, batch_id)
+        return {
+            'requestType': request_type,
+            'requestId': request.get('requestId'),
+            'requestStatus': {'result': True, 'code': STATUS_SUCCESS},
+            'responseData': self._response_data(request_type, request_data),
+        }
+
+    async def websocket_handler(self, request):
+        import asyncio
+        from aiohttp import web, WSMsgType
+        ws = web.WebSocketResponse(protocols=('obswebsocket.json',))
+        await ws.prepare(request)
+        await ws.send_json({'op': OP_HELLO, 'd': {'obsWebSocketVersion': '5.0.0', 'rpcVersion': 1}})
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            message = json.loads(msg.data)
+            op, data = message.get('op'), message.get('d', {})
+            if self.delay > 0:
+                await asyncio.sleep(self.delay)
+            if op == OP_IDENTIFY:
+                await ws.send_json({'op': OP_IDENTIFIED, 'd': {'negotiatedRpcVersion': 1}})
+            elif op == OP_REQUEST:
+                await ws.send_json({'op': OP_REQUEST_RESPONSE, 'd': self._answer(data)})
+            elif op == OP_REQUEST_BATCH:
+                results = [self._answer(req, data.get('requestId')) for req in data.get('requests', [])]
+                await ws.send_json({'op': OP_REQUEST_BATCH_RESPONSE,
+                                    'd': {'requestId': data.get('requestId'), 'results': results}})
+        return ws
+    # end of websocket_handler
+
+    async def calls_handler(self, request):
+        from aiohttp import web
+        try:
+            since = int(request.query.get('since', 0))
+        except ValueError:
+            since = 0
+        return web.json_response({'count': len(self.calls), 'calls': self.calls[since:]})
+
+    async def inputs_handler(self, request):
+        from aiohttp import web
+        return web.json_response({name: settings.get('text') for name, settings in self.inputs.items()})
+
+    def make_app(self):
+        from aiohttp import web
+        app = web.Application()
+        app.router.add_get('/', self.websocket_handler)
+        app.router.add_get('/calls.json', self.calls_handler)
+        app.router.add_get('/inputs.json', self.inputs_handler)
+        return app
+
+
+def serve(host='127.0.0.1', port=4455, delay=0.0, log_file_name=None):
+    from aiohttp import web
+    fake_obs = FakeObs(delay, log_file_name)
+    print(f'Fake OBS on ws://{host}:{port}', flush=True)
+    web.run_app(fake_obs.make_app(), host=host, port=port, print=None, access_log=None)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Stand in for OBS, keeping track of what it gets asked to do.')
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--port', type=int, default=4455)
+    arg_parser.add_argument('--delay', type=float, default=0.0,
+                            help='seconds to take answering each message')
+    arg_parser.add_argument('--log', help='also write each request to this file (JSON lines)')
+    args = arg_parser.parse_args()
+    serve(args.host, args.port, args.delay, args.log)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# Records the scoring manager's pages (match, upcoming matches, phase and
+#  team lookup) during a real event, for replay_scoring_manager.py to play
+#  back later without the scoring manager. Only changes get saved, see
+#  ReplayArchive.py. Runs until Ctrl+C.
+#
+#   python record_scoring_manager.py event.jsonl.gz [--base-address http://...]
+#
+# The scoring manager's address comes from scoring_parser_config.yaml unless
+#  it's given.
+import argparse
+import time
+import requests
+import yaml
+from ReplayArchive import ArchiveWriter, NO_RESPONSE
+from ScoringClient import ScoringClient
+
+
+def record_endpoint(client, writer, endpoint):
+    try:
+        resp = client.get(endpoint)
+        status, content = resp.status_code, resp.content
+    except requests.exceptions.RequestException:
+        status, content = NO_RESPONSE, b''
+    return writer.record(endpoint, status, content)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Record the scoring manager\'s pages for replaying later.')
+    arg_parser.add_argument('archive', help='file to record to (gzipped JSON lines)')
+    arg_parser.add_argument('--base-address', help='scoring manager address (default: from scoring_parser_config.yaml)')
+    arg_parser.add_argument('--match-period', type=float, default=0.1,
+                            help='seconds between polls of the match page')
+    arg_parser.add_argument('--other-period', type=float, default=5.0,
+                            help='seconds between polls of the other pages')
+    args = arg_parser.parse_args()
+
+    base_address = args.base_address
+    if base_address is None:
+        with open('scoring_parser_config.yaml', 'r') as yfile:
+            base_address = yaml.safe_load(yfile)['base_address']
+
+    client = ScoringClient(base_address, default_timeout=2.0)
+    writer = ArchiveWriter(args.archive, base_address)
+    print(f'Recording {base_address} to "{args.archive}", Ctrl+C to stop.')
+    start = time.monotonic()
+    next_other = start
+    next_match = start
+    try:
+        while True:
+            now = time.monotonic()
+            if now >= next_other:
+                for endpoint in ['upcoming', 'phase', 'lookup']:
+                    if record_endpoint(client, writer, endpoint):
+                        print(f'{now - start:9.1f} s: {endpoint} changed')
+                next_other += args.other_period
+            record_endpoint(client, writer, 'match')
+            # (if the scoring manager's slow to answer, just carry on from
+            #  whenever it did)
+            next_match = max(next_match + args.match_period, time.monotonic())
+            time.sleep(max(0, next_match - time.monotonic()))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        writer.close()
+    print(f'Recorded {writer.change_cnt} changes ({writer.body_cnt()} different pages) '
+          f'over {time.monotonic() - start:.0f} s.')
+    client.print_stats()
+
+
+if __name__ == '__main__':
+    main()
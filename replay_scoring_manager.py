@@ -0,0 +1,89 @@
+# Stands in for the scoring manager, playing back a recording from
+#  record_scoring_manager.py, in real time or sped up. Point base_address in
+#  scoring_parser_config.yaml at it to run the parser offline.
+#
+#   python replay_scoring_manager.py event.jsonl.gz [--port 8080] [--speed 10] [--loop]
+#
+# /replay.json says where the playback's at. Times when the scoring manager
+#  didn't answer get played back as 503s.
+import argparse
+import time
+from ReplayArchive import ReplayArchive, NO_RESPONSE
+from ScoringClient import ScoringClient
+
+
+class ReplayClock():
+    # Where the playback's at: start_at seconds into the recording at
+    #  'started' (epoch time), going speed times as fast as real time
+    def __init__(self, archive, speed=1.0, start_at=0.0, loop=False):
+        self._archive = archive
+        self.speed = speed
+        self.start_at = start_at
+        self.loop = loop
+        self.started = time.time()
+
+    def now(self):
+        t = self.start_at + (time.time() - self.started) * self.speed
+        if self.loop:
+            # a second's pause at the end before going around again
+            t = t % (self._archive.duration + 1.0)
+        return t
+
+    def status(self):
+        return {
+            't': round(self.now(), 3),
+            'duration': self._archive.duration,
+            'speed': self.speed,
+            'start_at': self.start_at,
+            'started': self.started,
+            'loop': self.loop,
+        }
+
+
+def make_replay_app(archive, clock):
+    from aiohttp import web
+
+    def page_handler(endpoint):
+        async def handler(request):
+            status, body = archive.page_at(endpoint, clock.now())
+            if status == NO_RESPONSE:
+                raise web.HTTPServiceUnavailable()
+            return web.Response(body=body, status=status, content_type='text/html')
+        return handler
+
+    async def replay_status(request):
+        return web.json_response(clock.status())
+
+    app = web.Application()
+    for endpoint, path in ScoringClient.ENDPOINTS.items():
+        app.router.add_get(path, page_handler(endpoint))
+    app.router.add_get('/replay.json', replay_status)
+    return app
+
+
+def serve(archive_file, host='127.0.0.1', port=8080, speed=1.0, start_at=0.0, loop=False):
+    from aiohttp import web
+    archive = ReplayArchive(archive_file)
+    clock = ReplayClock(archive, speed, start_at, loop)
+    print(f'Playing back {archive.duration:.0f} s recorded from {archive.base_address} '
+          f'at {speed:g}x on http://{host}:{port}', flush=True)
+    web.run_app(make_replay_app(archive, clock), host=host, port=port, print=None,
+                access_log=None)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Play back a scoring manager recording.')
+    arg_parser.add_argument('archive', help='recording from record_scoring_manager.py')
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--port', type=int, default=8080)
+    arg_parser.add_argument('--speed', type=float, default=1.0,
+                            help='how many times faster than real time to play it back')
+    arg_parser.add_argument('--start-at', type=float, default=0.0,
+                            help='seconds into the recording to start from')
+    arg_parser.add_argument('--loop', action='store_true', help='start over at the end')
+    args = arg_parser.parse_args()
+    serve(args.archive, args.host, args.port, args.speed, args.start_at, args.loop)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,54 @@
-from ScoringParser import ScoringParser
-import yaml
 import time
+# as early as possible, so that the startup times include the imports
+launch_time = time.perf_counter()
+from StartupTimer import StartupTimer
+from StateCache import invalidate_cache_file
+import yaml
+import sys
+
+startup_timer = StartupTimer(launch_time)
 
 yaml_file_name = 'scoring_parser_config.yaml'
 
 with open(yaml_file_name, 'r') as yfile:
     sp_config = yaml.safe_load(yfile)
     
-scoring_parser = ScoringParser(sp_config)
+try:
+    engine = sp_config['engine']
+except KeyError:
+    engine = 'threads'
+
+if '--invalidate-cache' in sys.argv[1:]:
+    # start over with nothing cached, e.g. after the schedule's been redone
+    if 'venues' in sp_config:
+        from MultiVenueParser import venue_configs
+        for venue_cfg in venue_configs(sp_config).values():
+            invalidate_cache_file(venue_cfg)
+    else:
+        invalidate_cache_file(sp_config)
+startup_timer.mark('config')
+
+# only the engine that's actually being used gets imported
+if 'venues' in sp_config:
+    # several scoring managers at once
+    from MultiVenueParser import MultiVenueParser
+    scoring_parser = MultiVenueParser(sp_config)
+elif engine == 'asyncio':
+    # only needs aiohttp if it's actually being used
+    from AsyncScoringParser import AsyncScoringParser
+    startup_timer.mark('imports')
+    scoring_parser = AsyncScoringParser(sp_config, startup_timer=startup_timer)
+else:
+    from ScoringParser import ScoringParser
+    startup_timer.mark('imports')
+    scoring_parser = ScoringParser(sp_config, startup_timer=startup_timer)
 
 try:
     while True:
         time.sleep(1)
 except KeyboardInterrupt:
-    pass
\ No newline at end of file
+    print('Stopping...')
+    scoring_parser.stop()
+    scoring_parser.print_connection_stats()
+    scoring_parser.print_http_stats()
+    scoring_parser.print_output_stats()
@@ -0,0 +1,7 @@
+# the tests import the modules straight out of the repo root, the same way
+#  the benchmarks do, and the sample pages out of benchmarks/
+import os
+import sys
+_REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _REPO_DIR)
+sys.path.insert(0, os.path.join(_REPO_DIR, 'benchmarks'))
@@ -0,0 +1,55 @@
+import asyncio
+from LabelOutput import AsyncLabelOutput, LabelUpdate
+
+
+def run_async_output(steps, write_result=True):
+    # Runs steps(output) against an AsyncLabelOutput on a fresh loop, and
+    #  returns the updates that got written
+    written = []
+
+    async def write(update):
+        written.append(update)
+        return write_result
+
+    async def run():
+        output = AsyncLabelOutput(write, asyncio.get_running_loop(), retry_delay=0.01)
+        # let the worker get going and sit waiting for something to do
+        await asyncio.sleep(0)
+        await steps(output)
+
+    asyncio.run(run())
+    return written
+
+
+def test_submit_then_stop_writes_and_stops():
+    # both come in before the worker wakes up, and it only gets woken once
+    async def steps(output):
+        output.submit(LabelUpdate(timer='1:00'))
+        output.stop()
+        await asyncio.wait_for(output._task, 2.0)
+    written = run_async_output(steps)
+    assert [update.timer for update in written] == ['1:00']
+
+
+def test_stop_while_idle():
+    async def steps(output):
+        await asyncio.wait_for(output.stop_async(), 2.0)
+    assert run_async_output(steps) == []
+
+
+def test_stop_gives_up_on_failed_write():
+    async def steps(output):
+        output.submit(LabelUpdate(timer='1:00'))
+        await asyncio.wait_for(output.stop_async(), 2.0)
+    written = run_async_output(steps, write_result=False)
+    assert [update.timer for update in written] == ['1:00']
+
+
+def test_failed_write_waits_before_retrying():
+    async def steps(output):
+        output.submit(LabelUpdate(timer='1:00'))
+        await asyncio.sleep(0.05)
+        await asyncio.wait_for(output.stop_async(), 2.0)
+    written = run_async_output(steps, write_result=False)
+    # retry_delay is 0.01, so a handful of tries, not thousands
+    assert 2 <= len(written) <= 10
@@ -0,0 +1,56 @@
+import types
+from MatchHistory import MatchHistory, team_key
+from ScoringParser import ScoringParser
+
+
+def make_history(tmp_path):
+    history = MatchHistory(str(tmp_path / 'history.jsonl'), flush_period=0.01)
+    history.record('quads', 'Seeding', 3, {1: {'red': '4 Team 4 Robotics', 'green': '12 Gear Heads'},
+                                           2: {'red': 'R3611', 'green': ''}})
+    history.record('timer_start', 'Seeding', 3)
+    history.record('quads', 'Seeding', 5, {1: {'red': '12 Gear Heads', 'green': '4 Team 4 Robotics'}})
+    history.close()
+    # opened again, so lookups go through the index built from the file
+    return MatchHistory(str(tmp_path / 'history.jsonl'))
+
+
+def test_team_by_number(tmp_path):
+    history = make_history(tmp_path)
+    try:
+        matches = history.team_matches(team_key('4'))
+        assert [(m['match'], m['field'], m['color']) for m in matches] == [(3, 1, 'red'), (5, 1, 'green')]
+        assert history.last_played(team_key(12))['match'] == 5
+    finally:
+        history.close()
+
+
+def test_team_by_name(tmp_path):
+    history = make_history(tmp_path)
+    try:
+        for name in ['Team 4 Robotics', ' team 4 robotics ']:
+            matches = history.team_matches(team_key(name))
+            assert [(m['match'], m['color']) for m in matches] == [(3, 'red'), (5, 'green')]
+        # no team number at all
+        assert [m['field'] for m in history.team_matches(team_key('r3611'))] == [2]
+        assert history.team_matches(team_key('Robotics')) == []
+        assert team_key('  ') is None
+    finally:
+        history.close()
+
+
+def test_history_endpoint_maps_name_to_number(tmp_path):
+    # the quadrants only show team numbers, so the name has to come from the
+    #  team list
+    history = MatchHistory(str(tmp_path / 'history.jsonl'), flush_period=0.01)
+    history.record('quads', 'Seeding', 7, {1: {'blue': '4', 'yellow': '12'}})
+    history.close()
+    history = MatchHistory(str(tmp_path / 'history.jsonl'))
+    parser = types.SimpleNamespace(_history=history, team_name2num={'Team 4 Robotics': 4, 'Gear Heads': 12})
+    try:
+        data = ScoringParser.history_team_json_data(parser, 'team 4 robotics')
+        assert data['team'] == 4
+        assert data['last_played']['match'] == 7
+        assert data['last_played']['color'] == 'blue'
+        assert ScoringParser.history_team_json_data(parser, 'Nobody')['matches'] == []
+    finally:
+        history.close()
@@ -0,0 +1,130 @@
+import threading
+import time
+from Scheduler import Scheduler
+
+
+class FakeClockScheduler(Scheduler):
+    # Scheduler on a clock that only moves when advance() is called
+    def __init__(self):
+        self.now = 100.0
+        super().__init__('TestScheduler')
+
+    def time(self):
+        return self.now
+
+    def advance(self, secs):
+        with self._cond:
+            self.now += secs
+            self._cond.notify_all()
+
+
+def wait_until(check, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not check():
+        if time.monotonic() > end:
+            return False
+        time.sleep(0.001)
+    return True
+
+
+def test_runs_in_deadline_order():
+    scheduler = FakeClockScheduler()
+    ran = []
+    try:
+        scheduler.call_later(3.0, ran.append, 'c')
+        scheduler.call_later(1.0, ran.append, 'a')
+        scheduler.call_later(2.0, ran.append, 'b1')
+        # same deadline, so after the one scheduled first
+        scheduler.call_at(102.0, ran.append, 'b2')
+        scheduler.advance(0.5)
+        time.sleep(0.05)
+        assert ran == []
+        scheduler.advance(2.0)
+        assert wait_until(lambda: len(ran) == 3)
+        time.sleep(0.05)
+        assert ran == ['a', 'b1', 'b2']
+        scheduler.advance(1.0)
+        assert wait_until(lambda: len(ran) == 4)
+        assert ran == ['a', 'b1', 'b2', 'c']
+        assert scheduler.get_stats()['run'] == 4
+    finally:
+        scheduler.stop(5)
+
+
+def test_cancel():
+    scheduler = FakeClockScheduler()
+    ran = []
+    try:
+        cancelled = scheduler.call_later(1.0, ran.append, 'cancelled')
+        kept = scheduler.call_later(1.0, ran.append, 'kept')
+        assert cancelled.pending()
+        assert cancelled.cancel()
+        assert not cancelled.pending()
+        assert not cancelled.cancel()
+        assert scheduler.get_stats()['waiting'] == 1
+        scheduler.advance(1.0)
+        assert wait_until(lambda: not kept.pending() and len(ran) == 1)
+        time.sleep(0.05)
+        assert ran == ['kept']
+        # too late once it's run
+        assert not kept.cancel()
+    finally:
+        scheduler.stop(5)
+
+
+def test_cancel_while_running():
+    scheduler = FakeClockScheduler()
+    started = threading.Event()
+    finish = threading.Event()
+
+    def slow_call():
+        started.set()
+        finish.wait(5)
+    try:
+        call = scheduler.call_later(0.0, slow_call)
+        assert started.wait(5)
+        assert not call.cancel()
+        finish.set()
+    finally:
+        scheduler.stop(5)
+
+
+def test_lots_of_cancelled_calls_get_dropped():
+    scheduler = FakeClockScheduler()
+    try:
+        calls = [scheduler.call_later(10.0 + idx, print) for idx in range(200)]
+        for call in calls[:150]:
+            call.cancel()
+        assert scheduler.get_stats()['waiting'] == 50
+        assert len(scheduler._queue) < 200
+    finally:
+        scheduler.stop(5)
+
+
+def test_failed_call_doesnt_stop_the_rest(capsys):
+    scheduler = FakeClockScheduler()
+    ran = []
+
+    def fail():
+        raise ValueError('scheduled call failed')
+    try:
+        scheduler.call_later(1.0, fail)
+        scheduler.call_later(2.0, ran.append, 'after')
+        scheduler.advance(2.0)
+        assert wait_until(lambda: ran == ['after'])
+    finally:
+        scheduler.stop(5)
+    captured = capsys.readouterr()
+    assert 'ERROR: Scheduled call' in captured.out
+    assert 'scheduled call failed' in captured.err
+
+
+def test_stop_drops_waiting_calls():
+    scheduler = FakeClockScheduler()
+    ran = []
+    scheduler.call_later(1.0, ran.append, 'never')
+    scheduler.stop(5)
+    assert not scheduler._thread.is_alive()
+    scheduler.advance(5.0)
+    time.sleep(0.05)
+    assert ran == []
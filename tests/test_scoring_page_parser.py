@@ -0,0 +1,77 @@
+# ScoringPageParser against the PyQuery parsing ScoringParser used to do, on
+#  the benchmarks' sample pages
+import pytest
+from ScoringPageParser import ScoringPageParser, QUAD_COLORS
+from UpcomingMatches import UpcomingMatches
+import sample_pages
+
+pytest.importorskip('pyquery')
+from bench_parsers import pq_match_page, pq_upcoming_page, pq_phase_page, pq_lookup_page
+
+
+@pytest.fixture
+def parser():
+    return ScoringPageParser(QUAD_COLORS)
+
+
+@pytest.mark.parametrize('num_fields, match_num, timer, phase', [
+    (1, 1, '02:30', 'Seeding'),
+    (3, 12, '01:23', 'Seeding'),
+    (8, 107, '00:00', 'Finals'),
+    (16, 5, '00:59', 'Wild Card'),
+])
+def test_match_page(parser, num_fields, match_num, timer, phase):
+    content = sample_pages.match_page(num_fields, match_num, timer, phase)
+    page = parser.parse_match_page(content)
+    assert page.errors == []
+    assert (page.timer, page.phase, page.match_num, page.fields) == pq_match_page(content)
+    assert (page.timer, page.match_num) == (timer, match_num)
+    assert sorted(page.fields) == list(range(1, num_fields+1))
+    assert page.fields[1]['red'] == '4 Team 4 Robotics'
+
+
+def test_empty_match_page_is_between_matches(parser):
+    assert parser.parse_match_page(b'') is None
+
+
+@pytest.mark.parametrize('num_fields, num_rows, first_match', [
+    (1, 10, 1),
+    (3, 60, 1),
+    (3, 62, 4),
+    (8, 500, 20),
+])
+def test_upcoming_page(parser, num_fields, num_rows, first_match):
+    content = sample_pages.upcoming_page(num_fields, num_rows, first_match)
+    upcoming = parser.parse_upcoming_page(content)
+    assert upcoming.errors == []
+    table = parser.upcoming_rows_to_table(upcoming.rows)
+    assert table == pq_upcoming_page(content)
+    assert min(table) == first_match
+    assert sum(len(fields) for fields in table.values()) == num_rows
+
+
+def test_upcoming_refresh_matches_full_parse(parser):
+    # the rows that are left from the last refresh get reused, and the
+    #  table still comes out the same as parsing the page from scratch
+    upcoming = UpcomingMatches(parser)
+    for first_match in [1, 2, 3, 5]:
+        content = sample_pages.upcoming_page(3, 60, first_match)
+        upcoming.update(content)
+        assert upcoming.table == pq_upcoming_page(content)
+    assert upcoming.rows_reused > 0
+
+
+@pytest.mark.parametrize('phase', ['Seeding', 'Finals', 'Wild Card'])
+def test_phase_page(parser, phase):
+    content = sample_pages.phase_page(phase)
+    page = parser.parse_phase_page(content)
+    assert page.phase == pq_phase_page(content) == phase
+
+
+@pytest.mark.parametrize('num_teams', [1, 40, 500])
+def test_lookup_page(parser, num_teams):
+    content = sample_pages.lookup_page(num_teams)
+    lookup = parser.parse_lookup_page(content)
+    assert lookup.errors == []
+    assert lookup.teams == pq_lookup_page(content)
+    assert lookup.teams[-1] == (num_teams, sample_pages.team_name(num_teams))
@@ -0,0 +1,62 @@
+import threading
+import time
+from StateCache import StateCache
+
+
+def test_update_doesnt_wait_on_the_disk(tmp_path, monkeypatch):
+    cache = StateCache(str(tmp_path / 'cache.json'), 'http://127.0.0.1:9268')
+    writing = threading.Event()
+    release = threading.Event()
+    write = cache._write
+
+    def slow_write(data):
+        writing.set()
+        release.wait(5)
+        write(data)
+    monkeypatch.setattr(cache, '_write', slow_write)
+    try:
+        cache.update(phase='Seeding')
+        assert writing.wait(5)
+        # the writer thread is stuck on the disk, and updates still go
+        #  straight through
+        start = time.monotonic()
+        for match_num in range(1, 50):
+            cache.update(match_num=match_num)
+        assert time.monotonic() - start < 1.0
+    finally:
+        release.set()
+        cache.close()
+    # the updates made while it was writing get written together
+    assert cache.write_cnt == 2
+
+    loaded = StateCache(str(tmp_path / 'cache.json'), 'http://127.0.0.1:9268')
+    try:
+        data, age = loaded.load()
+        assert data == {'phase': 'Seeding', 'match_num': 49}
+        assert age < 60
+    finally:
+        loaded.close()
+
+
+def test_unchanged_update_isnt_written(tmp_path):
+    cache = StateCache(str(tmp_path / 'cache.json'), 'http://127.0.0.1:9268')
+    cache.update(teams=[[4, 'Team 4 Robotics']])
+    cache.close()
+    assert cache.write_cnt == 1
+
+    cache = StateCache(str(tmp_path / 'cache.json'), 'http://127.0.0.1:9268')
+    cache.load()
+    cache.update(teams=[[4, 'Team 4 Robotics']])
+    cache.close()
+    assert cache.write_cnt == 0
+
+
+def test_other_scoring_manager_is_ignored(tmp_path):
+    cache = StateCache(str(tmp_path / 'cache.json'), 'http://127.0.0.1:9268')
+    cache.update(phase='Finals')
+    cache.close()
+    other = StateCache(str(tmp_path / 'cache.json'), 'http://10.0.0.2:9268')
+    try:
+        assert other.load() == (None, None)
+    finally:
+        other.close()
@@ -0,0 +1,53 @@
+import threading
+import time
+import sample_pages
+from bench_suite import BenchParser
+
+
+class RecordingOutput():
+    # takes the place of the output stage, keeping every update
+    def __init__(self):
+        self.updates = []
+
+    def submit(self, update):
+        self.updates.append(update)
+
+
+def test_display_cant_overwrite_final_time(tmp_path):
+    parser = BenchParser(1, str(tmp_path))
+    parser._extrapolate_timer = True
+    parser._output = RecordingOutput()
+    now = time.monotonic()
+    parser._timer_model.update('00:02', now=now-1.0)
+    parser._timer_model.update('00:01', now=now)
+    # seen on the last poll before the final one
+    parser._set_web_time('00:02')
+
+    # the display thread reads 00:01 out of the model, and the final poll
+    #  comes in before it's shown
+    text_read = threading.Event()
+    show_text = threading.Event()
+    model_text = parser._timer_model.text
+
+    def slow_text(now=None):
+        text = model_text(now)
+        text_read.set()
+        show_text.wait(5)
+        return text
+    parser._timer_model.text = slow_text
+    display_thread = threading.Thread(target=parser.refresh_timer_display)
+    display_thread.start()
+    assert text_read.wait(5)
+    parser._timer_model.text = model_text
+
+    poll_thread = threading.Thread(target=parser.handle_match_content,
+                                   args=(sample_pages.match_page(1, timer='00:00'),))
+    poll_thread.start()
+    time.sleep(0.05)
+    show_text.set()
+    display_thread.join(5)
+    poll_thread.join(5)
+
+    assert parser._match_state.get().web_time == '00:00'
+    timer_labels = [update.timer for update in parser._output.updates if update.timer is not None]
+    assert timer_labels[-1] == '00:00'
@@ -0,0 +1,102 @@
+# TimerModel with made-up poll times passed in as 'now', in place of the
+#  monotonic clock
+from TimerModel import TimerModel, format_timer_text, parse_timer_text
+
+
+def counting_model(drift_threshold=1.0):
+    # a model that's seen the timer tick from 01:00 down to 00:59 at 10.0
+    model = TimerModel(drift_threshold, pause_time=1.5, stale_time=5.0)
+    model.update('01:00', now=9.1)
+    model.update('00:59', now=10.0)
+    return model
+
+
+def test_timer_text():
+    assert parse_timer_text('02:30') == 150
+    assert parse_timer_text('0:05') == 5
+    assert parse_timer_text('') is None
+    assert parse_timer_text('Match 3') is None
+    assert parse_timer_text(None) is None
+    assert format_timer_text(150, '00:00') == '02:30'
+    assert format_timer_text(59, '1:00') == '0:59'
+    assert format_timer_text(5, '') == '0:05'
+
+
+def test_only_counts_once_it_ticks_down():
+    model = TimerModel()
+    model.update('01:00', now=0.0)
+    assert not model.is_running(now=0.1)
+    assert model.text(now=3.0) == '01:00'
+    model.update('00:59', now=1.0)
+    assert model.is_running(now=1.1)
+
+
+def test_counts_down_between_polls():
+    model = counting_model()
+    assert model.text(now=10.5) == '00:59'
+    assert model.text(now=11.0) == '00:58'
+    assert model.text(now=13.2) == '00:56'
+    # keeps the minutes padded like the polled text
+    model = TimerModel()
+    model.update('1:00', now=0.0)
+    model.update('0:59', now=1.0)
+    assert model.text(now=2.0) == '0:58'
+
+
+def test_shown_time_never_goes_back_up():
+    model = counting_model()
+    assert model.text(now=11.0) == '00:58'
+    # the next tick shows up a little late, lining the clock up with it
+    model.update('00:58', now=11.3)
+    assert model.text(now=11.4) == '00:58'
+    assert model.text(now=10.5) == '00:58'
+
+
+def test_small_drift_is_lined_up_and_big_drift_jumps():
+    model = counting_model(drift_threshold=1.0)
+    model.update('00:58', now=11.0)
+    assert model.resync_cnt == 0
+    # the scoring manager's timer jumped 10 seconds
+    model.update('00:48', now=12.0)
+    assert model.resync_cnt == 1
+    assert model.text(now=12.1) == '00:48'
+    assert model.text(now=13.1) == '00:47'
+
+
+def test_stops_at_zero():
+    model = TimerModel(stale_time=5.0)
+    model.update('00:03', now=0.0)
+    model.update('00:02', now=1.0)
+    # never counts past zero, even if the polls are slow
+    assert model.text(now=4.5) == '00:00'
+    model.update('00:00', now=4.6)
+    assert not model.is_running(now=4.7)
+    assert model.text(now=4.7) == '00:00'
+
+
+def test_reset_and_pause_stop_counting():
+    model = counting_model()
+    model.update('02:30', now=10.5)
+    assert not model.is_running(now=10.6)
+    assert model.text(now=12.0) == '02:30'
+
+    model = counting_model()
+    assert not model.confirm(now=11.0)
+    # no tick for more than pause_time
+    assert model.confirm(now=11.6)
+    assert not model.is_running(now=11.7)
+    assert model.text(now=20.0) == '00:59'
+
+
+def test_stops_without_polls():
+    model = counting_model()
+    assert model.is_running(now=14.9)
+    assert not model.is_running(now=15.1)
+    assert model.text(now=15.1) == '00:59'
+
+
+def test_non_timer_text_is_shown_as_is():
+    model = counting_model()
+    model.update('', now=10.5)
+    assert not model.is_running(now=10.6)
+    assert model.text(now=10.6) == ''